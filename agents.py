@@ -1,18 +1,42 @@
 import pandas as pd
+import numpy as np
 import datetime
 import hashlib
 import csv
-import os
+import threading
+from data_context import DataContext
+from metrics import timed
+from rolling_sales import RollingSales, DEFAULT_WINDOWS
+from forecasting import forecast_catalog
+from competitor_prices import CompetitorPrices, STATS as PRICE_STATS
+from audit_writer import AuditWriter
+from audit_store import AuditLog, upgrade as upgrade_audit_log, HEADER as AUDIT_HEADER
 
 # --- 1. FINANCE AGENT ---
 class FinanceAgent:
-    def __init__(self):
-        self.df = pd.read_csv("financials.csv")
+    def __init__(self, data=None):
+        self.data = data or DataContext()
+        self._values = None
+        self._values_version = None
+
+    @property
+    def df(self):
+        return self.data.get("financials")
+
+    @property
+    def values(self):
+        # metric -> value, rebuilt only when the shared data snapshot changes (first row per metric wins)
+        if self._values is None or self._values_version != self.data.version:
+            df = self.df
+            self._values = dict(zip(df['metric'].to_numpy()[::-1], df['value'].to_numpy()[::-1]))
+            self._values_version = self.data.version
+        return self._values
     
+    @timed("finance.get_status")
     def get_status(self):
         # Read Data
-        cash = self.df[self.df['metric'] == 'cash_balance']['value'].values[0]
-        burn = self.df[self.df['metric'] == 'monthly_burn_rate']['value'].values[0]
+        cash = self.values['cash_balance']
+        burn = self.values['monthly_burn_rate']
         
         # Calculate Logic
         runway_months = round(cash / burn, 1)
@@ -31,10 +55,67 @@ class FinanceAgent:
 
 # --- 2. INVENTORY AGENT ---
 class InventoryAgent:
-    def __init__(self):
-        self.df_inv = pd.read_csv("inventory.csv")
-        self.df_sales = pd.read_csv("sales_history.csv")
+    def __init__(self, data=None, windows=DEFAULT_WINDOWS):
+        self.data = data or DataContext()
+        # The classifier always needs the 7-day window
+        self.windows = tuple(sorted(set(windows) | {7}))
+        self._rolling = None
+        self._rolling_store = None
+        self._rolling_lock = threading.Lock()
+        # (inventory frame, {product_id: current_stock}) for single-SKU lookups
+        self._stock = None
+
+    @property
+    def df_inv(self):
+        return self.data.get("inventory")
+
+    @property
+    def stock(self):
+        # First inventory row's stock per product, built once per inventory snapshot
+        inv = self.df_inv
+        stock = self._stock
+        if stock is None or stock[0] is not inv:
+            first = inv.drop_duplicates('product_id')
+            stock = (inv, dict(zip(first['product_id'].tolist(), first['current_stock'].tolist())))
+            self._stock = stock
+        return stock[1]
+
+    @property
+    def sales(self):
+        # Columnar, memory-mapped sales history (see sales_store.py)
+        return self.data.get("sales_store")
+
+    @property
+    def rolling(self):
+        # Rolling N-day totals for every SKU. When the store gains new days they are
+        # folded in incrementally (O(SKUs) per day) instead of re-summing history.
+        with self._rolling_lock:
+            store = self.sales
+            if self._rolling is None:
+                self._rolling = RollingSales(store, self.windows)
+            elif store is not self._rolling_store:
+                self._rolling.sync(store)
+            self._rolling_store = store
+            return self._rolling
+
+    @timed("inventory.record_sales")
+    def record_sales(self, date, units_by_product):
+        # Append a new day of sales ({product_id: units}) and update the rolling windows
+        self.sales.append_day(date, units_by_product)
+        self.data.refresh()
+        return self.rolling
+
+    @timed("inventory.sales_velocity")
+    def sales_velocity(self, product_id):
+        # Units/day for every configured window, plus days of stock cover at the 30-day pace
+        rolling = self.rolling
+        stock = self.stock[product_id]
+        cover_window = 30 if 30 in self.windows else self.windows[-1]
+        velocity = {f"{w}d": round(float(rolling.velocity([product_id], w)[0]), 2) for w in self.windows}
+        velocity["days_of_cover"] = float(rolling.days_of_cover([product_id], [stock], cover_window)[0])
+        return velocity
     
+    @timed("inventory.analyze_product")
     def analyze_product(self, product_id):
         # Get Product Data
         prod = self.df_inv[self.df_inv['product_id'] == product_id].iloc[0]
@@ -42,8 +123,7 @@ class InventoryAgent:
         stock = prod['current_stock']
         
         # Calculate recent sales velocity (last 7 days)
-        sales_col = f"{product_id}_sales"
-        total_sales_7d = self.df_sales[sales_col].head(7).sum()
+        total_sales_7d = self.rolling.window_totals([product_id], 7)[0]
         
         # Logic: Overstock vs Low Stock
         status = "NORMAL"
@@ -61,58 +141,288 @@ class InventoryAgent:
             "status": status
         }
 
+    @timed("inventory.analyze_many")
+    def analyze_many(self, product_ids):
+        # Same rules as analyze_product, but for many SKUs in one vectorized pass
+        product_ids = list(product_ids)
+        inv = self.df_inv.drop_duplicates('product_id').set_index('product_id').loc[product_ids]
+        stock = inv['current_stock'].to_numpy()
+        
+        # 7-day sales for every requested SKU at once
+        total_sales_7d = self.rolling.window_totals(product_ids, 7)
+        
+        # Rule order matters: first match wins (same as the if/elif chain above)
+        status = np.select(
+            [(stock > 100) & (total_sales_7d < 10), stock < 10, total_sales_7d > 30],
+            ["OVERSTOCK (Dead Inventory)", "LOW STOCK (Scarcity)", "HIGH DEMAND"],
+            default="NORMAL"
+        )
+        
+        return pd.DataFrame({
+            "product_id": product_ids,
+            "product": inv['product_name'].to_numpy(),
+            "stock": stock,
+            "7d_sales": total_sales_7d,
+            "status": status
+        })
+
+    def analyze_all(self):
+        # Whole catalog, in inventory order
+        return self.analyze_many(self.df_inv['product_id'])
+
+    @timed("inventory.forecast_all")
+    def forecast_all(self, **params):
+        # Demand forecast, days of cover and reorder suggestions for the whole catalog
+        # (uses min_stock_threshold as a floor for the reorder point; see forecasting.py)
+        return forecast_catalog(self.sales, self.df_inv, **params)
+
 # --- 3. COMPETITOR AGENT ---
+def _money(values):
+    # "16" for whole amounts, "16.5" otherwise
+    values = values.round(2)
+    whole = values % 1 == 0
+    return pd.Series(np.where(whole, values.fillna(0).astype(np.int64).astype(str), values.astype(str)),
+                     index=values.index)
+
+
+def price_position(market):
+    # diff / diff_pct / position / bucket for rows with my_price and competitor_price,
+    # where competitor_price is the promo-adjusted market reference (see competitor_prices.py)
+    my_price = market['my_price']
+    comp_price = market['competitor_price']
+    diff = my_price - comp_price
+    market['diff'] = diff
+    # % gap is only meaningful when the competitor price is positive
+    market['diff_pct'] = (diff / comp_price.where(comp_price > 0)) * 100
+
+    market['position'] = np.select(
+        [diff > 0, diff < 0],
+        ["Overpriced by $" + _money(diff) + " (We are losing)",
+         "Underpriced by $" + _money(diff.abs()) + " (We are winning)"],
+        default="Competitive"
+    )
+    # Significant gaps (> 5%) for the Market Status panel
+    market['bucket'] = np.select(
+        [market['diff_pct'] > 5, market['diff_pct'] < -5],
+        ["losing", "winning"],
+        default="neutral"
+    )
+    return market
+
+
+# Fields compare_price returns for one SKU
+PRICE_FIELDS = ("my_price", "competitor_price", "competitor_min", "competitors", "promo_count", "position")
+
+
+# Sources the competitor index is built from
+INDEX_SOURCES = ("inventory", "competitors")
+
+
 class CompetitorAgent:
-    def __init__(self):
-        self.df_comp = pd.read_csv("competitors.csv")
-        self.df_inv = pd.read_csv("inventory.csv")
+    def __init__(self, data=None):
+        self.data = data or DataContext()
+        # (source key, market frame, PRICE_FIELDS arrays), always replaced as one tuple
+        # so a reader never pairs one build's row positions with another build's arrays
+        self._index = None
+        self._prices = None
+        self._prices_source = None
+        # Serializes rebuilds and incremental updates (generate_strategies workers share the agent)
+        self._index_lock = threading.RLock()
+
+    @property
+    def df_comp(self):
+        return self.data.get("competitors")
+
+    @property
+    def df_inv(self):
+        return self.data.get("inventory")
+
+    @property
+    def prices(self):
+        # Per-SKU aggregates over every seller's latest price; re-aggregated only when the
+        # competitors frame itself changes (inventory-only changes keep them)
+        with self._index_lock:
+            comp = self.df_comp
+            if self._prices is None or comp is not self._prices_source:
+                self._prices = CompetitorPrices(comp)
+                self._prices_source = comp
+            return self._prices
+
+    @staticmethod
+    def _source_key(snapshot):
+        # The index only depends on these two sources: sales or financials reloads keep it
+        return tuple(snapshot.signatures.get(name) for name in INDEX_SOURCES)
+
+    def _current(self):
+        # The published index, rebuilt first if inventory or competitors changed
+        for name in INDEX_SOURCES:
+            self.data.get(name)
+        index = self._index
+        if index is None or index[0] != self._source_key(self.data.snapshot):
+            with self._index_lock:
+                index = self._index
+                if index is None or index[0] != self._source_key(self.data.snapshot):
+                    self.build_index()
+                    index = self._index
+        return index
+
+    @property
+    def market(self):
+        # Rebuild the joined index only when inventory or competitors change
+        return self._current()[1]
+
+    def _publish(self, key, market):
+        # Plain arrays for compare_price: one hash lookup + array reads instead of .at per field
+        fields = {col: market[col].to_numpy() for col in PRICE_FIELDS}
+        self._index = (key, market, fields)
+
+    @timed("competitor.build_index")
+    def build_index(self):
+        # Join our prices with the per-SKU competitor aggregates once, keyed on product_id.
+        # First inventory row per product wins (same as the old .iloc[0] lookups).
+        with self._index_lock:
+            # Make sure both sources are loaded, then read them from one consistent snapshot
+            for name in INDEX_SOURCES:
+                self.data.get(name)
+            snap = self.data.snapshot
+            mine = snap["inventory"].drop_duplicates('product_id')[['product_id', 'product_name', 'selling_price']]
+            stats = self.prices.stats
+            market = mine.merge(stats, left_on='product_id', right_index=True, how='inner')
+            market = market.rename(columns={'selling_price': 'my_price'})
+            self._publish(self._source_key(snap), price_position(market).set_index('product_id'))
+
+    @timed("competitor.record_prices")
+    def record_prices(self, observations):
+        # Stream in new price observations (product_id, competitor, competitor_price,
+        # competitor_promo, observed_at): only the touched SKUs are re-aggregated and re-positioned.
+        # Returns the product_ids whose market rows changed.
+        with self._index_lock:
+            key, market, _ = self._current()
+            touched = np.asarray(self.prices.update(observations), dtype=object)
+            positions = market.index.get_indexer(touched)
+            missing = touched[positions < 0]
+            if len(missing) and np.isin(missing, self.df_inv['product_id'].to_numpy()).any():
+                # A catalog product got its first competitor price: it joins the index
+                self.build_index()
+                return touched.tolist()
+            positions = positions[positions >= 0]
+            stats = self.prices.stats
+            rows = stats.iloc[stats.index.get_indexer(market.index[positions])][PRICE_STATS]
+            rows = price_position(rows.assign(my_price=market['my_price'].to_numpy()[positions]))
+            # Patch a copy: readers holding the published frame keep a consistent view
+            market = market.copy()
+            for col in PRICE_STATS + ['diff', 'diff_pct', 'position', 'bucket']:
+                market.iloc[positions, market.columns.get_loc(col)] = rows[col].to_numpy()
+            self._publish(key, market)
+            return touched.tolist()
+
+    @timed("competitor.sync")
+    def sync(self, snapshot, inventory_ids=(), competitor_ids=()):
+        # Catch up with a newer snapshot in which only these SKUs' rows changed (see status_feed.py):
+        # their aggregates and market rows are recomputed instead of rebuilding the whole index.
+        # New SKUs are appended at the end until the next full build.
+        with self._index_lock:
+            if self._index is None or self._prices is None or self._prices_source is None:
+                self.build_index()
+                return
+            comp = snapshot["competitors"]
+            if len(competitor_ids):
+                self._prices.replace(competitor_ids, comp[comp['product_id'].isin(list(competitor_ids))])
+            self._prices_source = comp
+
+            ids = list(dict.fromkeys([*inventory_ids, *competitor_ids]))
+            market = self._index[1]
+            if ids:
+                inv = snapshot["inventory"]
+                mine = inv[inv['product_id'].isin(ids)].drop_duplicates('product_id')
+                stats = self._prices.stats
+                found = stats.index.get_indexer(mine['product_id'])
+                mine = mine[found >= 0]
+                rows = stats.iloc[found[found >= 0]].assign(
+                    product_name=mine['product_name'].to_numpy(), my_price=mine['selling_price'].to_numpy())
+                rows = price_position(rows)[market.columns]
+
+                market = market.copy()
+                positions = market.index.get_indexer(rows.index)
+                known = positions >= 0
+                for j, col in enumerate(market.columns):
+                    market.iloc[positions[known], j] = rows[col].to_numpy()[known]
+                if not known.all():
+                    market = pd.concat([market, rows[~known]])
+                # Products that lost their inventory row or every competitor price
+                kept = set(rows.index.tolist())
+                gone = [pid for pid in ids if pid not in kept]
+                if gone:
+                    market = market.drop(gone, errors="ignore")
+            self._publish(self._source_key(snapshot), market)
+
+    @timed("competitor.compare_all")
+    def compare_all(self):
+        # Price position for the whole catalog, in inventory order
+        return self.market.reset_index()
         
+    @timed("competitor.compare_price")
     def compare_price(self, product_id):
-        # Get our price vs theirs
-        my_price = self.df_inv[self.df_inv['product_id'] == product_id]['selling_price'].values[0]
-        comp_row = self.df_comp[self.df_comp['product_id'] == product_id].iloc[0]
-        comp_price = comp_row['competitor_price']
-        
-        diff = my_price - comp_price
-        
-        position = "Competitive"
-        if diff > 0:
-            position = f"Overpriced by ${diff} (We are losing)"
-        elif diff < 0:
-            position = f"Underpriced by ${abs(diff)} (We are winning)"
-            
-        return {
-            "my_price": my_price,
-            "competitor_price": comp_price,
-            "position": position
-        }
+        # O(1) lookup into the prebuilt index; position and arrays come from the same build
+        _, market, fields = self._current()
+        i = market.index.get_loc(product_id)
+        return {col: values[i] for col, values in fields.items()}
 
 # --- 4. AUDIT & COMPLIANCE AGENT ---
 class AuditAgent:
-    def __init__(self, log_file="audit_log.csv"):
+    def __init__(self, log_file="audit_log.csv", durability="none", batch_size=512, flush_interval=0.2,
+                 max_segment_bytes=64 * 1024 * 1024):
         self.log_file = log_file
-        # Ensure file exists with headers
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', newline='') as f:
+        # Ensure file exists with headers ('x' so only one process ever writes them)
+        try:
+            with open(self.log_file, 'x', newline='') as f:
                 writer = csv.writer(f)
-                writer.writerow(["timestamp", "agent_name", "product_id", "action_taken", "reasoning_hash", "status"])
+                writer.writerow(AUDIT_HEADER)
+        except FileExistsError:
+            # Logs written before hash chaining get their rows chained once
+            upgrade_audit_log(self.log_file)
+        # Rows are queued and appended in batches by a background thread (see audit_writer.py)
+        self.writer = AuditWriter.for_file(self.log_file, durability=durability,
+                                           batch_size=batch_size, flush_interval=flush_interval,
+                                           max_segment_bytes=max_segment_bytes)
+        # Segmented reader: tail and indexed queries without loading the whole history
+        self.log = AuditLog(self.log_file)
 
+    @timed("audit.log_event")
     def log_event(self, agent_name, product_id, action, reasoning):
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Create a hash of the reasoning for integrity (simulated blockchain-lite)
+        # Create a hash of the reasoning for integrity
         reasoning_hash = hashlib.sha256(reasoning.encode()).hexdigest()[:16]
         
-        status = "VERIFIED"
+        # The writer links the row into the log's hash chain (record_hash column);
+        # AuditAgent.verify() proves the chain is intact
+        status = "CHAINED"
         
-        with open(self.log_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([timestamp, agent_name, product_id, action, reasoning_hash, status])
+        self.writer.write([timestamp, agent_name, product_id, action, reasoning_hash, status])
             
         return reasoning_hash
 
-    def get_recent_logs(self):
+    @timed("audit.flush")
+    def flush(self):
+        # False while rows could not be written yet (held and retried, see audit_writer.py)
+        return self.writer.flush()
+
+    @timed("audit.get_recent_logs")
+    def get_recent_logs(self, n=10):
+        # Make sure our own queued events are visible
+        self.flush()
         try:
-            return pd.read_csv(self.log_file).tail(10).iloc[::-1] # Last 10, reversed
-        except:
-            return pd.DataFrame()
\ No newline at end of file
+            return self.log.tail(n).iloc[::-1].reset_index(drop=True) # Last n, newest first
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    @timed("audit.verify")
+    def verify(self, workers=None, full=False):
+        self.flush()
+        return self.log.verify(workers=workers, full=full)
+
+    @timed("audit.query_logs")
+    def query_logs(self, product_id=None, agent_name=None, start=None, end=None):
+        self.flush()
+        return self.log.query(product_id=product_id, agent_name=agent_name, start=start, end=end)
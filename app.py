@@ -1,12 +1,24 @@
 import streamlit as st
+from collections import deque
 import pandas as pd
 import time
 import plotly.express as px
+import metrics
 from marketing_agent import MarketingAgent
+from catalog import CatalogIndex, FILTERS
+from po_outbox import POOutbox
+from competitor_prices import format_price
+from status_feed import StatusFeed
+from chart_data import RANGES, RESOLUTIONS, auto_resolution, chart_series, date_range, range_days
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="AI Marketing Agent", page_icon="🤖", layout="wide")
 
+# --- INSTRUMENTATION (see metrics.py; toggled from the sidebar debug panel) ---
+rerun_started = time.perf_counter()
+# "Profile next rerun" arms cProfile for exactly one script run
+profiler = metrics.Profiler().start() if st.session_state.pop("profile_next_rerun", False) else None
+
 # --- CSS FOR SCI-FI LOOK ---
 st.markdown("""
 <style>
@@ -17,11 +29,141 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- INITIALIZE AGENT ---
+# One agent (and one shared data snapshot) per server process, reused by every session and rerun
+@st.cache_resource
 def load_agent():
-    return MarketingAgent()
+    agent = MarketingAgent()
+    agent.data.load("financials", "inventory", "competitors", "sales_store")
+    return agent
 
 agent = load_agent()
 
+# Purchase orders are queued and sent in the background, one PO per vendor (see po_outbox.py)
+@st.cache_resource
+def load_outbox():
+    return POOutbox().start()
+
+outbox = load_outbox()
+DEFAULT_REORDER_QTY = 50
+
+# SKUs entering/leaving overstock, low stock and losing price war (see status_feed.py)
+@st.cache_resource
+def load_status_feed():
+    feed = StatusFeed(agent.data, agent.inventory, agent.competitor)
+    changes = deque(maxlen=20)
+    feed.subscribe(changes.appendleft)
+    return feed, changes
+
+status_feed, status_changes = load_status_feed()
+# Reload any data file that changed since the last rerun; only the changed SKUs are re-flagged
+status_delta = status_feed.poll()
+data_version = agent.data.version
+
+def source_version(*names):
+    # Changes only when one of these sources does, so e.g. a price update leaves the
+    # inventory and forecast sections cached
+    signatures = agent.data.snapshot.signatures
+    return tuple(signatures.get(name) for name in names)
+
+inventory_version = source_version("inventory", "sales_store")
+market_version = source_version("inventory", "competitors")
+
+# --- CACHED DASHBOARD SECTIONS ---
+# Keyed on the version of the sources each section reads: widget interactions rerender
+# from cache, and a section is only recomputed after one of its source files actually changes.
+@st.cache_data(show_spinner=False, max_entries=4)
+def finance_section(version):
+    return agent.finance.get_status()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def inventory_section(version):
+    overstocked_items = []
+    low_stock_items = []
+    
+    # Classify the whole catalog in one vectorized pass
+    health = agent.inventory.analyze_all()
+    for pid, product, stock, status in zip(health['product_id'], health['product'], health['stock'], health['status']):
+        if "OVERSTOCK" in status:
+            overstocked_items.append(f"{product} ({stock} units)")
+        elif "LOW STOCK" in status:
+            # Store tuple (display_string, product_id) so we can look up email later
+            low_stock_items.append((f"{product} ({stock} units)", pid))
+    
+    return {
+        "total_skus": len(agent.inventory.df_inv),
+        "overstocked_items": overstocked_items,
+        "low_stock_items": low_stock_items,
+    }
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def forecast_section(version):
+    # Catalog-wide forecast; only SKUs that need a reorder, most urgent first
+    plan = agent.inventory.forecast_all()
+    plan = plan[plan['reorder_qty'] > 0].sort_values('days_of_cover')
+    return [(name, qty, cover) for name, qty, cover in zip(plan['product_name'], plan['reorder_qty'], plan['days_of_cover'])]
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def reorder_quantities(version):
+    # Forecast-driven order size per SKU (product_id -> units), where the plan calls for one
+    plan = agent.inventory.forecast_all()
+    plan = plan[plan['reorder_qty'] > 0]
+    return dict(zip(plan['product_id'], plan['reorder_qty'].astype(int)))
+
+def po_line(product_id):
+    row = product_catalog(source_version("inventory")).get(product_id)
+    qty = reorder_quantities(inventory_version).get(product_id, DEFAULT_REORDER_QTY)
+    return {"product_id": product_id, "product_name": row['product_name'],
+            "vendor_email": row.get('vendor_email', "support@vendor.com"), "qty": qty}
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def market_section(version):
+    # One joined pass over the catalog; competitor_price is the promo-adjusted median
+    # of every seller's latest price (see competitor_prices.py)
+    market = agent.competitor.compare_all()
+    priced = market[market['competitor_price'] > 0]
+    
+    # Categorize significant differences (> 5% either way)
+    # Only the top 5 of each are displayed, so only format those
+    losing = priced[priced['bucket'] == "losing"].head(5)
+    winning = priced[priced['bucket'] == "winning"].head(5)
+
+    def describe(rows, sign):
+        return [f"{name} ({sign}{pct:.1f}% vs {sellers} seller{'s' if sellers != 1 else ''}, lowest ${format_price(low)})"
+                for name, pct, sellers, low in zip(rows['product_name'], rows['diff_pct'], rows['competitors'],
+                                                   rows['competitor_min'])]
+
+    return {
+        # Calculate avg price difference %
+        "avg_diff": float(priced['diff_pct'].mean()) if len(priced) else 0,
+        "losing_items": describe(losing, "+"),
+        "winning_items": describe(winning, ""),
+        "sellers": int(priced['competitors'].sum()),
+        "promo_share": float(priced['promo_count'].sum() / max(priced['competitors'].sum(), 1) * 100),
+        # Undercut even by our cheapest rival's regular-or-promo price
+        "undercut": int((priced['my_price'] > priced['competitor_min']).sum()),
+    }
+
+# Shared object (not copied per rerun): id lookups and name search over the whole catalog
+@st.cache_resource(show_spinner=False, max_entries=2)
+def product_catalog(version):
+    return CatalogIndex(agent.data.get("inventory"), agent.inventory.analyze_all(), agent.competitor.compare_all())
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def product_section(version, product_id):
+    return agent.inventory.analyze_product(product_id)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def velocity_section(version, product_id):
+    return agent.inventory.sales_velocity(product_id)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def sales_chart_data(version, product_id, range_key, resolution, max_points=300):
+    # Resampled + LTTB-downsampled slice of one SKU (see chart_data.py): at most
+    # max_points rows per SKU reach the browser, however long the history is
+    store = agent.data.get("sales_store")
+    start, end = date_range(store, range_key)
+    return chart_series(store, product_id, start, end, resolution, max_points)
+
 # --- SIDEBAR: CONTROLS ---
 st.sidebar.title("🎛️ Control Panel")
 
@@ -35,6 +177,17 @@ if crisis_mode:
 st.sidebar.markdown("---")
 st.sidebar.info("System Status: ONLINE")
 
+with st.sidebar.expander("🔔 Status Changes", expanded=bool(status_delta)):
+    if not status_changes:
+        st.caption("No SKU has changed status since the dashboard started.")
+    for change in list(status_changes):
+        st.markdown(f"**{change.at:%H:%M:%S}** · {change.summary()}")
+        for moves, arrow in ((change.entered, "→"), (change.left, "←")):
+            for bucket, ids in moves.items():
+                if ids:
+                    shown = ", ".join(map(str, ids[:5])) + (f" +{len(ids) - 5} more" if len(ids) > 5 else "")
+                    st.caption(f"{arrow} {FILTERS[bucket]}: {shown}")
+
 # --- MAIN DASHBOARD ---
 st.title("🚀 Autonomous Marketing Agent")
 if crisis_mode:
@@ -43,7 +196,7 @@ else:
     st.markdown("### *Intelligence-Driven Decisions, Not Just Ads.*")
 
 # --- 1. LIVE METRICS ROW ---
-fin_status = agent.finance.get_status()
+fin_status = finance_section(source_version("financials"))
 col1, col2, col3 = st.columns(3)
 
 with col1:
@@ -56,20 +209,11 @@ with col1:
 
 with col2:
     st.markdown("### 📦 Inventory Health")
-    # Dynamic Inventory Metrics
-    total_skus = len(agent.inventory.df_inv)
-    
-    # Calculate overstocked items
-    overstocked_items = []
-    low_stock_items = []
-    
-    for pid in agent.inventory.df_inv['product_id']:
-        res = agent.inventory.analyze_product(pid)
-        if "OVERSTOCK" in res['status']:
-            overstocked_items.append(f"{res['product']} ({res['stock']} units)")
-        elif "LOW STOCK" in res['status']:
-            # Store tuple (display_string, product_id) so we can look up email later
-            low_stock_items.append((f"{res['product']} ({res['stock']} units)", pid))
+    # Dynamic Inventory Metrics (cached per data version)
+    inventory_health = inventory_section(inventory_version)
+    total_skus = inventory_health['total_skus']
+    overstocked_items = inventory_health['overstocked_items']
+    low_stock_items = inventory_health['low_stock_items']
             
     st.metric(label="Total SKUs", value=str(total_skus), delta=f"{len(overstocked_items)} Overstocked", delta_color="inverse")
     
@@ -82,6 +226,13 @@ with col2:
     if low_stock_items:
         with st.expander("🟡 Reorder Needed (Low Stock)", expanded=False):
             st.caption("Selling fast! Reorder immediately.")
+
+            # One click queues every low-stock SKU; the outbox sends one PO per vendor
+            if st.button("📦 Reorder all low stock", key="reorder_all"):
+                lines = [po_line(pid) for _, pid in low_stock_items]
+                outbox.enqueue(lines)
+                vendors = len({line['vendor_email'] for line in lines})
+                st.toast(f"Queued {len(lines)} items for {vendors} vendors.", icon="📤")
             
             # Create columns for layout
             for item_str, pid in low_stock_items:
@@ -91,39 +242,28 @@ with col2:
                 with c2:
                     # Unique key is needed for buttons in loop
                     if st.button(f"📧 Reorder", key=f"btn_{pid}"):
-                        # Find vendor email
-                        row = agent.inventory.df_inv[agent.inventory.df_inv['product_id'] == pid].iloc[0]
-                        v_email = row['vendor_email']
-                        
-                        with st.spinner(f"Sending PO to {v_email}..."):
-                            time.sleep(1.5) # Simulate network
-                        st.toast(f"Order sent to {v_email}!", icon="📤")
+                        line = po_line(pid)
+                        outbox.enqueue([line])
+                        st.toast(f"PO queued for {line['vendor_email']}!", icon="📤")
+
+            po_stats = outbox.stats()
+            st.caption(f"📬 Outbox: {po_stats['pending']} pending ({po_stats['pending_vendors']} vendors) · "
+                       f"{po_stats['sent']} sent · {po_stats['failed']} failed")
+
+    reorder_plan = forecast_section(inventory_version)
+    if reorder_plan:
+        with st.expander("📈 Forecast Reorder Plan", expanded=False):
+            st.caption("Forecast demand (weekly seasonality) vs. stock on hand.")
+            for name, qty, cover in reorder_plan[:5]: # Most urgent 5
+                st.write(f"• {name}: order {qty} units ({cover:.1f} days of cover)")
 
 with col3:
     st.markdown("### 🕵️ Market Status")
-    # Dynamic Market Metrics
-    # Calculate avg price difference %
-    diffs = []
-    losing_items = []
-    winning_items = []
-    
-    for pid in agent.inventory.df_inv['product_id']:
-        comp_data = agent.competitor.compare_price(pid)
-        my = comp_data['my_price']
-        comp = comp_data['competitor_price']
-        
-        if comp > 0:
-            diff_pct = ((my - comp) / comp) * 100
-            diffs.append(diff_pct)
-            
-            # Categorize significant differences
-            pname = agent.inventory.df_inv[agent.inventory.df_inv['product_id'] == pid]['product_name'].values[0]
-            if diff_pct > 5: # We are > 5% more expensive
-                losing_items.append(f"{pname} (+{diff_pct:.1f}%)")
-            elif diff_pct < -5: # We are > 5% cheaper
-                winning_items.append(f"{pname} ({diff_pct:.1f}%)")
-    
-    avg_diff = sum(diffs) / len(diffs) if diffs else 0
+    # Dynamic Market Metrics (cached per data version)
+    market_status = market_section(market_version)
+    avg_diff = market_status['avg_diff']
+    losing_items = market_status['losing_items']
+    winning_items = market_status['winning_items']
     
     pressure = "Medium"
     if avg_diff > 10: pressure = "High (Overpriced)"
@@ -131,18 +271,20 @@ with col3:
     
     delta_val = f"{avg_diff:+.1f}% Price Gap"
     st.metric(label="Competitor Pressure", value=pressure, delta=delta_val, delta_color="inverse")
+    st.caption(f"{market_status['sellers']} competitor prices tracked, {market_status['promo_share']:.0f}% on promo. "
+               f"{market_status['undercut']} SKUs have a cheaper seller.")
     
     # Detailed Expanders
     if losing_items:
         with st.expander("🚨 Losing Price War (Overpriced)", expanded=False):
             st.caption("We are significantly more expensive than market.")
-            for item in losing_items[:5]: # Show top 5
+            for item in losing_items: # Top 5
                 st.write(f"• {item}")
                 
     if winning_items:
         with st.expander("✅ Winning (Underpriced)", expanded=False):
             st.caption("We are beating the market price.")
-            for item in winning_items[:5]: # Show top 5
+            for item in winning_items: # Top 5
                 st.write(f"• {item}")
 
 st.divider()
@@ -151,26 +293,50 @@ st.divider()
 col_left, col_right = st.columns([1, 2])
 
 # Load Products
-df_inv = pd.read_csv("inventory.csv")
-product_list = df_inv['product_name'].tolist()
+catalog = product_catalog(source_version("inventory"))
+# Status filters follow the feed's deltas instead of a rebuild on every price or sales change
+if status_delta:
+    catalog.apply(status_delta)
+PAGE_SIZE = 50
 
 with col_left:
     st.subheader("1️⃣ Select Target")
-    selected_product_name = st.selectbox("Choose Product to Analyze", product_list)
+    # Typeahead over names/ids, narrowed by status; only one page of matches goes to the widget
+    f1, f2 = st.columns([3, 2])
+    with f1:
+        query = st.text_input("Search products", placeholder="Name or ID, e.g. gaming lap")
+    with f2:
+        status_filter = st.selectbox("Filter", [None, *FILTERS], format_func=lambda k: FILTERS.get(k, "All products"))
+    matches = catalog.match(query, status_filter)
+    if not len(matches):
+        st.warning("No products match this search. Showing all products.")
+        matches = catalog.match()
+    pages = max(1, -(-len(matches) // PAGE_SIZE))
+    # Keyed on the search so a new query starts again at page 1
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                           key=f"page_{query}_{status_filter}") if pages > 1 else 1
+    page_ids = catalog.ids[matches[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]].tolist()
+    st.caption(f"{len(matches)} matching products")
+
+    product_id = st.selectbox("Choose Product to Analyze", page_ids, format_func=catalog.label)
+    selected_product_name = catalog.name(product_id)
     
     # Get ID & Data
-    product_id = df_inv[df_inv['product_name'] == selected_product_name]['product_id'].values[0]
-    inv_data = agent.inventory.analyze_product(product_id)
+    inv_data = product_section(inventory_version, product_id)
     
-    # Calculate Velocity
-    velocity = round(inv_data['7d_sales'] / 7, 2)
+    # Velocity over each rolling window (7/30/90 days) + how long stock lasts
+    velocity = velocity_section(inventory_version, product_id)
+    velocity_text = " · ".join(f"{w}: {v}" for w, v in velocity.items() if w != "days_of_cover")
+    cover = velocity['days_of_cover']
+    cover_text = f"{cover:.0f} days" if cover != float("inf") else "No recent sales"
 
     # Product Status Card
     st.markdown(f"""
     <div style="padding:15px; background-color:#262730; border-radius:10px;">
         <b>📦 Stock:</b> {inv_data['stock']} units<br>
         <b>📉 7-Day Sales:</b> {inv_data['7d_sales']} units<br>
-        <b>⚡ Velocity:</b> {velocity} units/day<br>
+        <b>⚡ Velocity:</b> {velocity_text} units/day<br>
+        <b>⏳ Days of Cover:</b> {cover_text}<br>
         <b>⚠️ Status:</b> {inv_data['status']}
     </div>
     """, unsafe_allow_html=True)
@@ -184,28 +350,33 @@ with col_left:
     elif "LOW STOCK" in inv_data['status']:
         st.error("⚠️ Shortage Risk!")
         if st.button("📧 One Click Order", key=f"reorder_{product_id}"):
-            # Look up email
-            row = df_inv[df_inv['product_id'] == product_id].iloc[0]
-            vendor_email = row.get('vendor_email', "support@vendor.com")
-            
-            st.success(f"Email Drafted to {vendor_email}")
-            st.code(f"""Subject: Stock Reorder for {selected_product_name}\n\nDear Vendor,\n\nOur system indicates low stock for {selected_product_name} ({inv_data['stock']} units). Please process a reorder of 50 units.\n\nBest Regards,\nMSME Agent Bot""", language="text")
+            line = po_line(product_id)
+            outbox.enqueue([line])
+            st.success(f"PO line queued for {line['vendor_email']} ({line['qty']} units). "
+                       "It goes out with any other pending items for this vendor.")
     
-    # LOAD & FILTER SALES DATA
-    df_sales = pd.read_csv("sales_history.csv")
-
-    # We need to reshape the data for the chart
-    sales_col = f"{product_id}_sales"
-
-    # Create a clean dataframe for plotting
-    chart_data = pd.DataFrame({
-        "Date": df_sales["date"],
-        "Sales": df_sales[sales_col]
-    })
+    # SALES TREND (cached per data version, SKU, range and resolution)
+    c1, c2 = st.columns(2)
+    with c1:
+        range_key = st.selectbox("Range", list(RANGES), index=1, format_func=lambda k: "All" if k == "all" else k)
+    with c2:
+        resolution = st.selectbox("Resolution", ["auto", *RESOLUTIONS], format_func=str.capitalize)
+    compare_ids = st.multiselect("Compare with", [pid for pid in page_ids if pid != product_id],
+                                 format_func=catalog.label, max_selections=5)
+    if resolution == "auto":
+        resolution = auto_resolution(range_days(agent.data.get("sales_store"), range_key))
+    chart_data = pd.concat([sales_chart_data(source_version("sales_store"), pid, range_key, resolution)
+                            for pid in [product_id, *compare_ids]], ignore_index=True)
+    chart_data["Product"] = chart_data["Product"].map(catalog.label)
 
     # Create the Line Chart
-    fig = px.line(chart_data, x="Date", y="Sales", title=f"7-Day Sales Trend: {selected_product_name}", markers=True)
-    fig.update_layout(height=250, margin=dict(l=20, r=20, t=30, b=20))
+    range_label = "All history" if range_key == "all" else f"Last {range_key}"
+    title = f"{resolution.capitalize()} Sales, {range_label}: {selected_product_name}"
+    if compare_ids:
+        title = f"{resolution.capitalize()} Sales, {range_label}: {len(compare_ids) + 1} products"
+    fig = px.line(chart_data, x="Date", y="Sales", color="Product", title=title, markers=len(chart_data) <= 120)
+    fig.update_layout(height=250 if not compare_ids else 320, margin=dict(l=20, r=20, t=30, b=20),
+                      showlegend=bool(compare_ids))
 
     # Display it
     st.plotly_chart(fig, use_container_width=True)
@@ -213,60 +384,98 @@ with col_left:
 with col_right:
     st.subheader("2️⃣ Agent Decision")
     if st.button("🧠 GENERATE STRATEGY", type="primary"):
-        with st.spinner("🤖 Consulting Finance, Inventory & Competitor Agents..."):
-            # Artificial delay for effect
-            time.sleep(1.5) 
-            
-            # Call Agent
-            strategy = agent.generate_strategy(product_id, crisis_mode=crisis_mode)
-            
-            # Show Result
-            st.success("Analysis Complete")
-            st.markdown(f"### 🎯 Strategy: {selected_product_name}")
-            st.markdown(strategy)
-
-            st.markdown("---")
-            st.markdown("### ⚡ Automate Execution")
-
-            # Define the action button based on the decision
-            col_btn1, col_btn2 = st.columns(2)
-
-            with col_btn1:
-                if st.button("🚀 Launch Campaign (Meta Ads)"):
-                    with st.status("Connecting to Ad Manager...", expanded=True) as status:
-                        st.write("Checking Budget...")
-                        time.sleep(1)
-                        if crisis_mode:
-                            status.update(label="❌ ACTION BLOCKED", state="error", expanded=False)
-                            st.error("Transaction Declined: Finance Agent block due to Low Cash.")
-                        else:
-                            st.write("Drafting Ad Copy...")
-                            time.sleep(1)
-                            st.write("Setting Bid Cap...")
-                            time.sleep(1)
-                            status.update(label="✅ Campaign Active!", state="complete", expanded=False)
-                            st.toast("Campaign ID #9823 Live on Facebook!", icon="🚀")
-
-            with col_btn2:
-                if st.button("📧 Send Email Blast"):
-                    with st.spinner("Sending to 5,000 subscribers..."):
-                        time.sleep(2)
-                    st.toast("Email Dispatched!", icon="📨")
+        st.markdown(f"### 🎯 Strategy: {selected_product_name}")
+        # Stream the decision as the model writes it (audited once the stream completes)
+        st.write_stream(agent.stream_strategy(product_id, crisis_mode=crisis_mode))
+        st.success("Analysis Complete")
+
+        st.markdown("---")
+        st.markdown("### ⚡ Automate Execution")
+
+        # Define the action button based on the decision
+        col_btn1, col_btn2 = st.columns(2)
+
+        with col_btn1:
+            if st.button("🚀 Launch Campaign (Meta Ads)"):
+                with st.status("Connecting to Ad Manager...", expanded=True) as status:
+                    st.write("Checking Budget...")
+                    if crisis_mode:
+                        status.update(label="❌ ACTION BLOCKED", state="error", expanded=False)
+                        st.error("Transaction Declined: Finance Agent block due to Low Cash.")
+                    else:
+                        st.write("Drafting Ad Copy...")
+                        st.write("Setting Bid Cap...")
+                        status.update(label="✅ Campaign Active!", state="complete", expanded=False)
+                        st.toast("Campaign ID #9823 Live on Facebook!", icon="🚀")
+
+        with col_btn2:
+            if st.button("📧 Send Email Blast"):
+                st.toast("Email Dispatched!", icon="📨")
 
     with st.expander("🛠️ System Architecture"):
         st.image("architecture.png")
 
 # --- 3. RAW DATA (For Credibility) ---
 with st.expander("📊 View Live Data Feeds"):
-    st.dataframe(pd.read_csv("inventory.csv"))
+    st.dataframe(catalog.frame)
 
 # --- 4. AUDIT TRAIL (Compliance) ---
 st.divider()
 st.subheader("📜 Audit & Compliance Log")
 st.markdown("Every AI decision is hashed and logged for traceability.")
 
+if st.button("🔐 Verify Log Integrity"):
+    with st.spinner("Re-checking the hash chain..."):
+        result = agent.audit.verify()
+    if result['ok']:
+        st.success(f"Hash chain intact: {result['records_checked']} records checked across {result['segments_checked']} segment(s).")
+    else:
+        st.error("Tampering detected: " + "; ".join(result['errors']))
+
 logs = agent.audit.get_recent_logs()
+if agent.audit.writer.unwritten:
+    st.warning(f"⚠️ {agent.audit.writer.unwritten} audit record(s) could not be written yet and are being retried: "
+               f"{agent.audit.writer.last_error}")
 if not logs.empty:
     st.dataframe(logs, use_container_width=True)
 else:
-    st.info("No audit logs available yet. Generate a strategy to create records.")
\ No newline at end of file
+    st.info("No audit logs available yet. Generate a strategy to create records.")
+
+# --- 5. DEBUG METRICS (Sidebar) ---
+metrics.observe("app.rerun", time.perf_counter() - rerun_started)
+if profiler is not None:
+    st.session_state["profile_report"] = profiler.stop()
+
+with st.sidebar.expander("🐞 Debug Metrics", expanded=False):
+    if st.toggle("Collect metrics", value=metrics.enabled(), key="metrics_enabled"):
+        metrics.enable()
+    else:
+        metrics.disable()
+
+    snap = metrics.snapshot()
+    if snap['spans']:
+        spans = pd.DataFrame.from_dict(snap['spans'], orient="index")
+        spans[['total_s', 'mean_s', 'min_s', 'max_s']] *= 1000
+        st.caption("Spans (ms)")
+        st.dataframe(spans.rename(columns=lambda c: c.replace("_s", "_ms")).sort_values("total_ms", ascending=False), use_container_width=True)
+    if snap['counters']:
+        st.caption("Counters")
+        st.json(snap['counters'])
+    st.caption("Decision cache")
+    st.json(agent.cache.stats())
+
+    d1, d2 = st.columns(2)
+    with d1:
+        st.download_button("JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
+    with d2:
+        st.download_button("Prometheus", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+
+    # Callbacks run before the rerun the click triggers, so that rerun is the one profiled
+    c1, c2 = st.columns(2)
+    with c1:
+        st.button("Reset", on_click=metrics.reset)
+    with c2:
+        st.button("Profile one rerun", on_click=lambda: st.session_state.update(profile_next_rerun=True))
+    if "profile_report" in st.session_state:
+        st.caption("cProfile (last profiled rerun)")
+        st.code(st.session_state["profile_report"], language="text")
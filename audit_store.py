@@ -0,0 +1,386 @@
+import os
+import re
+import csv
+import json
+import hashlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# --- AUDIT LOG SEGMENTS & INDEX ---
+# The active log (audit_log.csv) is rotated once it grows past a size limit:
+#
+#   audit_log.csv              active segment (appended to by AuditWriter)
+#   audit_log.00001.csv        sealed segments, oldest first
+#   audit_log.00001.idx.json   sidecar index: row count, time range, product ids, agent names
+#   audit_log.checkpoints.jsonl one checkpoint per sealed segment (chain start/end + Merkle root)
+#   audit_log.verified.json    last checkpoint that verify() proved intact
+#
+# Reads never load the whole history: tail() seeks backwards from the end of the newest
+# segment, and query() uses the sidecar indexes to skip segments that cannot match.
+#
+# Integrity: every record carries record_hash = sha256(previous record_hash + its fields),
+# so editing, dropping or reordering any row breaks the chain from that point on.
+# Checkpoints are themselves hash-chained, which lets verify() check sealed segments
+# independently (in parallel) and resume from the last trusted checkpoint.
+
+HEADER = ["timestamp", "agent_name", "product_id", "action_taken", "reasoning_hash", "status", "record_hash"]
+LEGACY_HEADER = HEADER[:-1]
+GENESIS_HASH = "0" * 64
+
+
+# --- HASH CHAIN ---
+def record_hash(prev_hash, fields):
+    return hashlib.sha256((prev_hash + json.dumps(list(fields))).encode()).hexdigest()
+
+
+def chain(prev_hash, rows):
+    # Append record_hash to each row; returns (chained rows, last hash)
+    chained = []
+    for row in rows:
+        fields = [str(v) for v in row]
+        prev_hash = record_hash(prev_hash, fields)
+        chained.append(fields + [prev_hash])
+    return chained, prev_hash
+
+
+def merkle_root(hashes):
+    level = [bytes.fromhex(h) for h in hashes]
+    if not level:
+        return GENESIS_HASH
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def _split(log_file):
+    base, ext = os.path.splitext(log_file)
+    return base, ext or ".csv"
+
+
+def segment_path(log_file, number):
+    base, ext = _split(log_file)
+    return f"{base}.{number:05d}{ext}"
+
+
+def index_path(segment):
+    base, _ = os.path.splitext(segment)
+    return f"{base}.idx.json"
+
+
+def sealed_segments(log_file):
+    # Sealed segment paths, oldest first
+    base, ext = _split(log_file)
+    folder = os.path.dirname(os.path.abspath(log_file))
+    pattern = re.compile(re.escape(os.path.basename(base)) + r"\.(\d{5})" + re.escape(ext) + "$")
+    found = []
+    for name in os.listdir(folder):
+        m = pattern.match(name)
+        if m:
+            found.append((int(m.group(1)), os.path.join(os.path.dirname(log_file), name)))
+    return [path for _, path in sorted(found)]
+
+
+def checkpoints_path(log_file):
+    base, _ = _split(log_file)
+    return f"{base}.checkpoints.jsonl"
+
+
+def verified_path(log_file):
+    base, _ = _split(log_file)
+    return f"{base}.verified.json"
+
+
+def load_checkpoints(log_file):
+    try:
+        with open(checkpoints_path(log_file)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def checkpoint_hash(checkpoint):
+    fields = {k: v for k, v in checkpoint.items() if k != "checkpoint_hash"}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+def read_segment(segment):
+    return pd.read_csv(segment, dtype=str, keep_default_na=False)
+
+
+def last_hash(log_file):
+    # Chain head: last record of the active file, else end of the last sealed segment
+    if os.path.exists(log_file):
+        rows = _tail_rows(log_file, 1)
+        if rows and len(rows[-1]) == len(HEADER):
+            return rows[-1][-1]
+    checkpoints = load_checkpoints(log_file)
+    return checkpoints[-1]["end_hash"] if checkpoints else GENESIS_HASH
+
+
+def build_index(segment, df=None):
+    if df is None:
+        df = read_segment(segment)
+    index = {
+        "rows": len(df),
+        "bytes": os.path.getsize(segment),
+        "first_ts": df["timestamp"].min() if len(df) else None,
+        "last_ts": df["timestamp"].max() if len(df) else None,
+        "products": sorted(df["product_id"].unique().tolist()),
+        "agents": sorted(df["agent_name"].unique().tolist()),
+    }
+    tmp = index_path(segment) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path(segment))
+    return index
+
+
+def seal(log_file):
+    # Rotate the active segment. Caller must hold the exclusive lock on the active file.
+    sealed = sealed_segments(log_file)
+    number = 1
+    if sealed:
+        number = int(re.search(r"\.(\d{5})\.[^.]+$", sealed[-1]).group(1)) + 1
+    target = segment_path(log_file, number)
+    df = read_segment(log_file)
+
+    # Checkpoint: where this segment's chain starts/ends and the Merkle root of its records.
+    # Written BEFORE the rename, so a writer that creates the next active file always
+    # finds the chain head in the checkpoints file.
+    checkpoints = load_checkpoints(log_file)
+    start_hash = checkpoints[-1]["end_hash"] if checkpoints else GENESIS_HASH
+    hashes = df["record_hash"].tolist()
+    checkpoint = {
+        "segment": os.path.basename(target),
+        "rows": len(hashes),
+        "start_hash": start_hash,
+        "end_hash": hashes[-1] if hashes else start_hash,
+        "merkle_root": merkle_root(hashes),
+        "prev_checkpoint": checkpoints[-1]["checkpoint_hash"] if checkpoints else GENESIS_HASH,
+    }
+    checkpoint["checkpoint_hash"] = checkpoint_hash(checkpoint)
+    with open(checkpoints_path(log_file), "a") as f:
+        f.write(json.dumps(checkpoint) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(log_file, target)
+    # The next writer recreates the active file (with a header) on its first batch
+    build_index(target, df)
+    return target
+
+
+def upgrade(log_file):
+    # One-time migration of a pre-chain log (no record_hash column): chain the existing rows
+    if not os.path.exists(log_file):
+        return False
+    with open(log_file, newline="") as f:
+        if next(csv.reader(f), None) != LEGACY_HEADER:
+            return False
+
+    fd = os.open(log_file, os.O_RDWR)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        with open(log_file, newline="") as f:
+            rows = list(csv.reader(f))
+        if rows[0] != LEGACY_HEADER:
+            return False  # another process got here first
+        checkpoints = load_checkpoints(log_file)
+        chained, _ = chain(checkpoints[-1]["end_hash"] if checkpoints else GENESIS_HASH, rows[1:])
+
+        tmp = log_file + ".upgrade.tmp"
+        with open(tmp, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(chained)
+        # Writers waiting on the old file notice the inode change and reopen
+        os.replace(tmp, log_file)
+        return True
+    finally:
+        os.close(fd)
+
+
+def verify_segment(segment, start_hash):
+    # Recompute the chain over one segment. Top-level so it can run in a worker process.
+    prev = start_hash
+    hashes = []
+    try:
+        f = open(segment, newline="")
+    except FileNotFoundError:
+        return {"segment": segment, "ok": False, "missing": True, "rows": 0, "bad_line": None,
+                "end_hash": prev, "merkle_root": None}
+    with f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for line_no, row in enumerate(reader, start=2):
+            expected = record_hash(prev, row[:-1])
+            if len(row) != len(HEADER) or row[-1] != expected:
+                return {"segment": segment, "ok": False, "missing": False, "rows": len(hashes),
+                        "bad_line": line_no, "end_hash": prev, "merkle_root": None}
+            hashes.append(expected)
+            prev = expected
+    return {"segment": segment, "ok": True, "missing": False, "rows": len(hashes), "bad_line": None,
+            "end_hash": prev, "merkle_root": merkle_root(hashes)}
+
+
+def _tail_rows(path, n, block=65536):
+    # Read backwards in blocks until we have n complete lines (or hit the header)
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+
+    # A writer may be mid-append: ignore a trailing partial line
+    if not data.endswith(b"\n"):
+        data = data[:data.rfind(b"\n") + 1]
+    # First line is either partial (pos > 0) or the header (pos == 0)
+    lines = data.decode("utf-8", errors="replace").splitlines()[1:]
+    return list(csv.reader(lines[-n:])) if n > 0 else []
+
+
+class AuditLog:
+    def __init__(self, log_file="audit_log.csv"):
+        self.log_file = log_file
+
+    def segments(self):
+        # Oldest -> newest; the active file is always last
+        paths = sealed_segments(self.log_file)
+        if os.path.exists(self.log_file):
+            paths.append(self.log_file)
+        return paths
+
+    def verify(self, workers=None, full=False):
+        # Prove the log has not been edited. Sealed segments are checked in parallel against
+        # their checkpoints; unless full=True, segments covered by the last trusted checkpoint
+        # are skipped. The active segment is chained on from the last checkpoint.
+        errors = []
+        checkpoints = load_checkpoints(self.log_file)
+
+        # 1. The checkpoint chain itself (cheap: one line per segment)
+        prev = GENESIS_HASH
+        for i, cp in enumerate(checkpoints):
+            if cp["prev_checkpoint"] != prev or checkpoint_hash(cp) != cp["checkpoint_hash"]:
+                errors.append(f"Checkpoint {i} ({cp['segment']}) is not chained correctly")
+            if i and cp["start_hash"] != checkpoints[i - 1]["end_hash"]:
+                errors.append(f"Segment {cp['segment']} does not continue the previous segment's chain")
+            prev = cp["checkpoint_hash"]
+
+        # 2. Resume point
+        start = 0
+        resumed_from = None
+        if not full and not errors:
+            try:
+                with open(verified_path(self.log_file)) as f:
+                    trusted = json.load(f)
+                pos = trusted["position"]
+                if pos < len(checkpoints) and checkpoints[pos]["checkpoint_hash"] == trusted["checkpoint_hash"]:
+                    start = pos + 1
+                    resumed_from = checkpoints[pos]["segment"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        # 3. Sealed segments, in parallel
+        folder = os.path.dirname(self.log_file)
+        todo = checkpoints[start:]
+        segments = [os.path.join(folder, cp["segment"]) for cp in todo]
+        records = 0
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(verify_segment, segments, [cp["start_hash"] for cp in todo]))
+            for cp, res in zip(todo, results):
+                records += res["rows"]
+                if res["missing"]:
+                    # Deleted, or a seal that crashed between its checkpoint and the rename
+                    errors.append(f"{cp['segment']}: segment missing")
+                elif not res["ok"]:
+                    errors.append(f"{cp['segment']}: chain broken at line {res['bad_line']}")
+                elif (res["rows"], res["end_hash"], res["merkle_root"]) != (cp["rows"], cp["end_hash"], cp["merkle_root"]):
+                    errors.append(f"{cp['segment']}: does not match its checkpoint")
+
+        # 4. Active segment
+        if os.path.exists(self.log_file):
+            head = checkpoints[-1]["end_hash"] if checkpoints else GENESIS_HASH
+            res = verify_segment(self.log_file, head)
+            records += res["rows"]
+            # (Missing here just means another process rotated it meanwhile)
+            if not res["ok"] and not res["missing"]:
+                errors.append(f"{os.path.basename(self.log_file)}: chain broken at line {res['bad_line']}")
+
+        # Remember the newest checkpoint we have now proven intact
+        if not errors and checkpoints:
+            trusted = {"position": len(checkpoints) - 1, "checkpoint_hash": checkpoints[-1]["checkpoint_hash"]}
+            tmp = verified_path(self.log_file) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(trusted, f)
+            os.replace(tmp, verified_path(self.log_file))
+
+        return {
+            "ok": not errors,
+            "segments_checked": len(todo) + (1 if os.path.exists(self.log_file) else 0),
+            "records_checked": records,
+            "resumed_from": resumed_from,
+            "errors": errors,
+        }
+
+    def load_index(self, segment):
+        try:
+            with open(index_path(segment)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Missing or corrupt sidecar: rebuild it
+            return build_index(segment)
+
+    def tail(self, n=10):
+        # Last n records, oldest first, crossing into older segments only if needed
+        rows = []
+        for segment in reversed(self.segments()):
+            rows = _tail_rows(segment, n - len(rows)) + rows
+            if len(rows) >= n:
+                break
+        return pd.DataFrame(rows, columns=HEADER)
+
+    def query(self, product_id=None, agent_name=None, start=None, end=None):
+        # Timestamps are "YYYY-MM-DD HH:MM:SS", so string comparison is chronological
+        parts = []
+        for segment in self.segments():
+            if segment != self.log_file:
+                index = self.load_index(segment)
+                if product_id is not None and product_id not in index["products"]:
+                    continue
+                if agent_name is not None and agent_name not in index["agents"]:
+                    continue
+                if index["rows"] == 0:
+                    continue
+                if start is not None and index["last_ts"] < start:
+                    continue
+                if end is not None and index["first_ts"] > end:
+                    continue
+
+            df = read_segment(segment)
+            mask = pd.Series(True, index=df.index)
+            if product_id is not None:
+                mask &= df["product_id"] == product_id
+            if agent_name is not None:
+                mask &= df["agent_name"] == agent_name
+            if start is not None:
+                mask &= df["timestamp"] >= start
+            if end is not None:
+                mask &= df["timestamp"] <= end
+            parts.append(df[mask])
+
+        if not parts:
+            return pd.DataFrame(columns=HEADER)
+        return pd.concat(parts, ignore_index=True)
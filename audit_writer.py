@@ -0,0 +1,240 @@
+import io
+import os
+import csv
+import time
+import queue
+import atexit
+import threading
+import audit_store
+import metrics
+
+try:
+    import fcntl  # POSIX only; used to keep batches from different processes apart
+except ImportError:
+    fcntl = None
+
+# --- BUFFERED AUDIT WRITER ---
+# log_event() only enqueues a row. A background thread drains the queue and appends
+# rows in batches, triggered by size (batch_size rows) or time (flush_interval seconds).
+#
+# Each batch goes out as ONE append write while holding an exclusive file lock, so rows
+# from other threads or processes can never interleave mid-line. The lock also guards the
+# hash chain: each batch is chained onto the current last record (see audit_store.py).
+#
+# Durability policy, applied once per batch that has been written:
+#   "none"   hand the batch to the OS and move on (survives a process crash)
+#   "flush"  also fdatasync the data (survives power loss, metadata may lag)
+#   "fsync"  full fsync of data and metadata
+# Rows still queued (or held back after a failed write) live only in memory: in every
+# mode they are lost if the process crashes before they are written. flush() closes that gap.
+#
+# A batch that cannot be written is never dropped: its rows are held and retried, ahead of
+# newer rows, with exponential backoff. flush() returns False and write() raises
+# AuditWriteError (once max_held rows are waiting) until the log is writable again.
+DURABILITY = ("none", "flush", "fsync")
+
+# How long flush() waits for the writer thread before giving up (seconds)
+FLUSH_TIMEOUT = 30.0
+# Retry delay after a failed write: RETRY_INTERVAL * 2**(failures - 1), capped at MAX_RETRY_DELAY
+RETRY_INTERVAL = 0.5
+MAX_RETRY_DELAY = 30.0
+
+_STOP = object()
+
+
+class AuditWriteError(RuntimeError):
+    pass
+
+
+class AuditWriter:
+    # One writer per log file per process, shared by every AuditAgent
+    _writers = {}
+    _writers_guard = threading.Lock()
+
+    @classmethod
+    def for_file(cls, path, **kwargs):
+        key = os.path.abspath(path)
+        with cls._writers_guard:
+            writer = cls._writers.get(key)
+            if writer is None or writer.closed:
+                writer = cls(path, **kwargs)
+                cls._writers[key] = writer
+            else:
+                # The shared writer keeps its settings: refuse to silently drop different ones
+                conflicts = {k: v for k, v in kwargs.items() if getattr(writer, k) != v}
+                if conflicts:
+                    raise ValueError(f"{path} already has a writer with different settings: "
+                                     + ", ".join(f"{k}={getattr(writer, k)!r} (asked {v!r})"
+                                                 for k, v in conflicts.items()))
+            return writer
+
+    def __init__(self, path, batch_size=512, flush_interval=0.2, durability="none",
+                 max_segment_bytes=64 * 1024 * 1024, max_held=100000):
+        if durability not in DURABILITY:
+            raise ValueError(f"durability must be one of {DURABILITY}, got '{durability}'")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        # Rotate the active file into a sealed, indexed segment past this size (None = never)
+        self.max_segment_bytes = max_segment_bytes
+        self.closed = False
+        self.rows_written = 0
+        self.batches_written = 0
+        self.last_error = None
+        # Rows whose write failed, retried before anything newer (at most max_held before
+        # write() refuses new rows)
+        self.max_held = max_held
+        self._held = []
+        self._failures = 0
+        self._retry_at = None
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        # Drain whatever is still queued when the interpreter exits
+        atexit.register(self.close)
+
+    @property
+    def unwritten(self):
+        # Rows held back by failed writes (not counting the queue)
+        return len(self._held)
+
+    def write(self, row):
+        if self.closed:
+            raise RuntimeError("AuditWriter is closed")
+        if len(self._held) >= self.max_held:
+            raise AuditWriteError(f"{len(self._held)} audit rows could not be written to {self.path}: "
+                                  f"{self.last_error!r}")
+        self._queue.put(row)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        # Block until every row queued before this call is on disk. False if some could not
+        # be written (still held for retry: see last_error), or the writer thread is gone or
+        # did not answer within timeout.
+        if self.closed:
+            return not self._held
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout) and not self._held
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            wake = [t for t in (deadline if batch else None, self._retry_at if self._held else None)
+                    if t is not None]
+            timeout = max(0.0, min(wake) - time.monotonic()) if wake else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # Time threshold reached, or held rows are due for another attempt
+                self._write_batch(batch)
+                batch = []
+                continue
+
+            if item is _STOP:
+                self._write_batch(batch)
+                # Last chance before the process exits: a few quick retries
+                for _ in range(3):
+                    if not self._held:
+                        break
+                    time.sleep(RETRY_INTERVAL)
+                    self._write_batch([])
+                return
+            if isinstance(item, threading.Event):
+                try:
+                    self._write_batch(batch)
+                finally:
+                    # Never leave a flush() waiting
+                    batch = []
+                    item.set()
+                continue
+
+            batch.append(item)
+            if len(batch) == 1:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+
+    def _open_locked(self):
+        # Open the active file and take the exclusive lock. If another process rotated
+        # it while we waited, our descriptor points at a sealed segment: reopen.
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    @staticmethod
+    def _header():
+        buf = io.StringIO()
+        csv.writer(buf).writerow(audit_store.HEADER)
+        return buf.getvalue().encode()
+
+    def _write_batch(self, rows):
+        # Held rows first, so the log keeps event order
+        rows = self._held + rows
+        if not rows:
+            return
+        written = False
+        try:
+            with metrics.span("audit.write_batch"):
+                fd = self._open_locked()
+                try:
+                    # Link this batch onto the chain head (read under the lock)
+                    chained, _ = audit_store.chain(audit_store.last_hash(self.path), rows)
+                    buf = io.StringIO()
+                    csv.writer(buf).writerows(chained)
+                    data = buf.getvalue().encode()
+                    if os.fstat(fd).st_size == 0:
+                        data = self._header() + data
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    written = True
+                    with metrics.span("audit.sync"):
+                        if self.durability == "flush" and hasattr(os, "fdatasync"):
+                            os.fdatasync(fd)
+                        elif self.durability != "none":
+                            os.fsync(fd)
+                    if self.max_segment_bytes and os.fstat(fd).st_size >= self.max_segment_bytes:
+                        with metrics.span("audit.seal"):
+                            audit_store.seal(self.path)
+                finally:
+                    # Closing the descriptor also releases the lock
+                    os.close(fd)
+        except Exception as e:
+            # Any failure (I/O, or a bad segment while sealing) must not kill the writer
+            # thread: surface it via last_error, and keep rows that never reached the file
+            self.last_error = e
+            metrics.incr("audit.write_errors")
+            if not written:
+                self._held = rows
+                self._failures += 1
+                delay = min(MAX_RETRY_DELAY, RETRY_INTERVAL * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + delay
+                metrics.incr("audit.write_retries")
+                return
+        self._held = []
+        self._failures = 0
+        self._retry_at = None
+        self.rows_written += len(rows)
+        self.batches_written += 1
+        metrics.incr("audit.rows_written", len(rows))
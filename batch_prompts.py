@@ -0,0 +1,131 @@
+import re
+import json
+
+# --- BATCHED PROMPTS ---
+# One request decides many SKUs: the shared business context (cash) is sent once, then one
+# compact row per product. The model answers with a JSON array, one object per product,
+# checked against DECISION_SCHEMA. Objects that are missing or invalid are reported back by
+# product_id so the caller can split and retry just those.
+
+DECISIONS = ("Aggressive Push", "Liquidation", "Hold", "Price Match")
+ROW_FIELDS = ("product_id", "product", "inventory", "stock", "sales_7d", "my_price", "competitor_price", "competitor_min",
+              "position")
+
+# Documented shape of one answer (validated by validate_decision, no jsonschema dependency)
+DECISION_SCHEMA = {
+    "type": "object",
+    "required": ["product_id", "decision", "reasoning", "action"],
+    "properties": {
+        "product_id": {"type": "string"},
+        "decision": {"enum": list(DECISIONS)},
+        "reasoning": {"type": "string"},
+        "action": {"type": "string"},
+    },
+}
+
+_CANONICAL = {d.lower(): d for d in DECISIONS}
+
+
+def _cell(value):
+    # Rows are pipe-separated: keep cells on one line and pipe-free
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def build_batch_prompt(fin_status, rows):
+    # rows: dicts with ROW_FIELDS
+    header = " | ".join(ROW_FIELDS)
+    table = "\n".join(" | ".join(_cell(row[f]) for f in ROW_FIELDS) for row in rows)
+    choices = " | ".join(DECISIONS)
+    return f"""
+        You are an Autonomous Marketing Agent. Make a strategic decision for EACH product below.
+
+        --- BUSINESS CONTEXT (applies to every product) ---
+        💰 CASH STATUS: {fin_status['message']}
+
+        --- PRODUCTS ({len(rows)}) ---
+        {header}
+BATCH ROWS:
+{table}
+END ROWS
+
+        --- MISSION ---
+        Decide the immediate marketing action for every product.
+
+        CRITICAL INSTRUCTION:
+        If CASH STATUS is CRITICAL/EMERGENCY, you MUST choose "Liquidation" or "Hold". Do not spend money on Ads.
+        If inventory is OVERSTOCK, you MUST clear it.
+
+        OUTPUT FORMAT (JSON only, no prose):
+        [{{"product_id": "...", "decision": "{choices}", "reasoning": "short explanation", "action": "specific tactic"}}]
+        Return exactly one object per product_id listed above.
+        """
+
+
+def parse_batch_rows(prompt):
+    # Inverse of build_batch_prompt's table (used by the offline backend)
+    block = prompt.split("BATCH ROWS:\n", 1)[1].split("\nEND ROWS", 1)[0]
+    return [dict(zip(ROW_FIELDS, (cell.strip() for cell in line.split("|")))) for line in block.splitlines() if line.strip()]
+
+
+def _extract_json(text):
+    # Accept bare JSON or JSON inside a ``` fence
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("No JSON array in model response")
+    return json.loads(text[start:end + 1])
+
+
+def validate_decision(item):
+    # Normalized copy of one answer, or raise ValueError
+    if not isinstance(item, dict):
+        raise ValueError("Decision is not an object")
+    for field in DECISION_SCHEMA["required"]:
+        if not isinstance(item.get(field), str) or not item[field].strip():
+            raise ValueError(f"Missing or empty '{field}'")
+    decision = _CANONICAL.get(item["decision"].strip().lower())
+    if decision is None:
+        raise ValueError(f"Unknown decision '{item['decision']}'")
+    return {
+        "product_id": item["product_id"].strip(),
+        "decision": decision,
+        "reasoning": item["reasoning"].strip(),
+        "action": item["action"].strip(),
+    }
+
+
+def parse_batch_response(text, product_ids):
+    # Returns ({product_id: decision}, {product_id: error}) covering every requested id
+    wanted = set(product_ids)
+    decided, errors = {}, {}
+    try:
+        items = _extract_json(text)
+        if not isinstance(items, list):
+            raise ValueError("Model response is not a JSON array")
+    except ValueError as e:
+        return {}, {pid: str(e) for pid in product_ids}
+
+    for item in items:
+        try:
+            decision = validate_decision(item)
+        except ValueError:
+            continue
+        if decision["product_id"] in wanted and decision["product_id"] not in decided:
+            decided[decision["product_id"]] = decision
+
+    for pid in product_ids:
+        if pid not in decided:
+            errors[pid] = "No valid decision returned"
+    return decided, errors
+
+
+def format_decision(decision):
+    # Same markdown as the single-product prompt's output
+    return (
+        f"**DECISION:** {decision['decision']}\n"
+        f"**REASONING:** {decision['reasoning']}\n"
+        f"**ACTION:** {decision['action']}"
+    )
@@ -0,0 +1,261 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from data_context import DataContext
+from agents import InventoryAgent, CompetitorAgent, AuditAgent
+from audit_writer import AuditWriteError
+from decision_cache import DecisionCache
+from marketing_agent import MarketingAgent
+from batch_prompts import format_decision
+
+# --- HEADLESS BATCH RUN ---
+# Evaluates the catalog (or a filtered subset) without the dashboard:
+#   1. Vectorized inventory + competitor analysis picks the SKUs that need a decision
+#      (anything not NORMAL on stock, or >5% off the competitor price; --all for every SKU).
+#   2. The plan is split into chunks and fanned out over a process pool. Each worker loads
+#      the data once and runs MarketingAgent.generate_strategies (threaded model calls)
+#      for its chunk, then writes the chunk's decisions as a parquet part.
+#   3. Parts are merged into one columnar output file.
+#
+# The plan and finished parts live in a checkpoint directory, so a killed run started again
+# with the same arguments skips every finished chunk and picks up where it stopped.
+#
+#   python batch_run.py --output decisions.parquet --workers 4
+#   python batch_run.py --status low,overstock --limit 500 --crisis
+#   python batch_run.py --prompt-batch 25      # 25 SKUs per model request, JSON answers
+
+DECISION_RE = re.compile(r"\*\*DECISION:\*\*\s*(.+)")
+ERROR_PREFIX = "Error connecting to AI:"
+
+_agent = None  # one MarketingAgent per worker process
+
+
+def plan_products(data, product_ids=None, statuses=None, buckets=None, decide_all=False, limit=None):
+    # Which SKUs to send to the model, in inventory order
+    inventory = InventoryAgent(data)
+    health = inventory.analyze_all()
+    market = CompetitorAgent(data).compare_all()[['product_id', 'bucket']]
+    plan = health.merge(market, on='product_id', how='left')
+    plan['bucket'] = plan['bucket'].fillna("neutral")
+
+    if product_ids:
+        plan = plan[plan['product_id'].isin(product_ids)]
+    if statuses:
+        pattern = "|".join(re.escape(s.upper()) for s in statuses)
+        plan = plan[plan['status'].str.contains(pattern)]
+    if buckets:
+        plan = plan[plan['bucket'].isin(buckets)]
+    if not decide_all:
+        plan = plan[(plan['status'] != "NORMAL") | (plan['bucket'] != "neutral")]
+    if limit:
+        plan = plan.head(limit)
+    return plan['product_id'].drop_duplicates().tolist()
+
+
+def _init_worker(data_dir, audit_file, backend_name):
+    global _agent
+    # Each process parses the data once and shares it across its threads
+    data = DataContext(data_dir)
+    from model_backends import get_backend
+    _agent = MarketingAgent(data=data, backend=get_backend(backend_name),
+                            cache=DecisionCache(os.path.join(data_dir, ".decision_cache")),
+                            audit=AuditAgent(audit_file))
+
+
+def _run_chunk(chunk_id, product_ids, part_path, crisis_mode, concurrency, rate_per_sec, timeout, retries,
+               prompt_batch=0):
+    agent = _agent
+    if prompt_batch:
+        # Many SKUs per model request, structured JSON answers (see batch_prompts.py)
+        answers = agent.decide_batch(product_ids, crisis_mode=crisis_mode, batch_size=prompt_batch,
+                                     concurrency=concurrency, rate_per_sec=rate_per_sec,
+                                     timeout=timeout, retries=retries)
+        strategies = [format_decision(a) if a["decision"] else f"{ERROR_PREFIX} {a['error']}" for a in answers]
+    else:
+        strategies = agent.generate_strategies(product_ids, crisis_mode=crisis_mode, concurrency=concurrency,
+                                               rate_per_sec=rate_per_sec, timeout=timeout, retries=retries)
+
+    # Per-SKU context for the output, from the same snapshot the decisions were made on
+    health = agent.inventory.analyze_many(product_ids)
+    market = agent.competitor.market.reindex(product_ids)
+    decisions = [DECISION_RE.search(text) for text in strategies]
+
+    part = pd.DataFrame({
+        "product_id": product_ids,
+        "product_name": health['product'].to_numpy(),
+        "inventory_status": health['status'].to_numpy(),
+        "stock": health['stock'].to_numpy(),
+        "sales_7d": health['7d_sales'].to_numpy(),
+        "my_price": market['my_price'].to_numpy(),
+        "competitor_price": market['competitor_price'].to_numpy(),
+        "price_bucket": market['bucket'].fillna("neutral").to_numpy(),
+        "decision": [m.group(1).strip() if m else None for m in decisions],
+        "strategy": strategies,
+        "error": [text.startswith(ERROR_PREFIX) for text in strategies],
+        "model": agent.model_name,
+        "crisis_mode": crisis_mode,
+        "generated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    if not agent.audit.flush():
+        # Don't checkpoint decisions whose audit records are not on disk: the chunk is redone
+        raise AuditWriteError(f"Audit log not writable: {agent.audit.writer.last_error!r}")
+
+    # Atomic: a part file either exists complete or not at all
+    tmp = part_path + ".tmp"
+    part.to_parquet(tmp, index=False)
+    os.replace(tmp, part_path)
+    return chunk_id, len(part), int(part['error'].sum())
+
+
+# --- CHECKPOINTS ---
+def _part_path(checkpoint_dir, chunk_id):
+    return os.path.join(checkpoint_dir, f"part-{chunk_id:05d}.parquet")
+
+
+def load_or_create_plan(checkpoint_dir, run_key, make_plan, chunk_size):
+    # Reuse the saved plan for this run so resumed runs see the same chunks,
+    # even if the data changed in between
+    manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["run_key"] == run_key:
+            return manifest, True
+        raise ValueError(f"{checkpoint_dir} holds a different run; use --restart or another --checkpoint-dir")
+
+    product_ids = make_plan()
+    chunks = [product_ids[i:i + chunk_size] for i in range(0, len(product_ids), chunk_size)]
+    manifest = {"run_key": run_key, "created": datetime.datetime.now().isoformat(), "chunks": chunks}
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+    return manifest, False
+
+
+def pending_chunks(manifest, checkpoint_dir, retry_errors=False):
+    pending = []
+    for chunk_id in range(len(manifest["chunks"])):
+        path = _part_path(checkpoint_dir, chunk_id)
+        if not os.path.exists(path):
+            pending.append(chunk_id)
+        elif retry_errors and pd.read_parquet(path, columns=["error"])['error'].any():
+            pending.append(chunk_id)
+    return pending
+
+
+def merge_parts(manifest, checkpoint_dir, output):
+    parts = [pd.read_parquet(_part_path(checkpoint_dir, i)) for i in range(len(manifest["chunks"]))]
+    result = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    tmp = output + ".tmp"
+    result.to_parquet(tmp, index=False)
+    os.replace(tmp, output)
+    return result
+
+
+def run_batch(data_dir=".", output="decisions.parquet", checkpoint_dir=None, product_ids=None,
+              statuses=None, buckets=None, decide_all=False, limit=None, crisis_mode=False,
+              workers=None, concurrency=8, rate_per_sec=None, timeout=30, retries=3,
+              chunk_size=200, backend=None, audit_file=None, restart=False, retry_errors=False,
+              keep_checkpoints=False, prompt_batch=0):
+    checkpoint_dir = checkpoint_dir or output + ".checkpoint"
+    audit_file = audit_file or os.path.join(data_dir, "audit_log.csv")
+    backend = backend or os.getenv("MODEL_BACKEND", "gemini")
+    workers = workers or os.cpu_count() or 1
+
+    if restart:
+        for path in glob.glob(os.path.join(checkpoint_dir, "*")):
+            os.remove(path)
+
+    # Same arguments -> same run key -> resume
+    selection = json.dumps([sorted(product_ids or []), sorted(statuses or []), sorted(buckets or []),
+                            decide_all, limit, crisis_mode, backend, chunk_size, prompt_batch])
+    run_key = hashlib.sha256(selection.encode()).hexdigest()[:16]
+
+    def make_plan():
+        return plan_products(DataContext(data_dir), product_ids, statuses, buckets, decide_all, limit)
+
+    manifest, resumed = load_or_create_plan(checkpoint_dir, run_key, make_plan, chunk_size)
+    chunks = manifest["chunks"]
+    pending = pending_chunks(manifest, checkpoint_dir, retry_errors)
+    total = sum(len(c) for c in chunks)
+    print(f"{'Resuming' if resumed else 'Starting'} batch: {total} SKUs in {len(chunks)} chunks, "
+          f"{len(chunks) - len(pending)} already done.")
+
+    # Share the rate limit between the processes actually started
+    pool_size = min(workers, len(pending))
+    per_worker_rate = rate_per_sec / pool_size if rate_per_sec and pool_size else None
+    started = time.perf_counter()
+    errors = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=pool_size, initializer=_init_worker,
+                                 initargs=(data_dir, audit_file, backend)) as pool:
+            futures = [pool.submit(_run_chunk, i, chunks[i], _part_path(checkpoint_dir, i), crisis_mode,
+                                   concurrency, per_worker_rate, timeout, retries, prompt_batch) for i in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk_id, rows, failed = future.result()
+                errors += failed
+                print(f"  chunk {chunk_id}: {rows} decisions ({failed} errors) [{done}/{len(pending)}]")
+
+    result = merge_parts(manifest, checkpoint_dir, output)
+    print(f"✅ {len(result)} decisions written to {output} in {time.perf_counter() - started:.1f}s "
+          f"({errors} errors this run).")
+
+    if not keep_checkpoints:
+        for path in glob.glob(os.path.join(checkpoint_dir, "*")):
+            os.remove(path)
+        os.rmdir(checkpoint_dir)
+    return result
+
+
+def _csv(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the marketing agent over the catalog without the dashboard.")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--output", default="decisions.parquet")
+    parser.add_argument("--checkpoint-dir", default=None, help="Default: <output>.checkpoint")
+    parser.add_argument("--products", default=None, help="Comma-separated product_ids")
+    parser.add_argument("--status", default=None, help="Comma-separated inventory statuses, e.g. low,overstock")
+    parser.add_argument("--bucket", default=None, help="Comma-separated price buckets: losing,winning,neutral")
+    parser.add_argument("--all", action="store_true", help="Decide every selected SKU, not only those needing action")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--crisis", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Model calls in flight per worker")
+    parser.add_argument("--rate", type=float, default=None, help="Max model calls per second, all workers")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--prompt-batch", type=int, default=0,
+                        help="SKUs per model request with JSON output (0: one prompt per SKU)")
+    parser.add_argument("--backend", default=None, help="gemini | local (default: MODEL_BACKEND)")
+    parser.add_argument("--restart", action="store_true", help="Discard checkpoints and start over")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run finished chunks that had model errors")
+    parser.add_argument("--keep-checkpoints", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        run_batch(args.data_dir, args.output, args.checkpoint_dir, _csv(args.products), _csv(args.status),
+                  _csv(args.bucket), args.all, args.limit, args.crisis, args.workers, args.concurrency,
+                  args.rate, args.timeout, args.retries, args.chunk_size, args.backend, restart=args.restart,
+                  retry_errors=args.retry_errors, keep_checkpoints=args.keep_checkpoints,
+                  prompt_batch=args.prompt_batch)
+    except (ValueError, AuditWriteError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from data_context import DataContext
+from agents import FinanceAgent, InventoryAgent, CompetitorAgent, AuditAgent
+from expand_data import generate_data
+
+# --- BENCHMARK SUITE ---
+# Generates a seeded dataset per scale (SKUs x days) and times the agent hot paths plus the
+# computations behind each dashboard section. Results are written as JSON so two runs
+# (e.g. before/after a change) can be diffed with --compare.
+#
+#   python benchmark.py --scales 50x60,1000x365 --output after.json --compare before.json
+
+SAMPLE_SKUS = 1000   # per-product benchmarks call the API this many times per run
+AUDIT_WRITES = 10000
+PRICE_UPDATES = 100  # competitor price observations per record_prices call
+
+
+def parse_scales(text):
+    scales = []
+    for part in text.split(","):
+        products, days = part.lower().split("x")
+        scales.append((int(products), int(days)))
+    return scales
+
+
+def timed(fn, repeats):
+    fn()  # warm-up (lazy loads, caches)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def suite(data_dir, audit_rows, seed):
+    # (name, ops per run, callable) for one generated dataset
+    data = DataContext(data_dir)
+    finance = FinanceAgent(data)
+    inventory = InventoryAgent(data)
+    competitor = CompetitorAgent(data)
+    audit = AuditAgent(os.path.join(data_dir, "audit_log.csv"))
+
+    product_ids = data.get("inventory")['product_id'].tolist()
+    sample = list(np.random.default_rng(seed).choice(product_ids, min(SAMPLE_SKUS, len(product_ids)), replace=False))
+
+    def load_all():
+        DataContext(data_dir).load("financials", "inventory", "competitors", "sales_store")
+
+    def analyze_products():
+        for pid in sample:
+            inventory.analyze_product(pid)
+
+    def compare_prices():
+        for pid in sample:
+            competitor.compare_price(pid)
+
+    price_clock = [pd.Timestamp.now()]
+
+    def record_prices():
+        # A feed batch touching PRICE_UPDATES SKUs, always newer than the last one
+        price_clock[0] += pd.Timedelta(seconds=1)
+        skus = sample[:PRICE_UPDATES]
+        competitor.record_prices(pd.DataFrame({
+            "product_id": skus,
+            "competitor": "seller_1",
+            "competitor_price": np.arange(len(skus)) % 50 + 100,
+            "competitor_promo": False,
+            "observed_at": price_clock[0],
+        }))
+
+    def sales_charts():
+        store = data.get("sales_store")
+        for pid in sample[:100]:
+            store.series(pid)
+
+    def audit_write():
+        for i in range(AUDIT_WRITES):
+            audit.log_event("BenchmarkAgent", sample[i % len(sample)], "Benchmark", f"event {i}")
+        audit.flush()
+
+    return [
+        ("data.load", 1, load_all),
+        ("finance.get_status", 1, finance.get_status),
+        ("inventory.analyze_product", len(sample), analyze_products),
+        ("inventory.sales_velocity", 1, lambda: inventory.sales_velocity(sample[0])),
+        ("competitor.build_index", 1, competitor.build_index),
+        ("competitor.compare_price", len(sample), compare_prices),
+        ("competitor.record_prices", min(PRICE_UPDATES, len(sample)), record_prices),
+        # Dashboard sections (what app.py computes on a cache miss)
+        ("dashboard.inventory", 1, inventory.analyze_all),
+        ("dashboard.forecast", 1, inventory.forecast_all),
+        ("dashboard.market", 1, competitor.compare_all),
+        ("dashboard.sales_chart", min(100, len(sample)), sales_charts),
+        # Audit trail
+        ("audit.write", AUDIT_WRITES, audit_write),
+        ("audit.tail", 1, audit.get_recent_logs),
+        ("audit.query", 1, lambda: audit.query_logs(product_id=sample[0])),
+        ("audit.verify", max(audit_rows, 1), lambda: audit.verify(full=True)),
+    ]
+
+
+def run(scales, competitors, audit_rows, repeats, seed, only=None):
+    results = []
+    for products, days in scales:
+        scale = f"{products}x{days}"
+        with tempfile.TemporaryDirectory(prefix="bench_") as data_dir:
+            start = time.perf_counter()
+            generate_data(products, days, competitors, audit_rows, seed, data_dir, sales_format="store")
+            print(f"[{scale}] generated in {time.perf_counter() - start:.2f}s")
+
+            for name, ops, fn in suite(data_dir, audit_rows, seed):
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                samples = timed(fn, repeats)
+                median = statistics.median(samples)
+                results.append({
+                    "scale": scale,
+                    "benchmark": name,
+                    "ops": ops,
+                    "repeats": repeats,
+                    "min_s": min(samples),
+                    "median_s": median,
+                    "per_op_us": median / ops * 1e6,
+                })
+                print(f"[{scale}] {name:<28} median {median * 1000:10.3f} ms  ({median / ops * 1e6:10.2f} us/op)")
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "competitors_per_sku": args.competitors,
+        "audit_rows": args.audit_rows,
+    }
+
+
+def compare(results, baseline, threshold):
+    # Ratio of medians per (scale, benchmark); > threshold counts as a regression
+    old = {(r["scale"], r["benchmark"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = old.get((r["scale"], r["benchmark"]))
+        if not before or not before["median_s"]:
+            continue
+        ratio = r["median_s"] / before["median_s"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"[{r['scale']}] {r['benchmark']:<28} {ratio:6.2f}x {flag}")
+        if ratio > threshold:
+            regressions.append({**r, "baseline_median_s": before["median_s"], "ratio": ratio})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent hot paths at several scales.")
+    parser.add_argument("--scales", default="50x60,1000x365,10000x365", help="Comma-separated SKUSxDAYS")
+    parser.add_argument("--competitors", type=int, default=3, help="Competitor rows per SKU")
+    parser.add_argument("--audit-rows", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", default=None, help="Comma-separated benchmark name prefixes")
+    parser.add_argument("--output", default=None, help="Write JSON results here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Regression ratio for --compare")
+    args = parser.parse_args()
+
+    only = args.only.split(",") if args.only else None
+    results = run(parse_scales(args.scales), args.competitors, args.audit_rows, args.repeats, args.seed, only)
+    report = {"meta": metadata(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) above {args.threshold}x")
+            sys.exit(1)
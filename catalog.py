@@ -0,0 +1,101 @@
+import re
+import numpy as np
+import pandas as pd
+
+# --- CATALOG INDEX ---
+# Product lookup for large catalogs:
+#   get(product_id)         O(1) row by id (duplicate names are fine, ids are the key)
+#   search(query, filter)   AND of prefix matches over name tokens and the product_id,
+#                           optionally restricted to a status filter, paginated
+# Tokens live in a sorted array with CSR-style posting lists (row positions grouped by token),
+# so all tokens sharing a prefix are one contiguous slice: two binary searches, then a unique.
+
+FILTERS = {
+    "overstock": "Overstock",
+    "low_stock": "Low stock",
+    "losing": "Losing price war",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+class CatalogIndex:
+    def __init__(self, inventory, health=None, market=None):
+        # inventory: inventory.csv frame; health: InventoryAgent.analyze_all(); market: CompetitorAgent.compare_all()
+        self.frame = inventory.drop_duplicates('product_id').reset_index(drop=True)
+        self.ids = self.frame['product_id'].astype(str).to_numpy()
+        self.names = self.frame['product_name'].astype(str).to_numpy()
+        self.positions = {pid: i for i, pid in enumerate(self.ids)}
+
+        # Posting lists: every (token, row) pair sorted by token, then row
+        text = pd.Series(self.ids).str.cat(pd.Series(self.names), sep=" ").str.lower()
+        pairs = text.str.findall(_TOKEN_RE.pattern).explode().dropna()
+        self.tokens, token_ids = np.unique(pairs.to_numpy().astype(str), return_inverse=True)
+        rows = pairs.index.to_numpy()
+        order = np.lexsort((rows, token_ids))
+        self.postings = rows[order].astype(np.int64)
+        self.offsets = np.searchsorted(token_ids[order], np.arange(len(self.tokens) + 1))
+
+        # Status filters as boolean masks over rows
+        n = len(self.ids)
+        self.masks = {key: np.zeros(n, dtype=bool) for key in FILTERS}
+        if health is not None:
+            status = health.drop_duplicates('product_id').set_index('product_id')['status'].reindex(self.ids).fillna("")
+            self.masks["overstock"] = status.str.contains("OVERSTOCK").to_numpy(copy=True)
+            self.masks["low_stock"] = status.str.contains("LOW STOCK").to_numpy(copy=True)
+        if market is not None:
+            bucket = market.drop_duplicates('product_id').set_index('product_id')['bucket'].reindex(self.ids)
+            self.masks["losing"] = (bucket == "losing").to_numpy(copy=True)
+
+    def apply(self, delta):
+        # Move SKUs between status filters from a status_feed.StatusDelta (idempotent)
+        for flags, value in ((delta.entered, True), (delta.left, False)):
+            for key, product_ids in flags.items():
+                rows = [self.positions[pid] for pid in product_ids if pid in self.positions]
+                self.masks[key][rows] = value
+        return self
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        return product_id in self.positions
+
+    def get(self, product_id):
+        # Full inventory row as a dict
+        return self.frame.iloc[self.positions[product_id]].to_dict()
+
+    def name(self, product_id):
+        return self.names[self.positions[product_id]]
+
+    def label(self, product_id):
+        # Unambiguous display label, even when names repeat
+        return f"{self.name(product_id)} ({product_id})"
+
+    def _prefix_rows(self, prefix):
+        # Tokens starting with `prefix` are contiguous in the sorted token array
+        lo, hi = np.searchsorted(self.tokens, [prefix, prefix + "\uffff"])
+        return np.unique(self.postings[self.offsets[lo]:self.offsets[hi]])
+
+    def match(self, query="", status=None):
+        # Row positions (catalog order) whose tokens match every query word as a prefix
+        rows = None
+        for word in tokenize(query):
+            hits = self._prefix_rows(word)
+            rows = hits if rows is None else np.intersect1d(rows, hits, assume_unique=True)
+            if not len(rows):
+                break
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        if status:
+            rows = rows[self.masks[status][rows]]
+        return rows
+
+    def search(self, query="", status=None, limit=50, offset=0):
+        # (total matches, product_ids on this page)
+        rows = self.match(query, status)
+        return len(rows), self.ids[rows[offset:offset + limit]].tolist()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from sales_store import from_days
+
+# --- CHART DATA ---
+# What the sales trend chart plots, computed server-side so the browser payload stays
+# bounded no matter how long the history is:
+#   1. slice the SKU's range from the sales store (memory-mapped, no CSV parse)
+#   2. resample to daily / weekly / monthly totals (missing days count as 0)
+#   3. downsample to at most max_points with LTTB (Largest-Triangle-Three-Buckets),
+#      which keeps peaks and troughs instead of averaging them away
+
+RESOLUTIONS = {"daily": "D", "weekly": "W-MON", "monthly": "MS"}
+RANGES = {"30d": 30, "90d": 90, "1y": 365, "all": None}
+DEFAULT_MAX_POINTS = 300
+
+
+def lttb(x, y, threshold):
+    # Indices of the points LTTB keeps (always including first and last)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        ax, ay = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        px, py = x[prev], y[prev]
+        area = np.abs((px - ax) * (y[lo:hi] - py) - (px - x[lo:hi]) * (ay - py))
+        prev = lo + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def resample(series, resolution="daily"):
+    # Unit totals per period, with empty periods as 0
+    if series.empty:
+        return series
+    return series.resample(RESOLUTIONS[resolution]).sum()
+
+
+def auto_resolution(span_days, max_points=DEFAULT_MAX_POINTS):
+    # Finest resolution whose point count fits the budget without downsampling
+    if span_days <= max_points:
+        return "daily"
+    if span_days / 7 <= max_points:
+        return "weekly"
+    return "monthly"
+
+
+def date_range(store, range_key="90d"):
+    # (start, end) ending at the newest stored day; start None for the full history
+    if not len(store.days):
+        return None, None
+    end = from_days(store.days[-1:])[0]
+    days = RANGES[range_key]
+    return (None if days is None else end - pd.Timedelta(days=days - 1)), end
+
+
+def range_days(store, range_key="90d"):
+    # Calendar days the range covers (full history for "all")
+    if RANGES[range_key] is not None:
+        return RANGES[range_key]
+    if not len(store.days):
+        return 0
+    return int(store.days[-1] - store.days[0]) + 1
+
+
+def chart_series(store, product_id, start=None, end=None, resolution="daily", max_points=DEFAULT_MAX_POINTS):
+    # Plot-ready frame (Date, Sales, Product) for one SKU
+    sales = resample(store.series(product_id, start, end).astype(np.int64), resolution)
+    if len(sales) > max_points:
+        keep = lttb(sales.index.asi8, sales.to_numpy(), max_points)
+        sales = sales.iloc[keep]
+    return pd.DataFrame({"Date": sales.index, "Sales": sales.to_numpy(), "Product": product_id})
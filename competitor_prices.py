@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+# --- COMPETITOR PRICE AGGREGATES ---
+# competitors.csv holds price observations: many sellers per product, each observation
+# optionally timestamped (observed_at) and flagged as a promotion (competitor_promo).
+# Only the newest observation per (product_id, competitor) counts. Per product we keep:
+#   competitors       sellers with a current price
+#   competitor_min    lowest current price (promos included: what a shopper sees today)
+#   competitor_median / competitor_p25
+#   promo_count       sellers currently on promotion
+#   competitor_price  promo-adjusted reference price: median of the sellers NOT on promo
+#                     (temporary discounts don't set the market level), or the plain
+#                     median when every seller is on promo
+# With one seller per product competitor_price is simply that seller's price.
+#
+# Aggregation is one vectorized pass over the rows sorted by (product, price): every
+# statistic is an index into the product's contiguous segment. New observations are
+# appended to a small tail and only the products they touch are re-aggregated (main rows
+# + tail rows for those products); the tail is folded into main once it grows large.
+
+COLUMNS = ["product_id", "competitor", "competitor_price", "competitor_promo", "observed_at"]
+PERCENTILE = 25
+STATS = ["competitors", "competitor_min", "competitor_median", f"competitor_p{PERCENTILE}",
+         "promo_count", "competitor_price", "last_observed"]
+
+
+def format_price(value):
+    # 342.0 -> "342", 342.5 -> "342.5" (prompts and panel text)
+    value = round(float(value), 2)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+TRUE_STRINGS = {"true", "1", "1.0", "yes", "y", "t"}
+
+
+def parse_flags(values):
+    # Promo flags as written by hand or by other tools -> bool. Blank cells and "False"/"0"
+    # are False (a plain astype(bool) turns NaN and any non-empty string into True).
+    values = pd.Series(values)
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return values.fillna(False).astype(bool)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.fillna(0).astype(bool)
+    return values.astype(str).str.strip().str.lower().isin(TRUE_STRINGS) & values.notna()
+
+
+def normalize(observations):
+    # Any competitors frame -> COLUMNS. Files without a `competitor` column list one
+    # seller per row, numbered per product; rows without a timestamp count as oldest.
+    obs = observations.copy()
+    if "competitor" not in obs.columns:
+        obs["competitor"] = obs.groupby("product_id").cumcount() + 1
+    obs["competitor"] = obs["competitor"].astype(str)
+    obs["competitor_promo"] = (parse_flags(obs["competitor_promo"]).to_numpy()
+                               if "competitor_promo" in obs.columns else False)
+    obs["observed_at"] = (pd.to_datetime(obs["observed_at"]) if "observed_at" in obs.columns
+                          else pd.NaT)
+    obs["observed_at"] = obs["observed_at"].astype("datetime64[ns]")
+    obs["competitor_price"] = obs["competitor_price"].astype(np.float64)
+    return obs[COLUMNS].reset_index(drop=True)
+
+
+def latest(observations):
+    # Newest observation per (product_id, competitor); on equal timestamps the later row wins
+    obs = observations.sort_values("observed_at", kind="stable", na_position="first")
+    return obs.drop_duplicates(["product_id", "competitor"], keep="last")
+
+
+def _quantile(values, starts, counts, q):
+    # Linear-interpolated quantile of every sorted segment values[start:start + count] (NaN if empty)
+    result = np.full(len(starts), np.nan)
+    has = counts > 0
+    first, last = starts[has], starts[has] + counts[has] - 1
+    pos = first + q * (last - first)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, last)
+    result[has] = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return result
+
+
+def aggregate(observations, percentile=PERCENTILE):
+    # Per-product statistics over current observations (already reduced by latest())
+    codes, products = pd.factorize(observations["product_id"])
+    prices = observations["competitor_price"].to_numpy(dtype=np.float64)
+    promo = observations["competitor_promo"].to_numpy(dtype=bool)
+    observed = observations["observed_at"].to_numpy(dtype="datetime64[ns]")
+    n = len(products)
+
+    # Contiguous per-product segments, ascending price within each
+    order = np.lexsort((prices, codes))
+    codes, prices, promo, observed = codes[order], prices[order], promo[order], observed[order]
+    counts = np.bincount(codes, minlength=n)
+    starts = np.cumsum(counts) - counts
+
+    # The same over sellers not on promo (still sorted: filtering keeps the order)
+    regular = ~promo
+    reg_prices = prices[regular]
+    reg_counts = np.bincount(codes[regular], minlength=n)
+    reg_starts = np.cumsum(reg_counts) - reg_counts
+
+    median = _quantile(prices, starts, counts, 0.5)
+    reg_median = _quantile(reg_prices, reg_starts, reg_counts, 0.5)
+    stats = pd.DataFrame({
+        "competitors": counts,
+        "competitor_min": prices[starts],
+        "competitor_median": median,
+        f"competitor_p{PERCENTILE}": _quantile(prices, starts, counts, percentile / 100),
+        "promo_count": np.bincount(codes, weights=promo, minlength=n).astype(np.int64),
+        "competitor_price": np.where(reg_counts > 0, reg_median, median),
+        # fmax skips NaT: untimestamped rows only show when nothing is timestamped
+        "last_observed": np.fmax.reduceat(observed, starts) if n else observed,
+    }, index=pd.Index(products, name="product_id"))
+    return stats
+
+
+class CompetitorPrices:
+    def __init__(self, observations, compact_rows=50000):
+        # Tail size (rows) that triggers folding observations into main
+        self.compact_rows = compact_rows
+        self._set_main(latest(normalize(observations)))
+        self.stats = aggregate(self.main)
+
+    def _set_main(self, current):
+        # Current observations sorted by product: each product's rows are one slice
+        self.main = current.sort_values("product_id", kind="stable").reset_index(drop=True)
+        ids = self.main["product_id"].to_numpy()
+        products, starts = np.unique(ids, return_index=True)
+        self.codes = {pid: i for i, pid in enumerate(products)}
+        self.offsets = np.append(starts, len(ids)).astype(np.int64)
+        self.tail = self.main.iloc[:0]
+        # Products whose main rows were superseded by replace(): their rows live in the tail
+        self.stale = np.zeros(len(products), dtype=bool)
+
+    def _rows(self, product_ids):
+        # Main + tail rows of these products (main first, so tail rows win timestamp ties)
+        codes = np.array([self.codes[pid] for pid in product_ids if pid in self.codes], dtype=np.int64)
+        codes = codes[~self.stale[codes]]
+        lo, hi = self.offsets[codes], self.offsets[codes + 1]
+        # Concatenated aranges of every product's slice
+        sizes = hi - lo
+        idx = np.repeat(lo - (np.cumsum(sizes) - sizes), sizes) + np.arange(sizes.sum())
+        tail = self.tail[self.tail["product_id"].isin(product_ids)]
+        return pd.concat([self.main.iloc[idx], tail], ignore_index=True)
+
+    def update(self, observations):
+        # Fold in new observations (product_id, competitor, competitor_price, and optionally
+        # competitor_promo / observed_at, default now). Returns the product_ids whose stats changed.
+        if "competitor" not in observations.columns:
+            raise ValueError("price observations need a competitor column")
+        new = observations.copy()
+        if "observed_at" not in new.columns:
+            new["observed_at"] = pd.Timestamp.now()
+        new = normalize(new)
+        if new.empty:
+            return []
+        self.tail = pd.concat([self.tail, new], ignore_index=True)
+        touched = new["product_id"].unique().tolist()
+
+        # Re-aggregate only the touched products
+        self._refresh(touched)
+        if len(self.tail) >= self.compact_rows:
+            self.compact()
+        return touched
+
+    def replace(self, product_ids, observations):
+        # Make `observations` the complete current rows of these products (e.g. their rows in
+        # competitors.csv were edited): sellers not listed any more are dropped
+        product_ids = list(product_ids)
+        new = normalize(observations)
+        self.tail = pd.concat([self.tail[~self.tail["product_id"].isin(product_ids)], new], ignore_index=True)
+        for pid in product_ids:
+            if pid in self.codes:
+                self.stale[self.codes[pid]] = True
+        self._refresh(product_ids)
+        if len(self.tail) >= self.compact_rows:
+            self.compact()
+
+    def _refresh(self, product_ids):
+        # Recompute the stats rows of these products; products left without prices are dropped
+        fresh = aggregate(latest(self._rows(product_ids)))
+        positions = self.stats.index.get_indexer(fresh.index)
+        known = positions >= 0
+        for col in STATS:
+            self.stats.iloc[positions[known], self.stats.columns.get_loc(col)] = fresh[col].to_numpy()[known]
+        if not known.all():
+            self.stats = pd.concat([self.stats, fresh[~known]])
+        priced = set(fresh.index.tolist())
+        gone = [pid for pid in product_ids if pid not in priced]
+        if gone:
+            self.stats = self.stats.drop(gone, errors="ignore")
+
+    def compact(self):
+        # Fold the tail into main: O(rows), amortized over compact_rows observations
+        self._set_main(self.observations())
+
+    def observations(self):
+        # Current observation per (product_id, competitor)
+        row_codes = np.repeat(np.arange(len(self.stale)), np.diff(self.offsets))
+        return latest(pd.concat([self.main[~self.stale[row_codes]], self.tail], ignore_index=True))
@@ -0,0 +1,135 @@
+import os
+import threading
+import pandas as pd
+import metrics
+from sales_store import SalesStore, csv_signature
+from data_store import DataStore, TABLES as STORE_TABLES
+
+# Where each shared frame comes from (relative to data_dir)
+DEFAULT_SOURCES = {
+    "inventory": "inventory.csv",
+    "sales": "sales_history.csv",
+    "sales_store": "sales_store",
+    "competitors": "competitors.csv",
+    "financials": "financials.csv",
+}
+
+
+# Immutable view of every loaded frame at one point in time
+class DataSnapshot:
+    def __init__(self, version, frames, signatures):
+        self.version = version
+        self.frames = frames
+        self.signatures = signatures
+
+    def __getitem__(self, name):
+        return self.frames[name]
+
+
+# Loads each data source once and shares the frames across all agents and the UI.
+# A source is only re-parsed when its file's mtime/size changes, and every reload
+# publishes a new snapshot with a bumped version number.
+#
+# With a transactional store (store="msme.db" or DATA_STORE=msme.db, relative to data_dir)
+# inventory, competitors and financials are read from SQLite instead of their CSVs, and
+# a table's write version replaces the file signature.
+class DataContext:
+    def __init__(self, data_dir=".", sources=None, store=None):
+        self.data_dir = data_dir
+        self.sources = dict(sources or DEFAULT_SOURCES)
+        self._lock = threading.Lock()
+        self._snapshot = DataSnapshot(0, {}, {})
+        store = store or os.getenv("DATA_STORE")
+        if isinstance(store, str):
+            # Built from the CSVs on first use
+            store = DataStore.open(os.path.join(data_dir, store), csv_dir=data_dir)
+        self.store = store
+
+    def path(self, name):
+        return os.path.join(self.data_dir, self.sources[name])
+
+    def _signature(self, name):
+        if self.store is not None and name in STORE_TABLES:
+            return ("store", self.store.version(name))
+        path = self.path(name)
+        if os.path.isdir(path):
+            # Directory-backed sources (the sales store) change when any file in them does,
+            # or when the CSV they are built from is rewritten
+            files = tuple(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                                 for entry in os.scandir(path)))
+            if name == "sales_store" and "sales" in self.sources:
+                files += (("source", tuple(csv_signature(self.path("sales")) or ())),)
+            return files
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, name):
+        with metrics.span(f"data.load.{name}"):
+            if self.store is not None and name in STORE_TABLES:
+                return self.store.frame(name)
+            if name == "sales_store":
+                # Columnar sales history; built once from the legacy wide CSV if missing
+                return SalesStore.open(self.path(name), csv_path=self.path("sales"))
+            return pd.read_csv(self.path(name))
+
+    def _publish(self, frames, signatures):
+        # Caller holds the lock
+        self._snapshot = DataSnapshot(self._snapshot.version + 1, frames, signatures)
+        return self._snapshot
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def get(self, name):
+        # Fast path: already loaded
+        frame = self._snapshot.frames.get(name)
+        if frame is not None:
+            return frame
+
+        # First use of this source: load it lazily
+        with self._lock:
+            current = self._snapshot
+            if name not in current.frames:
+                # Signature first: a write landing mid-load is picked up by the next refresh.
+                # Sources built on first load (the sales store) only have one afterwards.
+                try:
+                    sig = self._signature(name)
+                except FileNotFoundError:
+                    sig = None
+                frame = self._load(name)
+                if sig is None:
+                    sig = self._signature(name)
+                frames = dict(current.frames, **{name: frame})
+                signatures = dict(current.signatures, **{name: sig})
+                current = self._publish(frames, signatures)
+            return current.frames[name]
+
+    def load(self, *names):
+        # Eagerly load several sources (e.g. at startup) so the version settles immediately
+        for name in names:
+            self.get(name)
+        return self._snapshot
+
+    def refresh(self):
+        # Re-stat every loaded source and reload only the ones that changed on disk
+        with self._lock:
+            current = self._snapshot
+            frames = dict(current.frames)
+            signatures = dict(current.signatures)
+            changed = False
+
+            for name, old_sig in current.signatures.items():
+                sig = self._signature(name)
+                if sig != old_sig:
+                    frames[name] = self._load(name)
+                    signatures[name] = sig
+                    changed = True
+
+            if changed:
+                return self._publish(frames, signatures)
+            return current
@@ -0,0 +1,267 @@
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+import pandas as pd
+import metrics
+from competitor_prices import parse_flags
+
+# --- TRANSACTIONAL DATA STORE ---
+# SQLite (WAL mode) backend for the master data the agents read: inventory, competitor
+# prices and financial metrics. Feeds write batched upserts in one transaction each, and
+# readers (the dashboard, batch workers) keep reading a consistent snapshot while a writer
+# is active: no more rewriting whole CSV files, and no torn reads.
+#
+# Every write transaction also bumps the table's version in `versions`; DataContext uses it
+# as the change signature, so a reload happens exactly when a table changed.
+#
+#   python data_store.py import --data-dir .     # CSVs -> msme.db (replaces the tables)
+#   python data_store.py export --data-dir .     # msme.db -> CSVs (atomic rewrite)
+#   DATA_STORE=msme.db streamlit run app.py      # agents read from the store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    pos INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL UNIQUE,
+    product_name TEXT,
+    cost_price NUMERIC,
+    selling_price NUMERIC,
+    current_stock INTEGER,
+    min_stock_threshold INTEGER,
+    vendor_email TEXT
+);
+CREATE TABLE IF NOT EXISTS competitors (
+    pos INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    competitor TEXT NOT NULL DEFAULT '',
+    competitor_price NUMERIC,
+    competitor_promo INTEGER NOT NULL DEFAULT 0,
+    observed_at TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS competitors_product ON competitors(product_id, competitor);
+CREATE TABLE IF NOT EXISTS financials (
+    metric TEXT PRIMARY KEY,
+    value NUMERIC
+);
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO versions (name) VALUES ('inventory'), ('competitors'), ('financials');
+"""
+
+# Table -> (upsert key, columns as they appear in the CSV / agent frames)
+TABLES = {
+    "inventory": (("product_id",), ["product_id", "product_name", "cost_price", "selling_price",
+                                    "current_stock", "min_stock_threshold", "vendor_email"]),
+    "competitors": (("product_id", "competitor"), ["product_id", "competitor", "competitor_price",
+                                                   "competitor_promo", "observed_at"]),
+    "financials": (("metric",), ["metric", "value"]),
+}
+
+# Upserts only replace a row with an observation at least as new (untimestamped rows always replace)
+NEWER_ONLY = {"competitors": "observed_at"}
+
+CSV_FILES = {
+    "inventory": "inventory.csv",
+    "competitors": "competitors.csv",
+    "financials": "financials.csv",
+}
+
+
+def _native(value):
+    # numpy scalars / NaN -> values sqlite3 can bind
+    if value is None or value is pd.NaT or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat(sep=" ")
+    return value.item() if hasattr(value, "item") else value
+
+
+def _records(rows, columns):
+    # DataFrame or iterable of dicts -> (columns present, list of tuples)
+    if isinstance(rows, pd.DataFrame):
+        cols = [c for c in columns if c in rows.columns]
+        frame = rows[cols].astype(object).where(rows[cols].notna(), None)
+        return cols, [tuple(_native(v) for v in row) for row in frame.itertuples(index=False)]
+    rows = list(rows)
+    if not rows:
+        return [], []
+    cols = [c for c in columns if c in rows[0]]
+    return cols, [tuple(_native(row[c]) for c in cols) for row in rows]
+
+
+class DataStore:
+    def __init__(self, path="msme.db"):
+        self.path = path
+        # One connection per thread; WAL lets them read while another one writes
+        self._local = threading.local()
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            # Stores created before competitor observations were timestamped
+            if "observed_at" not in {row[1] for row in db.execute("PRAGMA table_info(competitors)")}:
+                db.execute("ALTER TABLE competitors ADD COLUMN observed_at TEXT")
+
+    @classmethod
+    def open(cls, path="msme.db", csv_dir="."):
+        # Build the store from the legacy CSVs the first time it is needed
+        fresh = not os.path.exists(path)
+        store = cls(path)
+        if fresh:
+            store.import_csv(csv_dir)
+        return store
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _write(self, table, statements):
+        # Run (sql, params list) pairs in one IMMEDIATE transaction and bump the table version
+        db = self.db
+        with metrics.span(f"store.write.{table}"):
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                changed = 0
+                for sql, params in statements:
+                    changed += db.executemany(sql, params).rowcount
+                db.execute("UPDATE versions SET version = version + 1 WHERE name = ?", (table,))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        metrics.incr(f"store.rows_written.{table}", changed)
+        return changed
+
+    # --- READS ---
+    def version(self, table):
+        return self.db.execute("SELECT version FROM versions WHERE name = ?", (table,)).fetchone()[0]
+
+    def frame(self, table):
+        # Whole table in insertion order, with the same columns as its CSV
+        columns = TABLES[table][1]
+        order = "" if table == "financials" else " ORDER BY pos"
+        with metrics.span(f"store.read.{table}"):
+            frame = pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {table}{order}", self.db)
+        if table == "competitors":
+            frame['competitor_promo'] = parse_flags(frame['competitor_promo'])
+        return frame
+
+    def metric_values(self, *names):
+        # Indexed point lookups: {metric: value}
+        marks = ", ".join("?" * len(names))
+        return dict(self.db.execute(f"SELECT metric, value FROM financials WHERE metric IN ({marks})", names))
+
+    # --- BATCHED WRITES (one transaction per call) ---
+    def upsert(self, table, rows):
+        # Insert new keys, update the supplied columns of existing ones; other columns keep their values
+        key, columns = TABLES[table]
+        cols, params = _records(rows, columns)
+        if not params:
+            return 0
+        missing = set(key) - set(cols)
+        if missing:
+            raise ValueError(f"{table} rows need {', '.join(sorted(missing))}")
+        updates = [c for c in cols if c not in key]
+        conflict = f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}" if updates else "DO NOTHING"
+        newer = NEWER_ONLY.get(table)
+        if updates and newer in cols:
+            conflict += (f" WHERE excluded.{newer} IS NULL OR {table}.{newer} IS NULL"
+                         f" OR excluded.{newer} >= {table}.{newer}")
+        sql = (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+               f"ON CONFLICT({', '.join(key)}) {conflict}")
+        return self._write(table, [(sql, params)])
+
+    def set_stock(self, stock_by_product):
+        # Stock feed: absolute levels {product_id: units}; unknown products are ignored
+        return self._write("inventory", [(
+            "UPDATE inventory SET current_stock = ? WHERE product_id = ?",
+            [(int(units), str(pid)) for pid, units in stock_by_product.items()])])
+
+    def adjust_stock(self, delta_by_product):
+        # Stock movements {product_id: +received / -sold}, applied atomically
+        return self._write("inventory", [(
+            "UPDATE inventory SET current_stock = current_stock + ? WHERE product_id = ?",
+            [(int(delta), str(pid)) for pid, delta in delta_by_product.items()])])
+
+    def set_prices(self, price_by_product):
+        # Our own selling prices {product_id: price}
+        return self._write("inventory", [(
+            "UPDATE inventory SET selling_price = ? WHERE product_id = ?",
+            [(_native(price), str(pid)) for pid, price in price_by_product.items()])])
+
+    def record_prices(self, observations):
+        # Competitor price feed: latest observation per (product_id, competitor); older ones are ignored
+        return self.upsert("competitors", observations)
+
+    def set_metrics(self, values):
+        # Financial metrics {metric: value}, e.g. {"cash_balance": 9500}
+        return self.upsert("financials", [{"metric": m, "value": v} for m, v in values.items()])
+
+    # --- CSV IMPORT / EXPORT ---
+    def import_csv(self, csv_dir=".", tables=None):
+        # Replace each table with its CSV's contents (tables whose CSV is missing are skipped).
+        # Duplicate keys keep the first row, the same row the agents used to pick.
+        imported = {}
+        for table in tables or TABLES:
+            path = os.path.join(csv_dir, CSV_FILES[table])
+            if not os.path.exists(path):
+                continue
+            frame = pd.read_csv(path)
+            if table == "competitors" and "competitor" not in frame.columns:
+                # Unnamed sellers: number them per product
+                frame["competitor"] = (frame.groupby("product_id").cumcount() + 1).astype(str)
+            if table == "competitors" and "competitor_promo" in frame.columns:
+                frame["competitor_promo"] = parse_flags(frame["competitor_promo"])
+            key, columns = TABLES[table]
+            cols, params = _records(frame, columns)
+            insert = (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+                      f"ON CONFLICT({', '.join(key)}) DO NOTHING")
+            self._write(table, [(f"DELETE FROM {table}", [()]), (insert, params)])
+            imported[table] = len(params)
+        return imported
+
+    def export_csv(self, csv_dir=".", tables=None):
+        # Atomic rewrite: readers of the CSVs never see a half-written file
+        for table in tables or TABLES:
+            path = os.path.join(csv_dir, CSV_FILES[table])
+            tmp = path + ".tmp"
+            self.frame(table).to_csv(tmp, index=False)
+            os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import/export the transactional data store.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--data-dir", default=".", help="Directory with the CSV files")
+    parser.add_argument("--db", default=None, help="Default: <data-dir>/msme.db")
+    parser.add_argument("--tables", default=None, help="Comma-separated subset of: " + ", ".join(TABLES))
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",")] if args.tables else None
+    if tables and set(tables) - set(TABLES):
+        print(f"❌ Unknown tables: {', '.join(sorted(set(tables) - set(TABLES)))}")
+        sys.exit(1)
+    store = DataStore(args.db or os.path.join(args.data_dir, "msme.db"))
+    if args.command == "import":
+        for table, rows in store.import_csv(args.data_dir, tables).items():
+            print(f"✅ Imported {rows} rows into {table}.")
+    else:
+        store.export_csv(args.data_dir, tables)
+        print(f"✅ Exported {', '.join(tables or TABLES)} to {args.data_dir}.")
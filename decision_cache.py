@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- LLM DECISION CACHE ---
+# Two tiers:
+#   1. In-memory LRU (per process, bounded by entry count)
+#   2. On-disk directory of small JSON files (shared across processes/sessions),
+#      with a TTL and size-bounded eviction of the least recently used files.
+
+
+class DecisionCache:
+    def __init__(self, path=".decision_cache", max_memory_entries=256,
+                 ttl_seconds=24 * 3600, max_disk_bytes=50 * 1024 * 1024, sweep_interval=60):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        # Eviction scans the directory, so it only runs when our running byte estimate
+        # crosses the budget or sweep_interval seconds have passed (not on every put)
+        self.sweep_interval = sweep_interval
+        self._disk_bytes = None  # estimate since the last sweep (None: unknown)
+        self._last_sweep = 0.0
+        self._memory = OrderedDict()  # key -> (created_at, text)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(fin_status, inv_status, comp_status, product_id, crisis_mode, model_name):
+        # Stable hash of everything that goes into the prompt
+        context = {
+            "fin": fin_status,
+            "inv": inv_status,
+            "comp": comp_status,
+            "product_id": product_id,
+            "crisis_mode": crisis_mode,
+            "model": model_name,
+        }
+        blob = json.dumps(context, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key, created_at, text):
+        # Caller holds the lock
+        self._memory[key] = (created_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            # Tier 1: memory
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            # Tier 2: disk
+            fname = self._file(key)
+            try:
+                with open(fname) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = None
+
+            if record is not None and not self._expired(record["created_at"]):
+                os.utime(fname)  # mark as recently used for eviction
+                self._remember(key, record["created_at"], record["text"])
+                self._stats["disk_hits"] += 1
+                return record["text"]
+
+            if record is not None:
+                # Expired on disk
+                try:
+                    os.remove(fname)
+                except OSError:
+                    pass
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, text):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, text)
+            self._stats["writes"] += 1
+
+            # Atomic write so concurrent readers never see a partial file
+            tmp = self._file(key) + f".{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"created_at": created_at, "text": text}, f)
+                written = f.tell()
+            os.replace(tmp, self._file(key))
+
+            if self._disk_bytes is not None:
+                self._disk_bytes += written
+            if (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                    or time.monotonic() - self._last_sweep > self.sweep_interval):
+                self._evict()
+
+    def _evict(self):
+        # Caller holds the lock. Drop expired files, then oldest-used until under the byte budget.
+        entries = []
+        total = 0
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(".json"):
+                continue
+            st = entry.stat()
+            if self._expired(st.st_mtime) and self._expired_on_disk(entry.path):
+                self._remove(entry.path)
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, fname in entries:
+            if total <= self.max_disk_bytes:
+                break
+            self._remove(fname)
+            total -= size
+        self._disk_bytes = total
+        self._last_sweep = time.monotonic()
+
+    def _expired_on_disk(self, fname):
+        try:
+            with open(fname) as f:
+                return self._expired(json.load(f)["created_at"])
+        except (OSError, ValueError, KeyError):
+            return True
+
+    def _remove(self, fname):
+        try:
+            os.remove(fname)
+            self._stats["evictions"] += 1
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+            self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
@@ -1,123 +1,144 @@
-import pandas as pd
-import random
-from datetime import datetime, timedelta
+import os
+import argparse
+import datetime
 import numpy as np
+import pandas as pd
+from sales_store import SalesStore, csv_signature, to_days
+import audit_store
+
+# Sample names to mix and match for variety
+ADJECTIVES = np.array(["Pro", "Slim", "Ultra", "Gaming", "Office", "Smart", "Wireless", "Ergo", "Mechanical", "HD"])
+NOUNS = np.array(["Laptop", "Mouse", "Keyboard", "Headphones", "Monitor", "Webcam", "Speaker", "Tablet", "Phone", "Charger"])
+VENDORS = np.array(["abc", "xyz", "global", "tech", "supply"])
+# Last sales day / newest competitor observation. Fixed so a seed reproduces the same files
+# on any day; pass end_date (or --end-date) for a dataset that ends today.
+DEFAULT_END_DATE = "2024-06-30"
+
+
+def generate_data(num_products=50, num_days=60, competitors_per_sku=1, audit_rows=0,
+                  seed=None, out_dir=".", sales_format="csv", end_date=None):
+    # Seeded, vectorized generator: every table is built from NumPy arrays, no per-row Python.
+    # sales_format: "csv" (wide sales_history.csv), "store" (columnar sales_store/), or "both".
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"Generating dataset: {num_products} products x {num_days} days (seed={seed})...")
 
-def generate_data():
-    print("Generating expanded dataset...")
-    
-    num_products = 50
-    num_days = 60
-    
     # 1. Generate Products (Inventory)
-    products = []
-    # Sample names to mix and match for variety
-    adjectives = ["Pro", "Slim", "Ultra", "Gaming", "Office", "Smart", "Wireless", "Ergo", "Mechanical", "HD"]
-    nouns = ["Laptop", "Mouse", "Keyboard", "Headphones", "Monitor", "Webcam", "Speaker", "Tablet", "Phone", "Charger"]
-    
-    inventory_data = {
-        "product_id": [],
-        "product_name": [],
-        "cost_price": [],
-        "selling_price": [],
-        "current_stock": [],
-        "min_stock_threshold": [],
-        "vendor_email": []
-    }
-    
-    # Pre-define some existing ones to keep continuity if desired, but we can just overwrite all P001-P050
-    for i in range(1, num_products + 1):
-        pid = f"P{i:03d}"
-        pname = f"{random.choice(adjectives)} {random.choice(nouns)} {random.randint(100, 900)}"
-        
-        # Random pricing logic
-        cost = random.randint(10, 500)
-        margin = random.uniform(1.2, 2.0)
-        selling = int(cost * margin)
-        
-        stock = random.randint(0, 200)
-        threshold = random.randint(5, 30)
-
-        # Force some scenarios
-        if i % 10 == 0:
-            # Overstock (High Stock > 100, we will force low sales later)
-            stock = random.randint(120, 300)
-            pname = f"Old Gen {pname}" # Mark it visually
-        elif i % 10 == 1:
-            # Low Stock (Stock < 10)
-            stock = random.randint(0, 5)
-        
-        # Fake email
-        v_email = f"vendor.{random.choice(['abc', 'xyz', 'global', 'tech', 'supply'])}.{random.randint(1,99)}@example.com"
-        
-        inventory_data["product_id"].append(pid)
-        inventory_data["product_name"].append(pname)
-        inventory_data["cost_price"].append(cost)
-        inventory_data["selling_price"].append(selling)
-        inventory_data["current_stock"].append(stock)
-        inventory_data["min_stock_threshold"].append(threshold)
-        inventory_data["vendor_email"].append(v_email)
-        
-    df_inventory = pd.DataFrame(inventory_data)
-    df_inventory.to_csv("inventory.csv", index=False)
+    idx = np.arange(1, num_products + 1)
+    product_ids = pd.Series(idx).map(lambda i: f"P{i:03d}")
+    names = (pd.Series(rng.choice(ADJECTIVES, num_products)) + " "
+             + pd.Series(rng.choice(NOUNS, num_products)) + " "
+             + pd.Series(rng.integers(100, 901, num_products)).astype(str))
+
+    # Random pricing logic
+    cost = rng.integers(10, 501, num_products)
+    margin = rng.uniform(1.2, 2.0, num_products)
+    selling = (cost * margin).astype(np.int64)
+
+    stock = rng.integers(0, 201, num_products)
+    threshold = rng.integers(5, 31, num_products)
+
+    # Force some scenarios
+    overstock = idx % 10 == 0   # High Stock > 100, low sales forced below
+    low_stock = idx % 10 == 1   # Stock < 10
+    stock = np.where(overstock, rng.integers(120, 301, num_products), stock)
+    stock = np.where(low_stock, rng.integers(0, 6, num_products), stock)
+    names = names.where(~overstock, "Old Gen " + names)  # Mark it visually
+
+    # Fake email
+    emails = ("vendor." + pd.Series(rng.choice(VENDORS, num_products)) + "."
+              + pd.Series(rng.integers(1, 100, num_products)).astype(str) + "@example.com")
+
+    df_inventory = pd.DataFrame({
+        "product_id": product_ids,
+        "product_name": names,
+        "cost_price": cost,
+        "selling_price": selling,
+        "current_stock": stock,
+        "min_stock_threshold": threshold,
+        "vendor_email": emails,
+    })
+    df_inventory.to_csv(os.path.join(out_dir, "inventory.csv"), index=False)
     print(f"✅ Generated inventory.csv with {len(df_inventory)} rows.")
 
-    # 2. Generate Competitors
-    competitor_data = {
-        "product_id": [],
-        "competitor_price": [],
-        "competitor_promo": []
-    }
-    
-    for i in range(len(inventory_data["product_id"])):
-        pid = inventory_data["product_id"][i]
-        our_price = inventory_data["selling_price"][i]
-        
-        # Competitor price variation (+- 15%)
-        variation = random.uniform(0.85, 1.15)
-        comp_price = int(our_price * variation)
-        promo = random.choice([True, False])
-        
-        competitor_data["product_id"].append(pid)
-        competitor_data["competitor_price"].append(comp_price)
-        competitor_data["competitor_promo"].append(promo)
-        
-    df_competitors = pd.DataFrame(competitor_data)
-    df_competitors.to_csv("competitors.csv", index=False)
+    # 2. Generate Competitors (one or more sellers per product, each with its latest observation)
+    comp_idx = np.repeat(np.arange(num_products), competitors_per_sku)
+    # Competitor price variation (+- 15%)
+    variation = rng.uniform(0.85, 1.15, len(comp_idx))
+    end = pd.Timestamp(end_date or DEFAULT_END_DATE)
+    # Separate stream so adding observation fields leaves the other tables' draws unchanged
+    obs_rng = rng.spawn(1)[0]
+    df_competitors = pd.DataFrame({
+        "product_id": product_ids.to_numpy()[comp_idx],
+        "competitor": "seller_" + pd.Series(np.tile(np.arange(1, competitors_per_sku + 1), num_products)).astype(str),
+        "competitor_price": (selling[comp_idx] * variation).astype(np.int64),
+        "competitor_promo": obs_rng.random(len(comp_idx)) < 0.5,
+        "observed_at": (end - pd.to_timedelta(obs_rng.integers(0, 7 * 24 * 60, len(comp_idx)), unit="min")).floor("min"),
+    })
+    df_competitors.to_csv(os.path.join(out_dir, "competitors.csv"), index=False)
     print(f"✅ Generated competitors.csv with {len(df_competitors)} rows.")
-    
-    # 3. Generate Sales History
-    # Columns: date, P001_sales, P002_sales, ...
-    
-    dates = [datetime.today() - timedelta(days=x) for x in range(num_days)]
-    dates.sort() # Oldest to newest
-    date_strings = [d.strftime("%Y-%m-%d") for d in dates]
-    
-    sales_data = {"date": date_strings}
-    
-    for pid in inventory_data["product_id"]:
-        # Generate random daily sales patterns
-        
-        # Check if we forced this product to be Overstock (ID ends in 0 for our logic above?)
-        # Let's map back from the PID string "P010", "P020" etc.
-        idx = int(pid[1:]) # P001 -> 1
-        
-        avg_daily = random.randint(0, 15)
-        
-        if idx % 10 == 0:
-            # Force LOW sales for Overstock candidates (Avg < 1)
-            avg_daily = 0.5 
-            
-        pattern = np.random.poisson(avg_daily, num_days)
-        sales_data[f"{pid}_sales"] = pattern
-        
-    df_sales = pd.DataFrame(sales_data)
-    # Sort by date descending as per original file style (usually newest first is better for view, but original was newest first? Let's check original...
-    # Original sales_history.csv had 2025-12-20 at top. So descending.)
-    df_sales = df_sales.sort_values(by="date", ascending=False)
-    
-    df_sales.to_csv("sales_history.csv", index=False)
-    print(f"✅ Generated sales_history.csv with {len(df_sales)} rows and {len(df_sales.columns)} columns.")
+
+    # 3. Generate Sales History (Poisson daily sales per SKU)
+    dates = pd.date_range(end=end, periods=num_days, freq="D")  # Oldest to newest
+    avg_daily = rng.integers(0, 16, num_products).astype(np.float64)
+    avg_daily[overstock] = 0.5  # Force LOW sales for Overstock candidates
+    sales = rng.poisson(avg_daily[None, :], (num_days, num_products)).astype(np.int32)
+
+    if sales_format in ("csv", "both"):
+        # Newest first, as in the original file
+        df_sales = pd.DataFrame(sales[::-1], columns=(product_ids + "_sales").tolist())
+        df_sales.insert(0, "date", dates[::-1].strftime("%Y-%m-%d"))
+        df_sales.to_csv(os.path.join(out_dir, "sales_history.csv"), index=False)
+        print(f"✅ Generated sales_history.csv with {len(df_sales)} rows and {len(df_sales.columns)} columns.")
+
+    if sales_format in ("store", "both"):
+        # Long format straight into the columnar store (no giant wide CSV)
+        codes = np.tile(np.arange(num_products, dtype=np.int32), num_days)
+        days = np.repeat(to_days(dates), num_products)
+        # Written alongside the CSV: record it as the source, so the store isn't rebuilt from it
+        source = csv_signature(os.path.join(out_dir, "sales_history.csv")) if sales_format == "both" else None
+        SalesStore.create(os.path.join(out_dir, "sales_store"), product_ids.tolist(), codes, days, sales.ravel(),
+                          source)
+        print(f"✅ Generated sales_store/ with {sales.size} rows.")
+
+    # 4. Financials (same shape as generate_data.py, so a generated dir is self-contained)
+    pd.DataFrame({
+        "metric": ["cash_balance", "monthly_burn_rate", "fixed_costs"],
+        "value": [12000, 5000, 3000],
+    }).to_csv(os.path.join(out_dir, "financials.csv"), index=False)
+
+    # 5. Generate Audit Log (hash-chained, like AuditAgent writes)
+    if audit_rows:
+        pick = rng.integers(0, num_products, audit_rows)
+        stamps = (end - pd.to_timedelta(np.sort(rng.integers(0, num_days * 86400, audit_rows))[::-1], unit="s"))
+        rows = zip(
+            stamps.strftime("%Y-%m-%d %H:%M:%S"),
+            rng.choice(np.array(["MarketingAgent", "InventoryAgent", "CompetitorAgent"]), audit_rows),
+            product_ids.to_numpy()[pick],
+            np.full(audit_rows, "Strategy Generation"),
+            [f"{h:016x}" for h in rng.integers(0, 2**63, audit_rows)],
+            np.full(audit_rows, "CHAINED"),
+        )
+        chained, _ = audit_store.chain(audit_store.GENESIS_HASH, rows)
+        df_audit = pd.DataFrame(chained, columns=audit_store.HEADER)
+        df_audit.to_csv(os.path.join(out_dir, "audit_log.csv"), index=False)
+        print(f"✅ Generated audit_log.csv with {len(df_audit)} rows.")
+
+    return df_inventory
+
 
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Generate a synthetic MSME dataset.")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--competitors", type=int, default=1, help="Competitor rows per SKU")
+    parser.add_argument("--audit-rows", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--sales-format", choices=["csv", "store", "both"], default="csv")
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE, help="Last sales day (YYYY-MM-DD or 'today')")
+    args = parser.parse_args()
+
+    generate_data(args.products, args.days, args.competitors, args.audit_rows,
+                  args.seed, args.out, args.sales_format,
+                  datetime.date.today() if args.end_date == "today" else args.end_date)
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# --- DEMAND FORECASTING ---
+# Exponential smoothing with additive weekly seasonality, fitted to every SKU at once:
+#     level_t    = alpha * (y_t - season_{t-7}) + (1 - alpha) * level_{t-1}
+#     season_t   = gamma * (y_t - level_t)      + (1 - gamma) * season_{t-7}
+# The loop runs over days; each step is a vector operation across all SKUs, so cost is
+# O(days) NumPy calls regardless of catalog size. SKUs are processed in chunks to bound memory.
+#
+# From the forecast we derive, per SKU:
+#   forecast_daily    mean forecast units/day over the horizon
+#   days_of_cover     current stock / forecast_daily
+#   reorder_point     lead-time demand + safety stock (never below min_stock_threshold)
+#   reorder_qty       units to order now to cover lead time + review period (0 if not needed)
+
+
+class DemandForecaster:
+    def __init__(self, alpha=0.3, gamma=0.1, season=7, horizon=14, lead_time=7, service_z=1.65):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.season = season
+        self.horizon = horizon
+        self.lead_time = lead_time
+        self.service_z = service_z
+
+    def fit(self, history):
+        # history: (SKUs x days), oldest day first. Returns level, seasonal (season x SKUs), sigma.
+        # Work day-major (days x SKUs) so every step touches contiguous memory.
+        y = np.ascontiguousarray(np.asarray(history).T, dtype=np.float64)
+        t_total, n = y.shape
+        m = self.season
+        a, g = self.alpha, self.gamma
+
+        if t_total < m:
+            # Not enough history for a season: flat mean, no seasonality
+            level = y.mean(axis=0) if t_total else np.zeros(n)
+            return level, np.zeros((m, n)), np.zeros(n), t_total
+
+        level = y[:m].mean(axis=0)
+        seasonal = y[:m] - level
+        sse = np.zeros(n)
+        err = np.empty(n)
+
+        for t in range(m, t_total):
+            obs = y[t]
+            prev_season = seasonal[t % m]
+            # One-step-ahead error (for the safety stock)
+            np.subtract(obs, level, out=err)
+            err -= prev_season
+            sse += err * err
+            # level += a * err  <=>  a * (obs - prev_season) + (1 - a) * level
+            level += a * err
+            # season = g * (obs - level) + (1 - g) * prev_season, updated in place
+            prev_season *= (1 - g)
+            prev_season += g * (obs - level)
+
+        sigma = np.sqrt(sse / max(t_total - m, 1))
+        return level, seasonal, sigma, t_total
+
+    def forecast(self, level, seasonal, t_total, horizon=None):
+        # (SKUs x horizon) daily forecast, clipped at zero
+        horizon = horizon or self.horizon
+        phases = (t_total + np.arange(horizon)) % self.season
+        return np.clip(level[:, None] + seasonal[phases].T, 0, None)
+
+    def plan(self, history, stock, min_stock=None):
+        level, seasonal, sigma, t_total = self.fit(history)
+        stock = np.asarray(stock, dtype=np.float64)
+        review = self.horizon
+        path = self.forecast(level, seasonal, t_total, self.lead_time + review)
+
+        forecast_daily = path[:, :self.horizon].mean(axis=1) if self.horizon else np.zeros(len(stock))
+        lead_demand = path[:, :self.lead_time].sum(axis=1)
+        safety = self.service_z * sigma * np.sqrt(self.lead_time)
+
+        reorder_point = lead_demand + safety
+        if min_stock is not None:
+            reorder_point = np.maximum(reorder_point, np.asarray(min_stock, dtype=np.float64))
+
+        # Order up to: demand over lead time + review period, plus safety stock
+        order_up_to = path.sum(axis=1) + safety
+        reorder_qty = np.where(stock <= reorder_point, np.ceil(np.maximum(order_up_to - stock, 0)), 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            days_of_cover = np.where(forecast_daily > 0, stock / forecast_daily, np.inf)
+
+        return {
+            "forecast_daily": forecast_daily,
+            "forecast_demand": path[:, :self.horizon].sum(axis=1),
+            "days_of_cover": days_of_cover,
+            "safety_stock": safety,
+            "reorder_point": reorder_point,
+            "reorder_qty": reorder_qty.astype(np.int64),
+        }
+
+
+def forecast_catalog(store, inventory, chunk_size=10000, **params):
+    # Forecast + reorder plan for every SKU in `inventory` that has sales history
+    forecaster = DemandForecaster(**params)
+    inv = inventory.drop_duplicates('product_id')
+    inv = inv[inv['product_id'].isin(store.codes)]
+    product_ids = inv['product_id'].tolist()
+    stock = inv['current_stock'].to_numpy()
+    min_stock = inv['min_stock_threshold'].to_numpy() if 'min_stock_threshold' in inv else None
+
+    parts = []
+    for lo in range(0, len(product_ids), chunk_size):
+        hi = lo + chunk_size
+        _, history = store.recent_matrix(product_ids[lo:hi], len(store.days))
+        plan = forecaster.plan(history, stock[lo:hi], None if min_stock is None else min_stock[lo:hi])
+        plan["product_id"] = product_ids[lo:hi]
+        parts.append(pd.DataFrame(plan))
+
+    columns = ["product_id", "forecast_daily", "forecast_demand", "days_of_cover",
+               "safety_stock", "reorder_point", "reorder_qty"]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    result = pd.concat(parts, ignore_index=True)[columns]
+    result.insert(1, "product_name", inv['product_name'].to_numpy())
+    result.insert(2, "stock", stock)
+    return result
@@ -1,28 +1,95 @@
-import google.generativeai as genai
-import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
+import metrics
 
 load_dotenv()
 
 from agents import FinanceAgent, InventoryAgent, CompetitorAgent, AuditAgent
+from data_context import DataContext
+from decision_cache import DecisionCache
+from rate_limiter import TokenBucket
+from model_backends import get_backend
+from rules import pre_decide, evaluate as evaluate_rules
+from batch_prompts import build_batch_prompt, parse_batch_response
+from competitor_prices import format_price
 
-# ⚠️ PASTE YOUR KEY HERE
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file.")
-genai.configure(api_key=API_KEY)
+# Per-request timeouts run the call on a worker thread. A timed-out call keeps its thread
+# until the backend returns: past MAX_ABANDONED_CALLS of those, new calls fail fast
+# instead of queueing behind them.
+MAX_CALL_THREADS = 32
+MAX_ABANDONED_CALLS = 16
+
+# ⚠️ Set GEMINI_API_KEY in .env (read lazily on the first model call).
+# MODEL_BACKEND=local runs everything offline with a deterministic stand-in model.
 
 class MarketingAgent:
-    def __init__(self):
-        self.finance = FinanceAgent()
-        self.inventory = InventoryAgent()
-        self.competitor = CompetitorAgent()
-        self.audit = AuditAgent()
-        # ✅ Using the model you confirmed works
-        self.model = genai.GenerativeModel('gemini-2.5-flash') 
-
-    def generate_strategy(self, product_id, crisis_mode=False):
-        # 1. GATHER INTELLIGENCE
+    def __init__(self, data=None, cache=None, backend=None, audit=None, use_rules=True):
+        # One shared data context: every CSV is parsed once for all agents
+        self.data = data or DataContext()
+        self.finance = FinanceAgent(self.data)
+        self.inventory = InventoryAgent(self.data)
+        self.competitor = CompetitorAgent(self.data)
+        self.audit = audit or AuditAgent()
+        # ✅ Pluggable model backend (Gemini by default, see model_backends.py)
+        self.backend = backend or get_backend()
+        self.model_name = self.backend.model_name
+        # Identical inputs -> identical decision, so skip the round-trip
+        self.cache = cache or DecisionCache()
+        # Forced outcomes (crisis cash, overstock) are decided by rules.py without the model
+        self.use_rules = use_rules
+        # Worker threads used to enforce per-request timeouts (started on first use)
+        self._call_pool = ThreadPoolExecutor(max_workers=MAX_CALL_THREADS, thread_name_prefix="model-call")
+        self._abandoned = 0
+        self._abandoned_lock = threading.Lock()
+
+    @property
+    def abandoned_calls(self):
+        # Timed-out model calls still occupying a worker thread
+        return self._abandoned
+
+    def _call_finished(self, future):
+        with self._abandoned_lock:
+            self._abandoned -= 1
+
+    def _ask_model(self, prompt, limiter=None, timeout=None, retries=0, backoff=0.5, json_mode=False):
+        # One model call with optional rate limiting, timeout and retry with exponential backoff
+        for attempt in range(retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                with metrics.span("model.call"):
+                    if timeout is None:
+                        return self.backend.generate(prompt, json_mode)
+                    if self._abandoned >= MAX_ABANDONED_CALLS:
+                        raise TimeoutError(f"{self._abandoned} timed-out model calls are still running")
+                    future = self._call_pool.submit(self.backend.generate, prompt, json_mode)
+                    try:
+                        return future.result(timeout=timeout)
+                    except FutureTimeout:
+                        metrics.incr("model.timeouts")
+                        if not future.cancel():
+                            # Already running: its thread is only freed when the backend returns
+                            with self._abandoned_lock:
+                                self._abandoned += 1
+                            metrics.incr("model.abandoned_calls")
+                            future.add_done_callback(self._call_finished)
+                        raise TimeoutError(f"Model call timed out after {timeout}s")
+            except Exception:
+                if attempt == retries:
+                    raise
+                metrics.incr("model.retries")
+                # Jittered so parallel workers don't retry in lockstep
+                time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _prepare(self, product_id, crisis_mode=False):
+        # Steps shared by generate_strategy and stream_strategy.
+        # Returns (decided text or None, cache key, prompt): text when rules or the cache answer.
+        # 1. GATHER INTELLIGENCE (picks up any CSV that changed on disk)
+        self.data.refresh()
         fin_status = self.finance.get_status()
         inv_status = self.inventory.analyze_product(product_id)
         comp_status = self.competitor.compare_price(product_id)
@@ -33,6 +100,32 @@ class MarketingAgent:
             fin_status['status'] = "EMERGENCY"
             # Force the prompt to realize we are dying
 
+        # ⚖️ RULES: the prompt's hard constraints already fix the answer -> no model call
+        if self.use_rules:
+            ruled = pre_decide(fin_status, inv_status, comp_status)
+            if ruled is not None:
+                rule_name, decision_text = ruled
+                metrics.incr(f"rules.{rule_name}")
+                self.audit.log_event(
+                    agent_name="MarketingAgent",
+                    product_id=product_id,
+                    action="Strategy Generation (Rule-Based)",
+                    reasoning=decision_text
+                )
+                return decision_text, None, None
+
+        # ♻️ CACHE: same context as a previous call -> reuse that decision
+        cache_key = DecisionCache.fingerprint(fin_status, inv_status, comp_status, product_id, crisis_mode, self.model_name)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.audit.log_event(
+                agent_name="MarketingAgent",
+                product_id=product_id,
+                action="Strategy Generation (Cached)",
+                reasoning=cached
+            )
+            return cached, None, None
+
         # 2. CONSTRUCT THE PROMPT
         prompt = f"""
         You are an Autonomous Marketing Agent. Make a strategic decision based on the data below.
@@ -40,7 +133,7 @@ class MarketingAgent:
         --- BUSINESS CONTEXT ---
         💰 CASH STATUS: {fin_status['message']}
         📦 INVENTORY: {inv_status['status']} (Stock: {inv_status['stock']}, 7-Day Sales: {inv_status['7d_sales']}).
-        🕵️ COMPETITOR: {comp_status['position']} (My Price: {comp_status['my_price']}, Theirs: {comp_status['competitor_price']}).
+        🕵️ COMPETITOR: {comp_status['position']} (My Price: {comp_status['my_price']}, Theirs: {format_price(comp_status['competitor_price'])} across {comp_status['competitors']} sellers, lowest {format_price(comp_status['competitor_min'])}, {comp_status['promo_count']} on promo).
         
         --- PRODUCT ---
         Product Name: {inv_status['product']}
@@ -58,23 +151,173 @@ class MarketingAgent:
         **ACTION:** [Specific tactic]
         """
 
+        return None, cache_key, prompt
+
+    def _finish(self, product_id, cache_key, decision_text):
+        # A fresh model answer: cache it, then audit
+        self.cache.put(cache_key, decision_text)
+
+        # 4. 📜 AUDIT LOGGING
+        self.audit.log_event(
+            agent_name="MarketingAgent",
+            product_id=product_id,
+            action="Strategy Generation",
+            reasoning=decision_text
+        )
+
+    @metrics.timed("marketing.generate_strategy")
+    def generate_strategy(self, product_id, crisis_mode=False, limiter=None, timeout=None, retries=0, backoff=0.5):
+        decided, cache_key, prompt = self._prepare(product_id, crisis_mode)
+        if decided is not None:
+            return decided
+
         # 3. GET AI DECISION
         try:
-            response = self.model.generate_content(prompt)
-            decision_text = response.text
-            
-            # 4. 📜 AUDIT LOGGING
-            self.audit.log_event(
-                agent_name="MarketingAgent",
-                product_id=product_id,
-                action="Strategy Generation",
-                reasoning=decision_text
-            )
-            
+            decision_text = self._ask_model(prompt, limiter, timeout, retries, backoff)
+            self._finish(product_id, cache_key, decision_text)
             return decision_text
         except Exception as e:
             return f"Error connecting to AI: {e}"
 
+    def stream_strategy(self, product_id, crisis_mode=False):
+        # Same decision as generate_strategy, yielded in chunks as the model produces them.
+        # The answer is cached and audited only once the stream has completed.
+        decided, cache_key, prompt = self._prepare(product_id, crisis_mode)
+        if decided is not None:
+            yield decided
+            return
+
+        chunks = []
+        started = time.perf_counter()
+        try:
+            with metrics.span("model.stream"):
+                for chunk in self.backend.stream(prompt):
+                    if not chunks:
+                        metrics.observe("model.first_chunk", time.perf_counter() - started)
+                    chunks.append(chunk)
+                    yield chunk
+        except Exception as e:
+            yield f"Error connecting to AI: {e}"
+            return
+        self._finish(product_id, cache_key, "".join(chunks))
+
+    def generate_strategies(self, product_ids, crisis_mode=False, concurrency=8, rate_per_sec=None,
+                            timeout=30, retries=3, backoff=0.5):
+        # Fan out generate_strategy over a thread pool. Results come back in input order.
+        limiter = TokenBucket(rate_per_sec, burst=concurrency) if rate_per_sec else None
+        
+        def run(pid):
+            return self.generate_strategy(pid, crisis_mode=crisis_mode, limiter=limiter,
+                                          timeout=timeout, retries=retries, backoff=backoff)
+        
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="strategy") as pool:
+            return list(pool.map(run, product_ids))
+
+    # --- BATCHED, STRUCTURED DECISIONS ---
+    @metrics.timed("marketing.decide_batch")
+    def decide_batch(self, product_ids, crisis_mode=False, batch_size=25, concurrency=4, rate_per_sec=None,
+                     timeout=60, retries=2, backoff=0.5):
+        # Decisions for many SKUs as dicts (product_id, decision, reasoning, action, source, error),
+        # in input order. Rules and the cache answer first; the rest go to the model batch_size
+        # products per request (see batch_prompts.py), sub-batches running concurrently.
+        self.data.refresh()
+        fin_status = self.finance.get_status()
+        if crisis_mode:
+            fin_status['message'] = "CRITICAL: Cash runway is < 2 weeks. BANKRUPTCY IMMINENT."
+            fin_status['status'] = "EMERGENCY"
+
+        unique_ids = list(dict.fromkeys(product_ids))
+        health = self.inventory.analyze_many(unique_ids)
+        market = self.competitor.market.reindex(unique_ids)
+        model_key = self.model_name + ":json"
+
+        results = {}
+        pending = []  # (row for the prompt, cache key)
+        for pid, product, stock, sales_7d, status, my_price, comp_price, comp_min, sellers, promos, position in zip(
+                unique_ids, health['product'], health['stock'], health['7d_sales'], health['status'],
+                market['my_price'], market['competitor_price'], market['competitor_min'], market['competitors'],
+                market['promo_count'], market['position'].fillna("No competitor data")):
+            inv_status = {"product": product, "stock": stock, "7d_sales": sales_7d, "status": status}
+            comp_status = {"my_price": my_price, "competitor_price": comp_price, "competitor_min": comp_min,
+                           "competitors": sellers, "promo_count": promos, "position": position}
+
+            ruled = evaluate_rules(fin_status, inv_status, comp_status) if self.use_rules else None
+            if ruled is not None:
+                rule_name, fields = ruled
+                metrics.incr(f"rules.{rule_name}")
+                results[pid] = self._record(pid, fields, "rule", "Strategy Generation (Rule-Based)")
+                continue
+
+            key = DecisionCache.fingerprint(fin_status, inv_status, comp_status, pid, crisis_mode, model_key)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[pid] = self._record(pid, json.loads(cached), "cache", "Strategy Generation (Cached)")
+                continue
+
+            row = {"product_id": pid, "product": product, "inventory": status, "stock": stock,
+                   "sales_7d": sales_7d, "my_price": my_price, "competitor_price": format_price(comp_price),
+                   "competitor_min": format_price(comp_min), "position": position}
+            pending.append((row, key))
+
+        if pending:
+            limiter = TokenBucket(rate_per_sec, burst=concurrency) if rate_per_sec else None
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+            def run(batch):
+                return self._decide_rows(fin_status, batch, limiter, timeout, retries, backoff)
+
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="strategy-batch") as pool:
+                for decided in pool.map(run, batches):
+                    results.update(decided)
+
+        return [results[pid] for pid in product_ids]
+
+    def _decide_rows(self, fin_status, rows, limiter, timeout, retries, backoff):
+        # One batched request; products without a valid answer are re-asked in halves,
+        # down to single-product requests, before being reported as errors
+        product_ids = [row["product_id"] for row, _ in rows]
+        try:
+            text = self._ask_model(build_batch_prompt(fin_status, [row for row, _ in rows]),
+                                   limiter, timeout, retries, backoff, json_mode=True)
+            decided, errors = parse_batch_response(text, product_ids)
+        except Exception as e:
+            decided, errors = {}, {pid: str(e) for pid in product_ids}
+
+        results = {}
+        for row, key in rows:
+            decision = decided.get(row["product_id"])
+            if decision is not None:
+                self.cache.put(key, json.dumps(decision))
+                results[row["product_id"]] = self._record(row["product_id"], decision, "model", "Strategy Generation (Batched)")
+
+        failed = [(row, key) for row, key in rows if row["product_id"] in errors]
+        if not failed:
+            return results
+        metrics.incr("batch.failed_rows", len(failed))
+        if len(failed) > 1:
+            mid = len(failed) // 2
+            for half in (failed[:mid], failed[mid:]):
+                results.update(self._decide_rows(fin_status, half, limiter, timeout, retries, backoff))
+        elif len(rows) > 1:
+            results.update(self._decide_rows(fin_status, failed, limiter, timeout, retries, backoff))
+        else:
+            pid = failed[0][0]["product_id"]
+            results[pid] = {"product_id": pid, "decision": None, "reasoning": None, "action": None,
+                            "source": "error", "error": errors[pid]}
+        return results
+
+    def _record(self, product_id, fields, source, action):
+        # Audit one structured decision and return it in decide_batch's result shape
+        decision = {"product_id": product_id, "decision": fields["decision"], "reasoning": fields["reasoning"],
+                    "action": fields["action"], "source": source, "error": None}
+        self.audit.log_event(
+            agent_name="MarketingAgent",
+            product_id=product_id,
+            action=action,
+            reasoning=json.dumps(decision, sort_keys=True)
+        )
+        return decision
+
 if __name__ == "__main__":
     agent = MarketingAgent()
     print("Normal Mode:", agent.generate_strategy("P001", crisis_mode=False))
@@ -0,0 +1,194 @@
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+
+# --- INSTRUMENTATION ---
+# Process-wide timing spans and counters for the agents, data loads, model calls and audit I/O.
+#   @timed("inventory.analyze_product")      time every call of a function
+#   with span("data.load.inventory"): ...    time a block
+#   incr("model.errors")                     bump a counter
+# Disabled by default (enable with METRICS=1 or metrics.enable()): a disabled span is a shared
+# no-op object and a disabled counter/decorator costs one attribute check, so the hooks can
+# stay in the hot paths. Export with snapshot() / to_json() / to_prometheus().
+
+PROMETHEUS_PREFIX = "msme"
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.spans = {}     # name -> [count, total, min, max]
+        self.counters = {}  # name -> value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stat = self.spans.get(name)
+            if stat is None:
+                self.spans[name] = [1, seconds, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                if seconds < stat[2]:
+                    stat[2] = seconds
+                if seconds > stat[3]:
+                    stat[3] = seconds
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            spans = {name: {"count": c, "total_s": t, "mean_s": t / c, "min_s": lo, "max_s": hi}
+                     for name, (c, t, lo, hi) in sorted(self.spans.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {"enabled": self.enabled, "spans": spans, "counters": counters}
+
+
+class _Span:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry.incr(self.name + ".errors")
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+REGISTRY = Metrics(enabled=os.getenv("METRICS", "").lower() in ("1", "true", "yes"))
+
+
+def enable():
+    REGISTRY.enabled = True
+
+
+def disable():
+    REGISTRY.enabled = False
+
+
+def enabled():
+    return REGISTRY.enabled
+
+
+def reset():
+    REGISTRY.reset()
+
+
+def span(name):
+    if not REGISTRY.enabled:
+        return _NULL_SPAN
+    return _Span(REGISTRY, name)
+
+
+def incr(name, value=1):
+    if REGISTRY.enabled:
+        REGISTRY.incr(name, value)
+
+
+def observe(name, seconds):
+    if REGISTRY.enabled:
+        REGISTRY.observe(name, seconds)
+
+
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return fn(*args, **kwargs)
+            with _Span(REGISTRY, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- EXPORT ---
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def to_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(prefix=PROMETHEUS_PREFIX):
+    # Prometheus text exposition format: spans as summaries (+ a max gauge), counters as counters
+    snap = snapshot()
+    lines = [
+        f"# HELP {prefix}_span_seconds Time spent in instrumented spans.",
+        f"# TYPE {prefix}_span_seconds summary",
+    ]
+    for name, stat in snap["spans"].items():
+        lines.append(f'{prefix}_span_seconds_count{{span="{_label(name)}"}} {stat["count"]}')
+        lines.append(f'{prefix}_span_seconds_sum{{span="{_label(name)}"}} {stat["total_s"]:.9f}')
+    lines.append(f"# HELP {prefix}_span_max_seconds Slowest observed call per span.")
+    lines.append(f"# TYPE {prefix}_span_max_seconds gauge")
+    for name, stat in snap["spans"].items():
+        lines.append(f'{prefix}_span_max_seconds{{span="{_label(name)}"}} {stat["max_s"]:.9f}')
+    lines.append(f"# HELP {prefix}_events_total Instrumented event counters.")
+    lines.append(f"# TYPE {prefix}_events_total counter")
+    for name, value in snap["counters"].items():
+        lines.append(f'{prefix}_events_total{{event="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+# --- PROFILING ---
+class Profiler:
+    # cProfile for one bounded piece of work (e.g. a single dashboard rerun)
+    def __init__(self, sort="cumulative", limit=40):
+        self.sort = sort
+        self.limit = limit
+        self._profile = cProfile.Profile()
+        self.report = ""
+
+    def start(self):
+        self._profile.enable()
+        return self
+
+    def stop(self):
+        self._profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats(self.sort).print_stats(self.limit)
+        self.report = out.getvalue()
+        return self.report
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
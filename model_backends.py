@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+import metrics
+from batch_prompts import parse_batch_rows
+
+# --- MODEL BACKENDS ---
+# MarketingAgent only needs `generate(prompt, json_mode=False) -> str` and a `model_name`
+# (used in cache keys). json_mode asks for a bare JSON response (batched prompts).
+# stream(prompt) yields the answer in chunks as it is produced (default: one chunk).
+# Backends:
+#   GeminiBackend  Google Gemini. The SDK is imported and configured on first use only,
+#                  so importing this module (and starting the dashboard) stays fast.
+#   LocalBackend   Offline, deterministic stand-in with configurable latency/failure rate,
+#                  for running and benchmarking the agents without network or API spend.
+#
+# Pick one with get_backend("gemini" | "local") or the MODEL_BACKEND env var.
+
+
+class ModelBackend:
+    model_name = "base"
+
+    def generate(self, prompt, json_mode=False):
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        yield self.generate(prompt)
+
+
+# --- GEMINI ---
+class GeminiBackend(ModelBackend):
+    def __init__(self, model_name="gemini-2.5-flash", api_key=None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Heavy import, deferred until the first real call
+                    import google.generativeai as genai
+
+                    api_key = self.api_key or os.getenv("GEMINI_API_KEY")
+                    if not api_key:
+                        raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file.")
+                    genai.configure(api_key=api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt, json_mode=False):
+        config = {"response_mime_type": "application/json"} if json_mode else None
+        response = self._client().generate_content(prompt, generation_config=config)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            metrics.incr("model.tokens.prompt", getattr(usage, "prompt_token_count", 0) or 0)
+            metrics.incr("model.tokens.output", getattr(usage, "candidates_token_count", 0) or 0)
+        return response.text
+
+    def stream(self, prompt):
+        response = self._client().generate_content(prompt, stream=True)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        # Usage is only complete once the stream is exhausted
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            metrics.incr("model.tokens.prompt", getattr(usage, "prompt_token_count", 0) or 0)
+            metrics.incr("model.tokens.output", getattr(usage, "candidates_token_count", 0) or 0)
+
+
+# --- LOCAL (OFFLINE) ---
+class LocalBackend(ModelBackend):
+    model_name = "local-deterministic"
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @staticmethod
+    def _field(prompt, label):
+        for line in prompt.splitlines():
+            if label in line:
+                return line
+        return ""
+
+    def _decide(self, prompt):
+        # Follow the same rules the prompt spells out for the real model
+        cash = self._field(prompt, "CASH STATUS:")
+        inventory = self._field(prompt, "INVENTORY:")
+        competitor = self._field(prompt, "COMPETITOR:")
+        if "EMERGENCY" in cash or "CRITICAL" in cash:
+            return "Liquidation", "Cash is critical, so no ad spend; convert stock to cash.", "Run a clearance discount on existing stock."
+        if "OVERSTOCK" in inventory:
+            return "Liquidation", "Dead inventory is tying up cash.", "Bundle or discount to clear stock."
+        if "LOW STOCK" in inventory:
+            return "Hold", "Stock is too low to support a campaign.", "Reorder from vendor before promoting."
+        if "Overpriced" in competitor:
+            return "Price Match", "Competitor is cheaper for the same product.", "Match the competitor price for 7 days."
+        return "Aggressive Push", "Healthy stock and competitive price.", "Launch a targeted ad campaign."
+
+    def _decide_batch(self, prompt):
+        # One JSON object per row of a batched prompt, same rules as _decide
+        cash = self._field(prompt, "CASH STATUS:")
+        answers = []
+        for row in parse_batch_rows(prompt):
+            line_prompt = "\n".join([
+                f"CASH STATUS: {cash}",
+                f"INVENTORY: {row.get('inventory', '')}",
+                f"COMPETITOR: {row.get('position', '')}",
+            ])
+            decision, reasoning, action = self._decide(line_prompt)
+            answers.append({"product_id": row["product_id"], "decision": decision,
+                            "reasoning": reasoning, "action": action})
+        return json.dumps(answers)
+
+    def stream(self, prompt, chunk_words=3):
+        # Latency is paid before the first chunk (time to first token); the words then trickle out
+        text = self.generate(prompt)
+        words = text.split(" ")
+        for i in range(0, len(words), chunk_words):
+            if i:
+                time.sleep(0.01)
+            yield " ".join(words[i:i + chunk_words]) + (" " if i + chunk_words < len(words) else "")
+
+    def generate(self, prompt, json_mode=False):
+        with self._lock:
+            self.calls += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("Simulated model failure")
+
+        if json_mode:
+            text = self._decide_batch(prompt)
+            metrics.incr("model.tokens.prompt", len(prompt.split()))
+            metrics.incr("model.tokens.output", len(text.split()))
+            return text
+
+        decision, reasoning, action = self._decide(prompt)
+        ref = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+        text = (
+            f"**DECISION:** {decision}\n"
+            f"**REASONING:** {reasoning}\n"
+            f"**ACTION:** {action} (ref {ref})"
+        )
+        # No tokenizer offline: whitespace words as a rough token count
+        metrics.incr("model.tokens.prompt", len(prompt.split()))
+        metrics.incr("model.tokens.output", len(text.split()))
+        return text
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "local": LocalBackend,
+}
+
+
+def get_backend(name=None, **kwargs):
+    name = (name or os.getenv("MODEL_BACKEND", "gemini")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if name == "local" and "latency" not in kwargs and os.getenv("LOCAL_MODEL_LATENCY"):
+        kwargs["latency"] = float(os.getenv("LOCAL_MODEL_LATENCY"))
+    return BACKENDS[name](**kwargs)
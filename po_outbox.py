@@ -0,0 +1,309 @@
+import os
+import time
+import uuid
+import random
+import sqlite3
+import smtplib
+import threading
+import datetime
+from contextlib import closing
+from email.message import EmailMessage
+import metrics
+
+# --- PURCHASE-ORDER OUTBOX ---
+# Reorder clicks only insert a line into a SQLite outbox and return. A background worker
+# drains it: pending lines are grouped by vendor_email into ONE multi-line PO per vendor and
+# sent over a pooled SMTP connection. Failed sends are retried with exponential backoff
+# (jittered) and marked failed after max_attempts.
+#
+# Line states: pending -> sending -> sent | (pending again, with next_attempt_at) | failed
+# A product has at most one pending line; reordering it again updates the quantity.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS po_lines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    vendor_email TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    po_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS po_lines_one_pending ON po_lines(product_id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS po_lines_due ON po_lines(status, next_attempt_at);
+"""
+
+# A line going back to 'pending' whose product was reordered meanwhile (only one pending line
+# per product): drop it, the newer line carries the current quantity
+REQUEUE_SUPERSEDED = ("DELETE FROM po_lines WHERE id = ? AND product_id IN "
+                      "(SELECT product_id FROM po_lines WHERE status = 'pending')")
+
+SENDER = "MSME Agent Bot <orders@msme-agent.local>"
+
+
+def build_po(po_id, vendor_email, lines, sender=SENDER):
+    # One email for all of a vendor's lines
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = vendor_email
+    msg["Subject"] = f"Purchase Order {po_id}: {len(lines)} item(s)"
+    items = "\n".join(f"  - {name} ({pid}): {qty} units" for pid, name, qty in lines)
+    msg.set_content(
+        f"Dear Vendor,\n\n"
+        f"Our system indicates low stock for the following products. Please process this reorder:\n\n"
+        f"{items}\n\n"
+        f"PO reference: {po_id}\n\n"
+        f"Best Regards,\nMSME Agent Bot"
+    )
+    return msg
+
+
+# --- MAILERS ---
+class SMTPMailer:
+    # Keeps one SMTP connection open across sends; reconnects when the server drops it
+    def __init__(self, host="localhost", port=25, username=None, password=None, starttls=False,
+                 timeout=10, max_idle=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._conn = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password or "")
+        return conn
+
+    def _connection(self):
+        # Caller holds the lock
+        if self._conn is not None and time.monotonic() - self._last_used > self.max_idle:
+            self.close_locked()
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def send(self, msg):
+        with self._lock:
+            try:
+                self._connection().send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Stale pooled connection: reconnect once
+                self.close_locked()
+                self._connection().send_message(msg)
+            self._last_used = time.monotonic()
+
+    def close_locked(self):
+        if self._conn is not None:
+            try:
+                self._conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._conn = None
+
+    def close(self):
+        with self._lock:
+            self.close_locked()
+
+
+class FileMailer:
+    # Writes each PO as an .eml file (no SMTP server configured: demo / local runs)
+    def __init__(self, path="po_sent"):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def send(self, msg):
+        name = msg["Subject"].split(":")[0].replace("Purchase Order ", "")
+        with open(os.path.join(self.path, f"{name}.eml"), "wb") as f:
+            f.write(bytes(msg))
+
+    def close(self):
+        pass
+
+
+def get_mailer():
+    # SMTP_HOST set -> pooled SMTP; otherwise POs are dropped into po_sent/
+    host = os.getenv("SMTP_HOST")
+    if not host:
+        return FileMailer(os.getenv("PO_DROP_DIR", "po_sent"))
+    return SMTPMailer(host, int(os.getenv("SMTP_PORT", "25")), os.getenv("SMTP_USER"),
+                      os.getenv("SMTP_PASSWORD"), os.getenv("SMTP_STARTTLS", "").lower() in ("1", "true", "yes"))
+
+
+# --- OUTBOX ---
+class POOutbox:
+    def __init__(self, path="po_outbox.db", mailer=None, coalesce_seconds=1.0, max_attempts=5,
+                 backoff=2.0, poll_interval=5.0, sender=SENDER):
+        self.path = path
+        self.mailer = mailer or get_mailer()
+        # Lines queued within this window of each other go out in the same PO
+        self.coalesce_seconds = coalesce_seconds
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.sender = sender
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    # --- PRODUCER SIDE (dashboard) ---
+    def enqueue(self, lines):
+        # lines: dicts with product_id, product_name, vendor_email, qty. Returns lines queued.
+        now = time.time()
+        rows = [(str(l["product_id"]), str(l["product_name"]), str(l["vendor_email"]), int(l["qty"]), now)
+                for l in lines]
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT INTO po_lines (product_id, product_name, vendor_email, qty, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(product_id) WHERE status = 'pending' DO UPDATE SET qty = excluded.qty, "
+                "vendor_email = excluded.vendor_email, product_name = excluded.product_name",
+                rows)
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        metrics.incr("po.lines_queued", len(rows))
+        self._wake.set()
+        return len(rows)
+
+    def stats(self):
+        with closing(self._connect()) as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM po_lines GROUP BY status").fetchall())
+            vendors = db.execute("SELECT COUNT(DISTINCT vendor_email) FROM po_lines WHERE status = 'pending'").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0) + counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "pending_vendors": vendors,
+        }
+
+    # --- WORKER SIDE ---
+    def _claim(self, db, now):
+        # Atomically move every due pending line to 'sending'; returns them grouped by vendor
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, vendor_email, product_id, product_name, qty, attempts FROM po_lines "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY vendor_email, id", (now,)).fetchall()
+            db.executemany("UPDATE po_lines SET status = 'sending' WHERE id = ?", [(r[0],) for r in rows])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        by_vendor = {}
+        for row in rows:
+            by_vendor.setdefault(row[1], []).append(row)
+        return by_vendor
+
+    def _commit(self, db, statements):
+        # One transaction per vendor: a failure here leaves the other vendors' lines alone
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                db.executemany(sql, params)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def process_once(self):
+        # Send one PO per vendor for everything due now. Returns the number of POs sent.
+        db = self._connect()
+        try:
+            sent = 0
+            for vendor, rows in self._claim(db, time.time()).items():
+                po_id = f"PO-{datetime.date.today():%Y%m%d}-{uuid.uuid4().hex[:6].upper()}"
+                ids = [(r[0],) for r in rows]
+                try:
+                    with metrics.span("po.send"):
+                        self.mailer.send(build_po(po_id, vendor, [(r[2], r[3], r[4]) for r in rows], self.sender))
+                except Exception as e:
+                    # Back off on the vendor's oldest attempt count, jittered
+                    attempts = max(r[5] for r in rows) + 1
+                    delay = self.backoff * (2 ** (attempts - 1)) * (0.5 + random.random())
+                    status = "failed" if attempts >= self.max_attempts else "pending"
+                    statements = [(
+                        "UPDATE po_lines SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        [(status, attempts, time.time() + delay, str(e), i) for (i,) in ids])]
+                    if status == "pending":
+                        # Reordered while this line was sending: the newer pending line replaces it
+                        statements.insert(0, (REQUEUE_SUPERSEDED, ids))
+                    metrics.incr("po.send_errors")
+                else:
+                    statements = [("UPDATE po_lines SET status = 'sent', po_id = ?, sent_at = ? WHERE id = ?",
+                                   [(po_id, time.time(), i) for (i,) in ids])]
+                    metrics.incr("po.sent")
+                    sent += 1
+                try:
+                    self._commit(db, statements)
+                except sqlite3.Error:
+                    # Lines stay 'sending' until start() requeues them; the other vendors carry on
+                    metrics.incr("po.status_errors")
+            return sent
+        finally:
+            db.close()
+
+    def _next_due(self):
+        with closing(self._connect()) as db:
+            return db.execute("SELECT MIN(next_attempt_at) FROM po_lines WHERE status = 'pending'").fetchone()[0]
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Sleep until woken by enqueue(), the next retry is due, or the poll interval
+            try:
+                due = self._next_due()
+            except sqlite3.Error:
+                due = None
+            timeout = self.poll_interval if due is None else min(self.poll_interval, max(0.0, due - time.time()))
+            woken = self._wake.wait(timeout)
+            if self._stop.is_set():
+                break
+            if woken:
+                self._wake.clear()
+                # Let a burst of clicks land before cutting the POs
+                time.sleep(self.coalesce_seconds)
+            try:
+                self.process_once()
+            except sqlite3.Error:
+                pass  # transient lock contention; the next pass retries
+
+    def start(self):
+        if self._thread is None:
+            # Lines left mid-send by a crashed worker go back to the queue
+            with closing(self._connect()) as db:
+                self._commit(db, [
+                    ("DELETE FROM po_lines WHERE status = 'sending' AND product_id IN "
+                     "(SELECT product_id FROM po_lines WHERE status = 'pending')", [()]),
+                    ("UPDATE po_lines SET status = 'pending' WHERE status = 'sending'", [()]),
+                ])
+            self._thread = threading.Thread(target=self._run, name="po-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.mailer.close()
@@ -0,0 +1,40 @@
+import time
+import threading
+
+# --- TOKEN BUCKET RATE LIMITER ---
+# Allows `rate` calls per second on average, with bursts of up to `burst` calls.
+# Thread-safe: every worker of a batch shares one bucket.
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        # Block until `tokens` are available
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
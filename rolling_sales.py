@@ -0,0 +1,91 @@
+import numpy as np
+
+# --- ROLLING SALES WINDOWS ---
+# Keeps N-day unit totals (default 7/30/90) for every SKU. The last max(window) days
+# live in a (products x days) ring buffer, so appending a day is O(SKUs):
+#     total[w] += units_today - units_from_w_days_ago
+# instead of re-summing history. Windows count stored days, newest first.
+
+DEFAULT_WINDOWS = (7, 30, 90)
+
+
+class RollingSales:
+    def __init__(self, store, windows=DEFAULT_WINDOWS):
+        self.windows = tuple(sorted(set(windows)))
+        self.rebuild(store)
+
+    def rebuild(self, store):
+        # Full build from the store: only the last max(window) days are read
+        self.products = list(store.products)
+        self.codes = dict(store.codes)
+        depth = self.windows[-1]
+        recent, matrix = store.recent_matrix(self.products, depth)
+
+        # Ring buffer: column `pos` holds the newest day
+        self.buffer = np.zeros((len(self.products), depth), dtype=np.int64)
+        self.buffer[:, :len(recent)] = matrix
+        self.pos = len(recent) - 1
+        self.days = list(np.asarray(store.days).tolist())
+        self.source = getattr(store, "source", None)
+        self.totals = {w: matrix[:, -w:].sum(axis=1) for w in self.windows}
+
+    def sync(self, store):
+        # Catch up with a store that has only gained newer days since we last looked;
+        # anything else (rewritten history, or a store rebuilt from a new CSV) falls back to a rebuild
+        store_days = np.asarray(store.days).tolist()
+        seen = len(self.days)
+        if getattr(store, "source", None) != self.source or store_days[:seen] != self.days:
+            self.rebuild(store)
+            return self
+        if store_days == self.days:
+            return self
+
+        new_days, matrix = store.recent_matrix(list(store.products), len(store_days) - seen)
+        self._grow(store.products)
+        for day, column in zip(new_days, matrix.T):
+            self._push(int(day), column)
+        return self
+
+    def _grow(self, products):
+        # New SKUs start with an empty history
+        for pid in products[len(self.products):]:
+            self.codes[pid] = len(self.products)
+            self.products.append(pid)
+        extra = len(self.products) - len(self.buffer)
+        if extra > 0:
+            self.buffer = np.vstack([self.buffer, np.zeros((extra, self.buffer.shape[1]), dtype=np.int64)])
+            for w in self.windows:
+                self.totals[w] = np.concatenate([self.totals[w], np.zeros(extra, dtype=np.int64)])
+
+    def _push(self, day, units):
+        # O(SKUs) update for one new day
+        depth = self.buffer.shape[1]
+        self.pos = (self.pos + 1) % depth
+        for w in self.windows:
+            leaving = self.buffer[:, (self.pos - w) % depth]
+            self.totals[w] += units - leaving
+        self.buffer[:, self.pos] = units
+        self.days.append(day)
+
+    # --- READS ---
+    def span(self, window):
+        # Days actually covered by a window (shorter while history is still young)
+        return max(1, min(window, len(self.days)))
+
+    def window_totals(self, product_ids, window=7):
+        # SKUs without any sales history (e.g. just added to the inventory) sold nothing
+        rows = np.array([self.codes.get(pid, -1) for pid in product_ids], dtype=np.int64)
+        known = rows >= 0
+        totals = np.zeros(len(rows), dtype=np.int64)
+        totals[known] = self.totals[window][rows[known]]
+        return totals
+
+    def velocity(self, product_ids, window=7):
+        # Average units per day over the window
+        return self.window_totals(product_ids, window) / self.span(window)
+
+    def days_of_cover(self, product_ids, stock, window=30):
+        # How many days current stock lasts at the window's average pace (inf if no sales)
+        pace = self.velocity(product_ids, window)
+        with np.errstate(divide="ignore"):
+            return np.where(pace > 0, np.asarray(stock, dtype=float) / pace, np.inf)
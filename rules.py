@@ -0,0 +1,65 @@
+from batch_prompts import format_decision
+
+# --- RULE PRE-DECIDER ---
+# The strategy prompt hard-codes some outcomes:
+#   cash CRITICAL/EMERGENCY -> LIQUIDATION or HOLD (never ad spend)
+#   OVERSTOCK               -> clear the stock
+# When these rules fully determine the answer we return a templated decision in the
+# model's output format instead of paying for a round-trip. Anything else returns None
+# and goes to the model. First matching rule wins.
+
+CRISIS_CASH = ("CRITICAL", "EMERGENCY")
+
+
+def _cash_critical(fin, inv, comp):
+    return fin['status'] in CRISIS_CASH
+
+
+def _nothing_to_sell(fin, inv, comp):
+    return "LOW STOCK" in inv['status'] or inv['stock'] <= 0
+
+
+def _overstock(fin, inv, comp):
+    return "OVERSTOCK" in inv['status']
+
+
+# (name, condition, decision, reasoning, action); templates see fin/inv/comp
+RULES = [
+    ("crisis_low_stock",
+     lambda fin, inv, comp: _cash_critical(fin, inv, comp) and _nothing_to_sell(fin, inv, comp),
+     "Hold",
+     "Cash is {fin[status]} and only {inv[stock]} units are left, so there is nothing to liquidate and no budget for ads.",
+     "Pause all spend on {inv[product]}; do not reorder until cash recovers."),
+    ("crisis_liquidate",
+     _cash_critical,
+     "Liquidation",
+     "Cash is {fin[status]}: no ad spend allowed. Converting {inv[stock]} units of stock to cash is the priority.",
+     "Run a clearance discount on {inv[product]} (stock {inv[stock]}, 7-day sales {inv[7d_sales]})."),
+    ("overstock_clear",
+     _overstock,
+     "Liquidation",
+     "{inv[stock]} units on hand against {inv[7d_sales]} sold in 7 days: dead inventory is tying up cash.",
+     "Bundle or discount {inv[product]} to clear stock."),
+]
+
+
+def evaluate(fin_status, inv_status, comp_status):
+    # (rule name, {decision, reasoning, action}) when the outcome is forced, else None
+    for name, condition, decision, reasoning, action in RULES:
+        if condition(fin_status, inv_status, comp_status):
+            context = {"fin": fin_status, "inv": inv_status, "comp": comp_status}
+            return name, {
+                "decision": decision,
+                "reasoning": reasoning.format(**context),
+                "action": action.format(**context),
+            }
+    return None
+
+
+def pre_decide(fin_status, inv_status, comp_status):
+    # (rule name, decision text in the model's markdown format), else None
+    ruled = evaluate(fin_status, inv_status, comp_status)
+    if ruled is None:
+        return None
+    name, fields = ruled
+    return name, format_decision(fields)
@@ -0,0 +1,282 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# --- COLUMNAR SALES HISTORY STORE ---
+# Long-format replacement for the wide sales_history.csv (one column per SKU).
+# Everything lives in one directory as raw int32/int64 binaries that are memory-mapped
+# on read, so slicing one product or a date range never parses the whole history.
+#
+#   meta.json          product ids (code = position in list) + sorted list of stored days
+#                      + mtime/size of the CSV it was built from (rebuilt when that changes)
+#   main_product.bin   int32 product code  }
+#   main_date.bin      int32 days since 1970-01-01   } clustered by product, then date
+#   main_units.bin     int32 units sold    }
+#   offsets.bin        int64 row range of each product code inside the main arrays
+#   tail_*.bin         same three columns, append-only (new days land here)
+#
+# compact() folds the tail back into the clustered main arrays.
+
+COLUMNS = {"product": np.int32, "date": np.int32, "units": np.int32}
+
+
+def to_days(dates):
+    # Anything pandas can parse -> int32 days since epoch
+    days = pd.to_datetime(pd.Index(dates)).to_numpy().astype("datetime64[D]")
+    return days.astype(np.int64).astype(np.int32)
+
+
+def from_days(days):
+    return pd.to_datetime(np.asarray(days, dtype=np.int64).astype("datetime64[D]"))
+
+
+def csv_signature(csv_path):
+    # [mtime_ns, size] of the source CSV (None if it is gone)
+    try:
+        st = os.stat(csv_path)
+    except (FileNotFoundError, TypeError):
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class SalesStore:
+    def __init__(self, path="sales_store"):
+        self.path = path
+        self.reload()
+
+    # --- BUILD / CONVERT ---
+    @classmethod
+    def create(cls, path, products, product_codes, days, units, source=None):
+        os.makedirs(path, exist_ok=True)
+        store = cls.__new__(cls)
+        store.path = path
+        store.source = source
+        store._write_main(len(products), product_codes, days, units)
+        for col in COLUMNS:
+            open(store._file(f"tail_{col}.bin"), "wb").close()
+        store._write_meta(list(products), np.unique(days))
+        store.reload()
+        return store
+
+    @classmethod
+    def from_csv(cls, csv_path="sales_history.csv", path="sales_store", chunksize=10000):
+        # One-shot converter from the wide CSV (date, P001_sales, P002_sales, ...).
+        # Read in row chunks so huge exports never need to fit in one DataFrame.
+        source = csv_signature(csv_path)
+        products, codes, days, units = None, [], [], []
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            sales_cols = [c for c in chunk.columns if c.endswith("_sales")]
+            if products is None:
+                products = [c[:-len("_sales")] for c in sales_cols]
+            values = chunk[sales_cols].fillna(0).to_numpy(dtype=np.int32)
+            n_days, n_products = values.shape
+
+            codes.append(np.tile(np.arange(n_products, dtype=np.int32), n_days))
+            days.append(np.repeat(to_days(chunk["date"]), n_products))
+            units.append(values.ravel())
+
+        return cls.create(path, products or [], np.concatenate(codes), np.concatenate(days), np.concatenate(units), source)
+
+    @classmethod
+    def open(cls, path="sales_store", csv_path="sales_history.csv"):
+        # Build the store from the legacy CSV the first time it is needed, and again whenever
+        # the CSV is rewritten (e.g. by expand_data.py): the CSV replaces appended days too
+        meta = os.path.join(path, "meta.json")
+        if not os.path.exists(meta):
+            return cls.from_csv(csv_path, path)
+        store = cls(path)
+        source = csv_signature(csv_path)
+        if source is not None:
+            if store.source is None:
+                # Store built before sources were recorded: rebuild if the CSV is newer
+                stale = source[0] > os.stat(meta).st_mtime_ns
+            else:
+                stale = source != store.source
+            if stale:
+                return cls.from_csv(csv_path, path)
+        return store
+
+    # --- FILE HELPERS ---
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self, name, dtype):
+        fname = self._file(name)
+        n = os.path.getsize(fname) // np.dtype(dtype).itemsize if os.path.exists(fname) else 0
+        if n == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(fname, dtype=dtype, mode="r", shape=(n,))
+
+    def _replace(self, name, data):
+        # Write to a temp file and swap it in, so readers never see a half-written file
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._file(name))
+
+    def _write_meta(self, products, days):
+        meta = {"products": products, "days": [int(d) for d in days], "source": self.source}
+        self._replace("meta.json", json.dumps(meta).encode())
+
+    def _write_main(self, n_products, product_codes, days, units):
+        # Cluster rows by product, then by date
+        order = np.lexsort((days, product_codes))
+        product_codes = np.asarray(product_codes, dtype=np.int32)[order]
+        self._replace("main_product.bin", product_codes.tobytes())
+        self._replace("main_date.bin", np.asarray(days, dtype=np.int32)[order].tobytes())
+        self._replace("main_units.bin", np.asarray(units, dtype=np.int32)[order].tobytes())
+
+        offsets = np.searchsorted(product_codes, np.arange(n_products + 1)).astype(np.int64)
+        self._replace("offsets.bin", offsets.tobytes())
+
+    def reload(self):
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        self.products = meta["products"]
+        self.codes = {pid: i for i, pid in enumerate(self.products)}
+        self.days = np.asarray(meta["days"], dtype=np.int32)
+        self.source = meta.get("source")
+
+        self.offsets = self._map("offsets.bin", np.int64)
+        self.main = {col: self._map(f"main_{col}.bin", dtype) for col, dtype in COLUMNS.items()}
+        tail = {col: self._map(f"tail_{col}.bin", dtype) for col, dtype in COLUMNS.items()}
+        # A crash mid-append can leave the tail columns uneven; only trust complete rows
+        n_tail = min(len(a) for a in tail.values())
+        self.tail = {col: a[:n_tail] for col, a in tail.items()}
+
+    # --- READS ---
+    def code(self, product_id):
+        return self.codes[product_id]
+
+    def _main_range(self, code):
+        # Products added after the last compact() have no main rows yet
+        if code + 1 < len(self.offsets):
+            return int(self.offsets[code]), int(self.offsets[code + 1])
+        return 0, 0
+
+    def series(self, product_id, start=None, end=None):
+        # Daily units for one SKU, oldest first, optionally limited to [start, end]
+        code = self.code(product_id)
+        lo, hi = self._main_range(code)
+        days = self.main["date"][lo:hi]
+        units = self.main["units"][lo:hi]
+
+        # Main rows are date-sorted within the product, so a range is two binary searches
+        if start is not None:
+            cut = np.searchsorted(days, to_days([start])[0], side="left")
+            days, units = days[cut:], units[cut:]
+        if end is not None:
+            cut = np.searchsorted(days, to_days([end])[0], side="right")
+            days, units = days[:cut], units[:cut]
+
+        mask = self.tail["product"] == code
+        if start is not None:
+            mask &= self.tail["date"] >= to_days([start])[0]
+        if end is not None:
+            mask &= self.tail["date"] <= to_days([end])[0]
+
+        days = np.concatenate([days, self.tail["date"][mask]])
+        units = np.concatenate([units, self.tail["units"][mask]])
+        order = np.argsort(days, kind="stable")
+        return pd.Series(units[order], index=from_days(days[order]).rename("date"), name=product_id)
+
+    def frame(self, product_ids=None, start=None, end=None):
+        # Long-format slice: one row per (date, product_id)
+        if product_ids is None:
+            product_ids = self.products
+        parts = []
+        for pid in product_ids:
+            s = self.series(pid, start, end)
+            parts.append(pd.DataFrame({"date": s.index, "product_id": pid, "units": s.to_numpy()}))
+        if not parts:
+            return pd.DataFrame(columns=["date", "product_id", "units"])
+        return pd.concat(parts, ignore_index=True)
+
+    def recent_matrix(self, product_ids, days=7):
+        # Dense (products x days) units for the most recent `days` stored dates, oldest first.
+        # Only the last `days` rows of each product's main range are touched.
+        codes = np.array([self.code(pid) for pid in product_ids], dtype=np.int64)
+        recent = self.days[-days:] if days > 0 else self.days[:0]
+        k = len(recent)
+        if k == 0 or len(codes) == 0:
+            return recent, np.zeros((len(codes), k), dtype=np.int64)
+
+        uniq, inverse = np.unique(codes, return_inverse=True)
+        matrix = np.zeros((len(uniq), k), dtype=np.int64)
+
+        starts = np.zeros(len(uniq), dtype=np.int64)
+        ends = np.zeros(len(uniq), dtype=np.int64)
+        in_main = uniq + 1 < len(self.offsets)
+        starts[in_main] = self.offsets[uniq[in_main]]
+        ends[in_main] = self.offsets[uniq[in_main] + 1]
+
+        # Gather the trailing rows of each product and place them by date
+        if len(self.main["date"]):
+            idx = ends[:, None] - np.arange(1, k + 1)[None, :]
+            valid = idx >= starts[:, None]
+            idx = np.where(valid, idx, 0)
+            row_days = self.main["date"][idx]
+            col = np.minimum(np.searchsorted(recent, row_days), k - 1)
+            r, c = np.nonzero(valid & (recent[col] == row_days))
+            matrix[r, col[r, c]] = self.main["units"][idx[r, c]]
+
+        # Plus anything appended since the last compaction
+        mask = np.isin(self.tail["date"], recent)
+        if mask.any():
+            row_of_code = np.full(max(len(self.products), int(self.tail["product"].max()) + 1), -1, dtype=np.int64)
+            row_of_code[uniq] = np.arange(len(uniq))
+            rows = row_of_code[self.tail["product"][mask]]
+            cols = np.searchsorted(recent, self.tail["date"][mask])
+            keep = rows >= 0
+            matrix[rows[keep], cols[keep]] = self.tail["units"][mask][keep]
+
+        return recent, matrix[inverse]
+
+    def window_totals(self, product_ids, days=7):
+        # Units sold over the most recent `days` stored dates, for many SKUs at once
+        _, matrix = self.recent_matrix(product_ids, days)
+        return matrix.sum(axis=1)
+
+    # --- WRITES ---
+    def append_day(self, date, units):
+        # Append one day of sales. `units` maps product_id -> units sold.
+        day = to_days([date])[0]
+        if (self.days == day).any():
+            raise ValueError(f"Sales for {date} are already in the store")
+
+        units = pd.Series(units)
+        products = list(self.products)
+        codes = []
+        for pid in units.index:
+            if pid not in self.codes:
+                products.append(pid)
+                self.codes[pid] = len(products) - 1
+            codes.append(self.codes[pid])
+
+        new_cols = {
+            "product": np.asarray(codes, dtype=np.int32),
+            "date": np.full(len(codes), day, dtype=np.int32),
+            "units": units.fillna(0).to_numpy(dtype=np.int32),
+        }
+        for col, arr in new_cols.items():
+            with open(self._file(f"tail_{col}.bin"), "ab") as f:
+                f.write(arr.tobytes())
+
+        self._write_meta(products, np.sort(np.append(self.days, day)))
+        self.reload()
+
+    def compact(self):
+        # Fold the tail into the clustered main arrays (run when no other writer is active)
+        product_codes = np.concatenate([self.main["product"], self.tail["product"]])
+        days = np.concatenate([self.main["date"], self.tail["date"]])
+        units = np.concatenate([self.main["units"], self.tail["units"]])
+        self._write_main(len(self.products), product_codes, days, units)
+        for col in COLUMNS:
+            open(self._file(f"tail_{col}.bin"), "wb").close()
+        self.reload()
+
+
+if __name__ == "__main__":
+    store = SalesStore.from_csv("sales_history.csv", "sales_store")
+    print(f"✅ Converted sales_history.csv -> sales_store/ ({len(store.products)} products, {len(store.days)} days).")
@@ -0,0 +1,187 @@
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+import metrics
+from data_context import DataContext
+from agents import InventoryAgent, CompetitorAgent
+from catalog import FILTERS
+
+# --- STATUS CHANGE FEED ---
+# Watches inventory, competitors and sales (DataContext's mtime/size polling), diffs each
+# changed source against the previous snapshot by product_id, and recomputes statuses only
+# for the SKUs whose rows changed:
+#   inventory    first row per product, hashed; changed / added / removed products
+#   competitors  all of a product's seller rows, hashed together
+#   sales        7-day totals from the rolling windows (the only sales input to a status)
+# Subscribers receive a StatusDelta listing the SKUs that entered or left each bucket
+# (the catalog filters: overstock, low_stock, losing).
+#
+#   feed = StatusFeed(data)
+#   feed.subscribe(lambda delta: print(delta.summary()))
+#   feed.start(interval=2.0)      # or call feed.poll() yourself, e.g. once per dashboard rerun
+
+BUCKETS = tuple(FILTERS)
+WATCHED = ("inventory", "competitors", "sales_store")
+
+
+class StatusDelta:
+    def __init__(self, version, changed, entered, left):
+        self.version = version
+        self.changed = changed  # source -> product_ids whose rows changed
+        self.entered = entered  # bucket -> product_ids now in it
+        self.left = left        # bucket -> product_ids no longer in it
+        self.at = datetime.datetime.now()
+
+    def __bool__(self):
+        return any(self.entered.values()) or any(self.left.values())
+
+    def summary(self):
+        parts = [f"{len(ids)} entered {FILTERS[b]}" for b, ids in self.entered.items() if ids]
+        parts += [f"{len(ids)} left {FILTERS[b]}" for b, ids in self.left.items() if ids]
+        return ", ".join(parts) or "No status changes"
+
+
+def product_hashes(frame, first_only=False):
+    # One uint64 per product_id: the hash of its first row, or the (order-insensitive) sum
+    # of every row's hash when all rows count (competitor sellers)
+    if first_only:
+        frame = frame.drop_duplicates('product_id')
+    rows = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    codes, products = pd.factorize(frame['product_id'])
+    sums = np.zeros(len(products), dtype=np.uint64)
+    np.add.at(sums, codes, rows)
+    return pd.Series(sums, index=pd.Index(products, name='product_id'))
+
+
+def diff_hashes(old, new):
+    # product_ids that were added, removed, or whose hash changed
+    positions = old.index.get_indexer(new.index)
+    old_values = old.to_numpy()[np.maximum(positions, 0)]
+    changed = new.index[(positions < 0) | (old_values != new.to_numpy())]
+    removed = old.index[new.index.get_indexer(old.index) < 0]
+    return changed.tolist() + removed.tolist()
+
+
+class StatusFeed:
+    def __init__(self, data=None, inventory=None, competitor=None):
+        self.data = data or DataContext()
+        self.inventory = inventory or InventoryAgent(self.data)
+        self.competitor = competitor or CompetitorAgent(self.data)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        with self._lock:
+            self._baseline()
+
+    def _baseline(self):
+        # Full pass once; every later poll only touches changed SKUs
+        self._snapshot = self.data.load(*WATCHED)
+        self._hashes = {
+            "inventory": product_hashes(self._snapshot["inventory"], first_only=True),
+            "competitors": product_hashes(self._snapshot["competitors"]),
+        }
+        self._sales_7d = self._rolling_7d()
+        health = self.inventory.analyze_all().drop_duplicates('product_id')
+        self.flags = self._flags(health)
+
+    def _rolling_7d(self):
+        rolling = self.inventory.rolling
+        return pd.Series(rolling.totals[7].copy(), index=pd.Index(rolling.products, name='product_id'))
+
+    def _flags(self, health):
+        # Bucket membership for these SKUs (health: analyze_many rows)
+        ids = health['product_id'].to_numpy()
+        status = health['status'].astype(str)
+        market = self.competitor.market
+        positions = market.index.get_indexer(ids)
+        bucket = np.where(positions >= 0, market['bucket'].to_numpy()[np.maximum(positions, 0)], "neutral")
+        return pd.DataFrame({
+            "overstock": status.str.contains("OVERSTOCK").to_numpy(),
+            "low_stock": status.str.contains("LOW STOCK").to_numpy(),
+            "losing": bucket == "losing",
+        }, index=pd.Index(ids, name='product_id'))
+
+    # --- SUBSCRIBERS ---
+    def subscribe(self, callback):
+        # callback(delta) after every poll that moved a SKU between buckets; returns an unsubscribe function
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def _publish(self, delta):
+        for callback in list(self._subscribers):
+            try:
+                callback(delta)
+            except Exception:
+                # A broken subscriber must not stop the feed for the others
+                metrics.incr("status_feed.subscriber_errors")
+
+    # --- POLLING ---
+    @metrics.timed("status_feed.poll")
+    def poll(self):
+        # Reload changed sources and publish the delta; returns it (None when nothing changed)
+        with self._lock:
+            snap = self.data.refresh()
+            prev = self._snapshot
+            if snap.version == prev.version:
+                return None
+
+            changed = {}
+            for name in ("inventory", "competitors"):
+                if snap[name] is not prev[name]:
+                    hashes = product_hashes(snap[name], first_only=(name == "inventory"))
+                    changed[name] = diff_hashes(self._hashes[name], hashes)
+                    self._hashes[name] = hashes
+            if snap["sales_store"] is not prev["sales_store"]:
+                sales_7d = self._rolling_7d()
+                changed["sales"] = diff_hashes(self._sales_7d, sales_7d)
+                self._sales_7d = sales_7d
+
+            # Bring the price index forward for just the changed SKUs, then re-flag them
+            self.competitor.sync(snap, changed.get("inventory", ()), changed.get("competitors", ()))
+            ids = list(dict.fromkeys(pid for ids in changed.values() for pid in ids))
+            delta = self._apply(snap, ids, changed)
+            self._snapshot = snap
+            metrics.incr("status_feed.skus_recomputed", len(ids))
+
+        if delta:
+            self._publish(delta)
+        return delta
+
+    def _apply(self, snap, ids, changed):
+        inv_ids = set(snap["inventory"]['product_id'][snap["inventory"]['product_id'].isin(ids)].tolist())
+        live = [pid for pid in ids if pid in inv_ids]
+        fresh = self._flags(self.inventory.analyze_many(live)) if live else self.flags.iloc[:0]
+
+        # Previous membership (removed or new SKUs count as in no bucket)
+        before = self.flags.reindex(ids, fill_value=False)
+        after = fresh.reindex(ids, fill_value=False)
+        entered = {b: after.index[after[b] & ~before[b]].tolist() for b in BUCKETS}
+        left = {b: before.index[before[b] & ~after[b]].tolist() for b in BUCKETS}
+
+        # Keep the flag table current
+        flags = self.flags.drop(ids, errors="ignore")
+        self.flags = pd.concat([flags, fresh]) if len(fresh) else flags
+        return StatusDelta(snap.version, changed, entered, left)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.poll()
+            except (OSError, ValueError, KeyError):
+                # Half-written file or transient read error: the next poll retries
+                metrics.incr("status_feed.poll_errors")
+
+    def start(self, interval=2.0):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="status-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
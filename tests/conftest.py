@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+# The modules live at the repository root (no package)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from expand_data import generate_data  # noqa: E402
+from data_context import DataContext  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # Small seeded dataset (inventory, 3 sellers per SKU, 40 days of sales, financials)
+    generate_data(num_products=40, num_days=40, competitors_per_sku=3, seed=7, out_dir=str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def data(data_dir):
+    return DataContext(data_dir)
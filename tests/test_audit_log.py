@@ -0,0 +1,110 @@
+import audit_store
+from agents import AuditAgent
+
+
+def fill(tmp_path, n=120, **kwargs):
+    # Small batches and segments, so the log rotates several times
+    audit = AuditAgent(str(tmp_path / "audit_log.csv"), batch_size=5, max_segment_bytes=2000, **kwargs)
+    for i in range(n):
+        audit.log_event("InventoryAgent" if i % 3 else "MarketingAgent", f"P{i % 10:03d}", "Test", f"reason {i}")
+        if i % 5 == 4:
+            audit.flush()
+    audit.flush()
+    return audit
+
+
+def test_log_rotates_into_indexed_segments(tmp_path):
+    audit = fill(tmp_path)
+    sealed = audit_store.sealed_segments(audit.log_file)
+    assert len(sealed) >= 3
+    for segment in sealed:
+        index = audit.log.load_index(segment)
+        assert index["rows"] == len(audit_store.read_segment(segment))
+    total = sum(len(audit_store.read_segment(s)) for s in audit.log.segments())
+    assert total == 120
+
+
+def test_tail_crosses_segments_newest_first(tmp_path):
+    audit = fill(tmp_path)
+    recent = audit.get_recent_logs(40)
+    assert len(recent) == 40
+    # Newest first; every event has a distinct reasoning hash
+    everything = [h for s in audit.log.segments() for h in audit_store.read_segment(s)["reasoning_hash"]]
+    assert recent["reasoning_hash"].tolist() == everything[::-1][:40]
+
+
+def test_query_filters_by_product_and_agent(tmp_path):
+    audit = fill(tmp_path)
+    rows = audit.query_logs(product_id="P003", agent_name="MarketingAgent")
+    expected = [i for i in range(120) if i % 10 == 3 and i % 3 == 0]
+    assert len(rows) == len(expected)
+    assert set(rows["product_id"]) == {"P003"}
+    assert set(rows["agent_name"]) == {"MarketingAgent"}
+    assert audit.query_logs(product_id="P999").empty
+
+
+def edit_line(path, line_no, old, new):
+    with open(path) as f:
+        lines = f.readlines()
+    lines[line_no] = lines[line_no].replace(old, new, 1)
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def test_intact_chain_verifies_and_resumes_from_checkpoint(tmp_path):
+    audit = fill(tmp_path)
+    result = audit.verify(workers=2)
+    assert result["ok"], result["errors"]
+    assert result["records_checked"] == 120
+    # Sealed segments proven once are skipped next time
+    again = audit.verify(workers=2)
+    assert again["ok"] and again["resumed_from"] is not None
+    assert again["records_checked"] < 120
+
+
+def test_edit_in_active_segment_is_detected(tmp_path):
+    audit = fill(tmp_path)
+    for i in range(3):
+        audit.log_event("MarketingAgent", "P001", "Test", f"active {i}")
+    audit.flush()
+    edit_line(audit.log_file, 1, "Test", "Edit")
+    result = audit.verify()
+    assert not result["ok"]
+    assert any("audit_log.csv: chain broken at line 2" in e for e in result["errors"])
+
+
+def test_edit_in_sealed_segment_is_detected(tmp_path):
+    audit = fill(tmp_path)
+    segment = audit_store.sealed_segments(audit.log_file)[1]
+    edit_line(segment, 2, "InventoryAgent", "MarketingAgent")
+    result = audit.verify(full=True)
+    assert not result["ok"]
+    assert any(e.startswith(segment.rsplit("/", 1)[-1]) for e in result["errors"])
+
+
+def test_dropped_row_is_detected(tmp_path):
+    audit = fill(tmp_path)
+    segment = audit_store.sealed_segments(audit.log_file)[0]
+    with open(segment) as f:
+        lines = f.readlines()
+    with open(segment, "w") as f:
+        f.writelines(lines[:3] + lines[4:])
+    assert not audit.verify(full=True)["ok"]
+
+
+def test_edited_checkpoint_is_detected(tmp_path):
+    audit = fill(tmp_path)
+    edit_line(audit_store.checkpoints_path(audit.log_file), 0, '"rows": ', '"rows": 1')
+    result = audit.verify()
+    assert not result["ok"]
+    assert any("not chained correctly" in e for e in result["errors"])
+
+
+def test_legacy_log_is_upgraded_to_a_chain(tmp_path):
+    path = tmp_path / "audit_log.csv"
+    path.write_text(",".join(audit_store.LEGACY_HEADER) + "\n"
+                    + "2024-01-01 00:00:00,MarketingAgent,P001,Test,abcd,LOGGED\n")
+    audit = AuditAgent(str(path))
+    audit.log_event("MarketingAgent", "P002", "Test", "new")
+    result = audit.verify()
+    assert result["ok"] and result["records_checked"] == 2
@@ -0,0 +1,53 @@
+import os
+import audit_store
+from agents import AuditAgent
+
+
+def sealed_log(tmp_path, n=60):
+    # A log rotated into several sealed segments (small batches and segments)
+    audit = AuditAgent(str(tmp_path / "audit_log.csv"), batch_size=5, max_segment_bytes=1500)
+    for i in range(n):
+        audit.log_event("MarketingAgent", f"P{i % 7:03d}", "Test", f"reason {i}")
+        if i % 5 == 4:
+            audit.flush()
+    audit.flush()
+    return audit
+
+
+def test_missing_sealed_segment_is_reported_not_raised(tmp_path):
+    audit = sealed_log(tmp_path)
+    segments = audit_store.sealed_segments(audit.log_file)
+    assert len(segments) >= 3
+    os.remove(segments[1])
+
+    result = audit.verify(full=True)
+    assert not result["ok"]
+    assert f"{os.path.basename(segments[1])}: segment missing" in result["errors"]
+
+
+def test_seal_that_crashed_before_the_rename_is_reported(tmp_path, monkeypatch):
+    # The checkpoint is written, then the process dies before os.replace
+    audit = sealed_log(tmp_path)
+    assert audit.verify()["ok"]
+    audit.log_event("MarketingAgent", "P001", "Test", "last")
+    audit.flush()
+
+    def crash(src, dst):
+        raise OSError("killed mid-seal")
+    monkeypatch.setattr(audit_store.os, "replace", crash)
+    try:
+        audit_store.seal(audit.log_file)
+    except OSError:
+        pass
+    monkeypatch.undo()
+
+    last = audit_store.load_checkpoints(audit.log_file)[-1]["segment"]
+    assert not os.path.exists(os.path.join(str(tmp_path), last))
+    result = audit.verify()
+    assert not result["ok"]
+    assert f"{last}: segment missing" in result["errors"]
+
+
+def test_verify_segment_on_a_missing_file():
+    result = audit_store.verify_segment("does-not-exist.csv", audit_store.GENESIS_HASH)
+    assert result["missing"] and not result["ok"]
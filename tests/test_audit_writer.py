@@ -0,0 +1,108 @@
+import threading
+import pytest
+import audit_store
+import audit_writer
+from audit_writer import AuditWriter, AuditWriteError, _STOP
+
+
+def row(i):
+    return [f"2024-01-01 00:00:{i % 60:02d}", "TestAgent", f"P{i:03d}", "Test", f"{i:016x}", "CHAINED"]
+
+
+def test_flush_writes_every_queued_row_in_batches(tmp_path):
+    writer = AuditWriter(str(tmp_path / "audit_log.csv"), batch_size=10, flush_interval=5)
+    for i in range(25):
+        writer.write(row(i))
+    assert writer.flush(5)
+    assert writer.rows_written == 25
+    assert writer.batches_written == 3  # 10 + 10 by size, 5 by the flush
+    df = audit_store.read_segment(writer.path)
+    assert df["product_id"].tolist() == [f"P{i:03d}" for i in range(25)]
+    writer.close()
+
+
+def test_rows_from_many_threads_never_interleave(tmp_path):
+    writer = AuditWriter(str(tmp_path / "audit_log.csv"), batch_size=7)
+    threads = [threading.Thread(target=lambda k=k: [writer.write(row(k * 100 + i)) for i in range(50)])
+               for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+    assert len(audit_store.read_segment(writer.path)) == 400
+    assert audit_store.AuditLog(writer.path).verify()["ok"]
+
+
+def test_writer_survives_a_failing_seal(tmp_path, monkeypatch):
+    def broken_seal(path):
+        raise KeyError("corrupt segment")
+    monkeypatch.setattr(audit_store, "seal", broken_seal)
+    writer = AuditWriter(str(tmp_path / "audit_log.csv"), max_segment_bytes=10)
+    writer.write(row(1))
+    assert writer.flush(5)
+    assert isinstance(writer.last_error, KeyError)
+    # Still alive: the next batch is written and flush() returns
+    writer.write(row(2))
+    assert writer.flush(5)
+    assert writer._thread.is_alive()
+    assert len(audit_store.read_segment(writer.path)) == 2
+    writer.close()
+
+
+def test_flush_does_not_block_once_the_thread_is_gone(tmp_path):
+    writer = AuditWriter(str(tmp_path / "audit_log.csv"))
+    writer._queue.put(_STOP)  # thread exits without the writer being closed
+    writer._thread.join(5)
+    assert not writer.flush(1)
+
+
+def test_for_file_shares_one_writer_and_rejects_conflicting_settings(tmp_path):
+    path = str(tmp_path / "audit_log.csv")
+    writer = AuditWriter.for_file(path, durability="flush", batch_size=64)
+    assert AuditWriter.for_file(path, durability="flush") is writer
+    assert AuditWriter.for_file(path) is writer
+    with pytest.raises(ValueError, match="durability"):
+        AuditWriter.for_file(path, durability="fsync")
+    writer.close()
+    # A closed writer is replaced, with the new settings
+    assert AuditWriter.for_file(path, durability="fsync").durability == "fsync"
+
+
+def test_rows_of_a_failed_write_are_held_and_retried_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_writer, "RETRY_INTERVAL", 0.05)
+    real_last_hash = audit_store.last_hash
+    failures = [OSError("disk full")]
+
+    def flaky_last_hash(path):
+        if failures:
+            raise failures.pop()
+        return real_last_hash(path)
+    monkeypatch.setattr(audit_store, "last_hash", flaky_last_hash)
+    writer = AuditWriter(str(tmp_path / "audit_log.csv"), flush_interval=5)
+    writer.write(row(1))
+    # Nothing reached the file: flush() reports it instead of pretending
+    assert not writer.flush(5)
+    assert writer.unwritten == 1
+    assert isinstance(writer.last_error, OSError)
+    writer.write(row(2))
+    assert writer.flush(5)
+    assert writer.unwritten == 0
+    df = audit_store.read_segment(writer.path)
+    assert df["product_id"].tolist() == ["P001", "P002"]
+    assert audit_store.AuditLog(writer.path).verify()["ok"]
+    writer.close()
+
+
+def test_write_refuses_rows_once_too_many_are_held(tmp_path, monkeypatch):
+    def broken_last_hash(path):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(audit_store, "last_hash", broken_last_hash)
+    writer = AuditWriter(str(tmp_path / "audit_log.csv"), max_held=2)
+    writer.write(row(1))
+    writer.write(row(2))
+    assert not writer.flush(5)
+    with pytest.raises(AuditWriteError):
+        writer.write(row(3))
+    writer._queue.put(_STOP)
+    writer._thread.join(5)
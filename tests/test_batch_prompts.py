@@ -0,0 +1,94 @@
+import json
+from agents import AuditAgent
+from batch_prompts import build_batch_prompt, parse_batch_response, parse_batch_rows, ROW_FIELDS
+from decision_cache import DecisionCache
+from marketing_agent import MarketingAgent
+from model_backends import LocalBackend
+
+
+class PickyBackend(LocalBackend):
+    # Local model that leaves out some products: `batched_only` when asked together with
+    # others, `never` always. Garbles multi-product answers with `garble`. Records batch sizes.
+    def __init__(self, batched_only=(), never=(), garble=False):
+        super().__init__()
+        self.batched_only, self.never, self.garble = set(batched_only), set(never), garble
+        self.sizes = []
+
+    def _decide_batch(self, prompt):
+        rows = parse_batch_rows(prompt)
+        self.sizes.append(len(rows))
+        if self.garble and len(rows) > 1:
+            return "Sorry, here are my thoughts: [not json"
+        skip = self.never | (self.batched_only if len(rows) > 1 else set())
+        return json.dumps([item for item in json.loads(super()._decide_batch(prompt))
+                           if item["product_id"] not in skip])
+
+
+def make_agent(data, tmp_path, backend):
+    return MarketingAgent(data=data, backend=backend, use_rules=False,
+                          cache=DecisionCache(str(tmp_path / "cache")),
+                          audit=AuditAgent(str(tmp_path / "audit_log.csv")))
+
+
+def product_ids(data, n):
+    return data.get("inventory")["product_id"].head(n).tolist()
+
+
+def decision(pid, **fields):
+    return dict({"product_id": pid, "decision": "Hold", "reasoning": "r", "action": "a"}, **fields)
+
+
+def test_prompt_rows_round_trip():
+    row = dict(zip(ROW_FIELDS, ["P001", "Pro | Mouse\n100", "NORMAL", 5, 12, 30, "$25", "$20", "Matched"]))
+    rows = parse_batch_rows(build_batch_prompt({"message": "Cash is fine"}, [row]))
+    assert rows == [dict(zip(ROW_FIELDS, ["P001", "Pro / Mouse 100", "NORMAL", "5", "12", "30", "$25", "$20", "Matched"]))]
+
+
+def test_parse_keeps_valid_answers_and_reports_the_rest():
+    text = "```json\n" + json.dumps([
+        decision("P001", decision="price match"),   # normalized
+        decision("P001", decision="Liquidation"),   # duplicate: first wins
+        decision("P002", decision="Buy ads"),       # unknown decision
+        decision("P003", action=" "),               # empty field
+        decision("P999"),                           # not asked for
+        "P004",
+    ]) + "\n```"
+    decided, errors = parse_batch_response(text, ["P001", "P002", "P003", "P004"])
+    assert decided == {"P001": decision("P001", decision="Price Match")}
+    assert set(errors) == {"P002", "P003", "P004"}
+
+    decided, errors = parse_batch_response("I can't help with that", ["P001", "P002"])
+    assert decided == {} and set(errors) == {"P001", "P002"}
+
+
+def test_missing_product_is_retried_alone(data, tmp_path):
+    ids = product_ids(data, 6)
+    agent = make_agent(data, tmp_path, PickyBackend(batched_only=[ids[2]]))
+    results = agent.decide_batch(ids, batch_size=6, concurrency=1)
+    assert [r["product_id"] for r in results] == ids
+    assert all(r["source"] == "model" and r["error"] is None for r in results)
+    assert agent.backend.sizes == [6, 1]
+
+
+def test_unparseable_batches_are_split_down_to_single_products(data, tmp_path):
+    ids = product_ids(data, 4)
+    agent = make_agent(data, tmp_path, PickyBackend(garble=True))
+    results = agent.decide_batch(ids, batch_size=4, concurrency=1, retries=0)
+    assert all(r["source"] == "model" for r in results)
+    assert agent.backend.sizes == [4, 2, 1, 1, 2, 1, 1]
+
+
+def test_unanswered_product_is_reported_and_not_cached(data, tmp_path):
+    ids = product_ids(data, 5)
+    agent = make_agent(data, tmp_path, PickyBackend(never=[ids[0]]))
+    results = agent.decide_batch(ids + [ids[1]], batch_size=5, concurrency=1)
+    assert results[0]["source"] == "error"
+    assert results[0]["error"] == "No valid decision returned"
+    assert results[-1] == results[1]  # duplicates answered once, in input order
+    assert agent.cache.stats()["writes"] == 4
+
+    # Second run: the answered products come from the cache, only the failure is re-asked
+    agent.backend.sizes.clear()
+    again = agent.decide_batch(ids, batch_size=5, concurrency=1)
+    assert [r["source"] for r in again] == ["error"] + ["cache"] * 4
+    assert agent.backend.sizes == [1]
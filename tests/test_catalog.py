@@ -0,0 +1,62 @@
+import pandas as pd
+from agents import InventoryAgent, CompetitorAgent
+from catalog import CatalogIndex, tokenize
+from status_feed import StatusDelta
+
+
+def inventory(names):
+    return pd.DataFrame({
+        "product_id": [f"P{i:03d}" for i in range(1, len(names) + 1)],
+        "product_name": names,
+        "current_stock": range(len(names)),
+    })
+
+
+def brute_force(frame, query):
+    # Every query word is a prefix of some token of "id name"
+    words = tokenize(query)
+    return [pid for pid, name in zip(frame["product_id"], frame["product_name"])
+            if all(any(t.startswith(w) for t in tokenize(f"{pid} {name}")) for w in words)]
+
+
+def test_search_matches_a_linear_scan(data):
+    frame = data.get("inventory")
+    index = CatalogIndex(frame)
+    for query in ["", "pro", "Pro Lap", "p00", "gaming mouse", "mech key", "zzz", "HD-1"]:
+        total, ids = index.search(query, limit=len(frame))
+        expected = brute_force(frame, query)
+        assert ids == expected, query
+        assert total == len(expected)
+
+
+def test_pages_cover_every_match_once():
+    index = CatalogIndex(inventory([f"Smart Phone {i}" for i in range(23)]))
+    pages = [index.search("smart", limit=10, offset=o) for o in (0, 10, 20, 30)]
+    assert [total for total, _ in pages] == [23] * 4
+    assert [len(ids) for _, ids in pages] == [10, 10, 3, 0]
+    assert sum((ids for _, ids in pages), []) == list(index.ids)
+
+
+def test_duplicate_names_keep_distinct_ids():
+    index = CatalogIndex(inventory(["Pro Mouse", "Pro Mouse", "Slim Keyboard"]))
+    assert index.search("pro mouse") == (2, ["P001", "P002"])
+    assert index.label("P002") == "Pro Mouse (P002)"
+    assert index.get("P003")["product_name"] == "Slim Keyboard"
+    assert "P004" not in index
+
+
+def test_status_filters_and_feed_deltas(data):
+    inv, comp = InventoryAgent(data), CompetitorAgent(data)
+    health, market = inv.analyze_all(), comp.compare_all()
+    index = CatalogIndex(data.get("inventory"), health=health, market=market)
+
+    low = health.loc[health["status"].str.contains("LOW STOCK"), "product_id"].drop_duplicates().tolist()
+    losing = market.loc[market["bucket"] == "losing", "product_id"].tolist()
+    assert index.search(status="low_stock", limit=1000)[1] == [pid for pid in index.ids if pid in low]
+    assert sorted(index.search(status="losing", limit=1000)[1]) == sorted(losing)
+
+    moved = low[0]
+    delta = StatusDelta(1, {}, {"overstock": [moved]}, {"low_stock": [moved]})
+    index.apply(delta).apply(delta)
+    assert moved not in index.search(status="low_stock", limit=1000)[1]
+    assert moved in index.search(status="overstock", limit=1000)[1]
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from chart_data import auto_resolution, chart_series, date_range, lttb, resample
+from sales_store import SalesStore, to_days
+
+
+def reference_lttb(x, y, threshold):
+    # Straight transcription of Steinarsson's algorithm, one point at a time
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    keep, a = [0], 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        nstart, nend = end, min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = np.mean(x[nstart:nend]), np.mean(y[nstart:nend])
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    return np.array(keep + [n - 1])
+
+
+def test_lttb_matches_reference_implementation():
+    rng = np.random.default_rng(3)
+    for n, threshold in [(1000, 100), (365, 52), (97, 10)]:
+        x = np.arange(n, dtype=float)
+        y = rng.poisson(8, n).astype(float)
+        np.testing.assert_array_equal(lttb(x, y, threshold), reference_lttb(x, y, threshold))
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    y = np.zeros(500)
+    y[123] = 100
+    keep = lttb(np.arange(500), y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 499
+    assert 123 in keep
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_passes_small_series_through():
+    assert lttb(np.arange(5), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(np.arange(5), np.ones(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def make_store(path, n_days):
+    dates = pd.date_range("2020-01-01", periods=n_days, freq="D")
+    units = np.arange(n_days) % 13
+    return SalesStore.create(str(path), ["P001"], np.zeros(n_days, dtype=np.int32), to_days(dates), units)
+
+
+def test_resampling_keeps_totals(tmp_path):
+    store = make_store(tmp_path / "store", 400)
+    daily = store.series("P001")
+    for resolution in ("weekly", "monthly"):
+        assert resample(daily, resolution).sum() == daily.sum()
+
+
+def test_chart_series_stays_within_the_point_budget(tmp_path):
+    store = make_store(tmp_path / "store", 2000)
+    frame = chart_series(store, "P001", resolution="daily", max_points=300)
+    assert len(frame) == 300
+    assert frame["Date"].iloc[0] == pd.Timestamp("2020-01-01")
+    assert frame["Date"].iloc[-1] == pd.Timestamp("2020-01-01") + pd.Timedelta(days=1999)
+    assert frame["Product"].eq("P001").all()
+
+
+def test_ranges_and_auto_resolution(tmp_path):
+    store = make_store(tmp_path / "store", 400)
+    start, end = date_range(store, "30d")
+    assert (end - start).days == 29
+    assert len(chart_series(store, "P001", start, end)) == 30
+    assert date_range(store, "all")[0] is None
+    assert auto_resolution(90) == "daily"
+    assert auto_resolution(365 * 3) == "weekly"
+    assert auto_resolution(365 * 10) == "monthly"
@@ -0,0 +1,165 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from agents import CompetitorAgent
+from competitor_prices import CompetitorPrices, latest, normalize, parse_flags
+
+
+def observations(n_products=30, sellers=4, seed=0):
+    rng = np.random.default_rng(seed)
+    n = n_products * sellers
+    return pd.DataFrame({
+        "product_id": np.repeat([f"P{i:03d}" for i in range(n_products)], sellers),
+        "competitor": np.tile([f"s{k}" for k in range(sellers)], n_products),
+        "competitor_price": rng.integers(50, 150, n).astype(float),
+        "competitor_promo": rng.random(n) < 0.4,
+        "observed_at": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 1000, n), unit="min"),
+    })
+
+
+def reference(obs):
+    # Plain groupby over each seller's newest observation
+    current = latest(normalize(obs))
+    rows = {}
+    for pid, group in current.groupby("product_id"):
+        prices = group["competitor_price"]
+        regular = prices[~group["competitor_promo"]]
+        rows[pid] = {
+            "competitors": len(group),
+            "competitor_min": prices.min(),
+            "competitor_median": prices.median(),
+            "competitor_p25": prices.quantile(0.25),
+            "promo_count": int(group["competitor_promo"].sum()),
+            "competitor_price": regular.median() if len(regular) else prices.median(),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def assert_matches_reference(prices, obs):
+    expected = reference(obs)
+    actual = prices.stats.loc[expected.index, expected.columns]
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_names=False)
+    assert len(prices.stats) == len(expected)
+
+
+def test_aggregate_matches_groupby():
+    obs = observations()
+    assert_matches_reference(CompetitorPrices(obs), obs)
+
+
+def test_update_only_applies_newer_observations():
+    obs = observations()
+    prices = CompetitorPrices(obs, compact_rows=25)
+    new = pd.DataFrame({
+        "product_id": ["P001", "P002", "P002", "P100"],
+        "competitor": ["s0", "s1", "s9", "s0"],
+        "competitor_price": [1.0, 2.0, 3.0, 4.0],
+        "competitor_promo": [False, True, False, False],
+        "observed_at": pd.to_datetime(["2030-01-01", "2000-01-01", "2030-01-01", "2030-01-01"]),
+    })
+    touched = prices.update(new)
+    assert sorted(touched) == ["P001", "P002", "P100"]
+    everything = pd.concat([obs, new], ignore_index=True)
+    assert_matches_reference(prices, everything)
+    # The old P002/s1 observation lost to the newer one already stored
+    assert prices.stats.at["P001", "competitor_min"] == 1.0
+
+    # Many more updates force compactions along the way
+    for seed in range(1, 6):
+        batch = observations(n_products=10, sellers=2, seed=seed)
+        batch["observed_at"] += pd.Timedelta(days=365 * 10)
+        prices.update(batch)
+        everything = pd.concat([everything, batch], ignore_index=True)
+        assert_matches_reference(prices, everything)
+
+
+def test_replace_drops_sellers_and_products():
+    obs = observations()
+    prices = CompetitorPrices(obs)
+    # P003 now only has one seller; P004 lost every price
+    replacement = obs[(obs["product_id"] == "P003") & (obs["competitor"] == "s2")]
+    prices.replace(["P003", "P004"], replacement)
+    expected = obs[~obs["product_id"].isin(["P003", "P004"])]
+    assert_matches_reference(prices, pd.concat([expected, replacement]))
+    assert "P004" not in prices.stats.index
+    assert prices.stats.at["P003", "competitors"] == 1
+    prices.compact()
+    assert_matches_reference(prices, pd.concat([expected, replacement]))
+
+
+def test_promo_flags_are_parsed_not_cast():
+    flags = parse_flags(pd.Series(["False", "true", "0", "1", "", None, "Yes"]))
+    assert flags.tolist() == [False, True, False, True, False, False, True]
+    assert parse_flags(pd.Series([1.0, 0.0, np.nan])).tolist() == [True, False, False]
+
+    obs = pd.DataFrame({"product_id": "P1", "competitor": ["a", "b", "c"],
+                        "competitor_price": [10.0, 12.0, 14.0], "competitor_promo": [np.nan, "False", "TRUE"]})
+    stats = CompetitorPrices(obs).stats.loc["P1"]
+    assert stats["promo_count"] == 1
+    assert stats["competitor_price"] == 11.0  # median of the two regular sellers
+
+
+def test_compare_price_after_record_prices(data):
+    agent = CompetitorAgent(data)
+    pid = agent.market.index[0]
+    before = agent.compare_price(pid)
+    agent.record_prices(pd.DataFrame({"product_id": [pid], "competitor": ["newcomer"],
+                                      "competitor_price": [1.0]}))
+    after = agent.compare_price(pid)
+    assert after["competitors"] == before["competitors"] + 1
+    assert after["competitor_min"] == 1.0
+    assert after["my_price"] == before["my_price"]
+    assert after == {col: agent.market.at[pid, col] for col in after}
+
+
+def test_compare_price_is_consistent_during_rebuilds(data):
+    # Readers racing record_prices/build_index must never see another SKU's row
+    agent = CompetitorAgent(data)
+    mine = data.get("inventory").drop_duplicates("product_id").set_index("product_id")["selling_price"]
+    ids = agent.market.index.tolist()
+    wrong, stop = [], threading.Event()
+
+    def read():
+        while not stop.is_set():
+            wrong.extend(pid for pid in ids if agent.compare_price(pid)["my_price"] != mine[pid])
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for t in readers:
+        t.start()
+    for k in range(10):
+        agent.record_prices(pd.DataFrame({"product_id": ids[:5], "competitor": "z", "competitor_price": 1.0 + k}))
+        if k % 5 == 0:
+            agent.build_index()
+    stop.set()
+    for t in readers:
+        t.join()
+    assert wrong == []
+
+
+def _rewrite(path, edit):
+    df = pd.read_csv(path)
+    edit(df)
+    df.to_csv(path, index=False)
+    # Make sure the signature moves even on coarse mtime clocks
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_index_is_only_rebuilt_for_inventory_or_competitor_changes(data):
+    agent = CompetitorAgent(data)
+    data.load("sales", "financials")
+    market = agent.market
+    version = data.version
+
+    _rewrite(os.path.join(data.data_dir, "financials.csv"), lambda df: df.__setitem__("value", df["value"] + 1))
+    data.refresh()
+    assert data.version > version
+    assert agent.market is market
+
+    pid = market.index[0]
+    _rewrite(os.path.join(data.data_dir, "inventory.csv"),
+             lambda df: df.__setitem__("selling_price", df["selling_price"].where(df["product_id"] != pid, 9999.0)))
+    data.refresh()
+    assert agent.market is not market
+    assert agent.compare_price(pid)["my_price"] == 9999.0
@@ -0,0 +1,131 @@
+import threading
+import pandas as pd
+import pytest
+from agents import CompetitorAgent, FinanceAgent, InventoryAgent
+from data_context import DataContext
+from data_store import DataStore
+
+
+@pytest.fixture
+def store(data_dir):
+    # Built from the generated CSVs on first open
+    return DataStore.open(f"{data_dir}/msme.db", csv_dir=data_dir)
+
+
+def test_import_round_trips_the_csvs(data_dir, store):
+    for table in ("inventory", "financials"):
+        expected = pd.read_csv(f"{data_dir}/{table}.csv")
+        pd.testing.assert_frame_equal(store.frame(table), expected, check_dtype=False)
+    competitors = store.frame("competitors")
+    assert len(competitors) == len(pd.read_csv(f"{data_dir}/competitors.csv"))
+    assert competitors["competitor_promo"].dtype == bool
+
+
+def test_agents_read_the_store_and_see_each_write(data_dir, store):
+    data = DataContext(data_dir, store=store)
+    inventory, finance = InventoryAgent(data), FinanceAgent(data)
+    pid = data.get("inventory")["product_id"].iloc[0]
+    version = data.version
+
+    store.set_stock({pid: 0})
+    store.set_metrics({"cash_balance": 123})
+    data.refresh()
+    assert data.version > version
+    assert inventory.analyze_product(pid)["stock"] == 0
+    assert inventory.analyze_product(pid)["status"] == "LOW STOCK (Scarcity)"
+    assert finance.values["cash_balance"] == 123
+
+    store.adjust_stock({pid: 5})
+    data.refresh()
+    assert inventory.analyze_product(pid)["stock"] == 5
+
+
+def test_new_sku_without_sales_history(data_dir, store):
+    # Added through the store only: no sales yet, so it counts as zero sales everywhere
+    store.upsert("inventory", [{"product_id": "NEW1", "product_name": "Brand New Widget", "cost_price": 10,
+                                "selling_price": 20, "current_stock": 500, "min_stock_threshold": 5,
+                                "vendor_email": "new@example.com"}])
+    data = DataContext(data_dir, store=store)
+    inventory = InventoryAgent(data)
+    table = inventory.analyze_all().set_index("product_id")
+    assert table.at["NEW1", "7d_sales"] == 0
+    assert table.at["NEW1", "status"] == "OVERSTOCK (Dead Inventory)"
+    assert inventory.analyze_product("NEW1")["7d_sales"] == 0
+    assert inventory.sales_velocity("NEW1")["7d"] == 0
+
+
+def test_competitor_upserts_keep_the_newest_observation(data_dir, store):
+    data = DataContext(data_dir, store=store)
+    competitor = CompetitorAgent(data)
+    pid = competitor.market.index[0]
+    seller = store.frame("competitors").query("product_id == @pid")["competitor"].iloc[0]
+
+    store.record_prices([{"product_id": pid, "competitor": seller, "competitor_price": 1.0,
+                          "observed_at": "2100-01-01 00:00:00"}])
+    store.record_prices([{"product_id": pid, "competitor": seller, "competitor_price": 999.0,
+                          "observed_at": "2000-01-01 00:00:00"}])  # older: ignored
+    data.refresh()
+    assert competitor.compare_price(pid)["competitor_min"] == 1.0
+
+
+def test_upsert_requires_the_key(store):
+    with pytest.raises(ValueError, match="product_id"):
+        store.upsert("inventory", [{"current_stock": 3}])
+
+
+def test_reads_during_writes_see_whole_batches(data_dir, store):
+    ids = store.frame("inventory")["product_id"].tolist()
+    done = threading.Event()
+    seen = []
+
+    def write():
+        for level in range(1, 30):
+            store.set_stock({pid: level for pid in ids})
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not done.is_set():
+        seen.append(store.frame("inventory")["current_stock"].nunique())
+    writer.join()
+    # One transaction per batch: a reader never sees half of one
+    assert set(seen) <= {1, len(set(pd.read_csv(f"{data_dir}/inventory.csv")["current_stock"]))}
+
+
+def test_export_writes_the_csvs(tmp_path, store):
+    store.set_metrics({"cash_balance": 42})
+    store.export_csv(str(tmp_path))
+    financials = pd.read_csv(tmp_path / "financials.csv").set_index("metric")["value"]
+    assert financials["cash_balance"] == 42
+
+
+def test_concurrent_stock_movements_are_not_lost(data_dir, store):
+    pid = store.frame("inventory")["product_id"].iloc[0]
+    store.set_stock({pid: 0})
+    # Separate stores = separate connections, as from several processes
+    stores = [DataStore(store.path) for _ in range(4)]
+    threads = [threading.Thread(target=lambda s=s: [s.adjust_stock({pid: 1}) for _ in range(25)]) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    inventory = store.frame("inventory").set_index("product_id")
+    assert inventory.at[pid, "current_stock"] == 100
+
+
+def test_writes_bump_only_their_table_version(store):
+    before = {table: store.version(table) for table in ("inventory", "competitors", "financials")}
+    pid = store.frame("inventory")["product_id"].iloc[0]
+    assert store.set_prices({pid: 19.5, "UNKNOWN": 1}) == 1
+    after = {table: store.version(table) for table in before}
+    assert after == dict(before, inventory=before["inventory"] + 1)
+    assert store.frame("inventory").set_index("product_id").at[pid, "selling_price"] == 19.5
+
+
+def test_metric_lookups_and_reopen_keep_the_data(data_dir, store):
+    store.set_metrics({"cash_balance": 9500, "new_metric": 7})
+    assert store.metric_values("cash_balance", "new_metric", "missing") == {"cash_balance": 9500, "new_metric": 7}
+    store.close()
+    # An existing database is not re-imported from the CSVs
+    reopened = DataStore.open(store.path, csv_dir=data_dir)
+    assert reopened.metric_values("cash_balance") == {"cash_balance": 9500}
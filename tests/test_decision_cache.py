@@ -0,0 +1,67 @@
+import os
+import time
+import decision_cache
+from decision_cache import DecisionCache
+
+FIN = {"status": "HEALTHY", "message": "Cash is fine"}
+INV = {"product": "Pro Mouse 100", "stock": 50, "7d_sales": 12, "status": "NORMAL"}
+COMP = {"my_price": 30, "competitor_price": 25.0, "position": "Overpriced"}
+
+
+def key(pid="P001", **changes):
+    return DecisionCache.fingerprint(FIN, dict(INV, **changes), COMP, pid, False, "local")
+
+
+def test_fingerprint_covers_every_prompt_input():
+    assert key() == key()
+    assert len({key(), key(stock=51), key("P002"), key(status="LOW STOCK (Scarcity)"),
+                DecisionCache.fingerprint(FIN, INV, COMP, "P001", True, "local"),
+                DecisionCache.fingerprint(FIN, INV, COMP, "P001", False, "gemini")}) == 6
+
+
+def test_memory_lru_falls_back_to_disk(tmp_path):
+    cache = DecisionCache(str(tmp_path), max_memory_entries=2)
+    for k in "abc":
+        cache.put(k, f"text {k}")
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("c") == "text c"  # memory
+    assert cache.get("a") == "text a"  # evicted from memory, read back from disk
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 3)
+    # Another process (here: another instance) shares the disk tier
+    assert DecisionCache(str(tmp_path)).get("b") == "text b"
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path, monkeypatch):
+    cache = DecisionCache(str(tmp_path), ttl_seconds=60)
+    cache.put("a", "text a")
+    later = time.time() + 61
+    monkeypatch.setattr(decision_cache.time, "time", lambda: later)
+    assert cache.get("a") is None
+    assert DecisionCache(str(tmp_path), ttl_seconds=60).get("a") is None
+    assert not os.path.exists(tmp_path / "a.json")
+
+
+def test_disk_budget_evicts_least_recently_used(tmp_path):
+    cache = DecisionCache(str(tmp_path), max_memory_entries=1, sweep_interval=3600)
+    text = "x" * 1000
+    for i, k in enumerate("abcd"):
+        cache.put(k, text)
+        os.utime(tmp_path / f"{k}.json", (1000 + i, 1000 + i))
+    cache.get("a")  # read from disk: now the most recently used file
+    size = os.path.getsize(tmp_path / "a.json")
+    cache.max_disk_bytes = 3 * size
+    cache.put("e", text)
+    left = sorted(name[0] for name in os.listdir(tmp_path) if name.endswith(".json"))
+    assert left == ["a", "d", "e"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = DecisionCache(str(tmp_path))
+    cache.put("a", "text a")
+    cache.clear()
+    assert cache.get("a") is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".json")]
@@ -0,0 +1,23 @@
+import os
+import pandas as pd
+from expand_data import generate_data, DEFAULT_END_DATE
+
+FILES = ("inventory.csv", "competitors.csv", "sales_history.csv", "financials.csv")
+
+
+def read_all(path):
+    return {name: open(os.path.join(path, name), "rb").read() for name in FILES}
+
+
+def test_same_seed_gives_identical_files(tmp_path):
+    for run in ("a", "b"):
+        generate_data(num_products=20, num_days=15, competitors_per_sku=2, seed=3, out_dir=str(tmp_path / run))
+    assert read_all(tmp_path / "a") == read_all(tmp_path / "b")
+
+
+def test_dates_end_on_the_fixed_default(tmp_path):
+    generate_data(num_products=5, num_days=10, competitors_per_sku=2, seed=3, out_dir=str(tmp_path))
+    sales = pd.read_csv(tmp_path / "sales_history.csv")
+    assert sales["date"].max() == DEFAULT_END_DATE
+    observed = pd.to_datetime(pd.read_csv(tmp_path / "competitors.csv")["observed_at"])
+    assert observed.max() <= pd.Timestamp(DEFAULT_END_DATE)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from forecasting import DemandForecaster, forecast_catalog
+
+
+def reference_fit(series, alpha, gamma, m=7):
+    # Textbook additive Holt-Winters (no trend), one SKU, plain floats
+    level = sum(series[:m]) / m
+    seasonal = [y - level for y in series[:m]]
+    sse = 0.0
+    for t in range(m, len(series)):
+        err = series[t] - level - seasonal[t % m]
+        sse += err * err
+        new_level = alpha * (series[t] - seasonal[t % m]) + (1 - alpha) * level
+        seasonal[t % m] = gamma * (series[t] - new_level) + (1 - gamma) * seasonal[t % m]
+        level = new_level
+    return level, seasonal, (sse / max(len(series) - m, 1)) ** 0.5
+
+
+def test_vectorized_fit_matches_the_scalar_recurrence():
+    history = np.random.default_rng(0).poisson(5, (6, 45))
+    level, seasonal, sigma, t_total = DemandForecaster(alpha=0.3, gamma=0.1).fit(history)
+    assert t_total == 45
+    for k, series in enumerate(history.astype(float).tolist()):
+        ref_level, ref_seasonal, ref_sigma = reference_fit(series, 0.3, 0.1)
+        assert np.isclose(level[k], ref_level)
+        assert np.allclose(seasonal[:, k], ref_seasonal)
+        assert np.isclose(sigma[k], ref_sigma)
+
+
+def test_weekly_pattern_is_forecast_in_phase():
+    week = np.array([1, 2, 3, 4, 5, 20, 30], dtype=float)
+    history = np.tile(week, 6)[None, :]
+    forecaster = DemandForecaster(horizon=7)
+    path = forecaster.forecast(*forecaster.fit(history)[:2], t_total=history.shape[1])
+    assert np.allclose(path[0], week)
+
+
+def test_constant_demand_reorder_plan():
+    history = np.full((2, 28), 4.0)
+    plan = DemandForecaster(horizon=14, lead_time=7).plan(history, stock=[10, 500], min_stock=[40, 0])
+    assert np.allclose(plan["forecast_daily"], 4)
+    assert np.allclose(plan["safety_stock"], 0)
+    # Lead-time demand 28 is below the min_stock floor of the first SKU
+    assert plan["reorder_point"].tolist() == [40, 28]
+    # Order up to 21 days of demand; plenty of stock means no order
+    assert plan["reorder_qty"].tolist() == [84 - 10, 0]
+    assert plan["days_of_cover"].tolist() == [2.5, 125]
+
+
+def test_short_history_uses_a_flat_mean():
+    history = np.array([[2, 4, 6], [0, 0, 0]])
+    plan = DemandForecaster(horizon=5).plan(history, stock=[1, 1])
+    assert np.allclose(plan["forecast_daily"], [4, 0])
+    assert plan["days_of_cover"][1] == np.inf
+
+
+def test_catalog_chunks_give_the_same_plan(data):
+    store = data.get("sales_store")
+    inventory = pd.concat([data.get("inventory"), pd.DataFrame({
+        "product_id": ["NEW1"], "product_name": ["No history"], "current_stock": [5], "min_stock_threshold": [1]})])
+    whole = forecast_catalog(store, inventory)
+    chunked = forecast_catalog(store, inventory, chunk_size=7)
+    pd.testing.assert_frame_equal(whole, chunked)
+    # SKUs without sales history are left out
+    assert "NEW1" not in whole["product_id"].tolist()
+    assert len(whole) == data.get("inventory")["product_id"].nunique()
+    assert (whole["reorder_point"] >= data.get("inventory").drop_duplicates("product_id")
+            .set_index("product_id").loc[whole["product_id"], "min_stock_threshold"].to_numpy()).all()
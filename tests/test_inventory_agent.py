@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+from agents import InventoryAgent
+from data_context import DataContext
+
+
+def assert_matches_analyze_product(agent):
+    table = agent.analyze_all()
+    assert len(table) == len(agent.df_inv)
+    for row in table.to_dict("records"):
+        single = agent.analyze_product(row.pop("product_id"))
+        assert row == single
+
+
+def test_analyze_all_matches_analyze_product(data):
+    assert_matches_analyze_product(InventoryAgent(data))
+
+
+def test_status_boundaries_and_duplicate_rows(data_dir):
+    # Stock right at each threshold, plus a duplicated product (first row wins everywhere)
+    path = os.path.join(data_dir, "inventory.csv")
+    inv = pd.read_csv(path)
+    inv.loc[:7, "current_stock"] = [0, 9, 10, 11, 100, 101, 150, 300]
+    inv = pd.concat([inv, inv.iloc[[3]].assign(current_stock=0)], ignore_index=True)
+    inv.to_csv(path, index=False)
+
+    agent = InventoryAgent(DataContext(data_dir))
+    assert_matches_analyze_product(agent)
+    statuses = set(agent.analyze_all()["status"])
+    assert {"LOW STOCK (Scarcity)", "NORMAL"} <= statuses
+    dup = inv["product_id"].iloc[3]
+    assert (agent.analyze_many([dup])["stock"] == inv["current_stock"].iloc[3]).all()
+
+
+def test_analyze_many_keeps_requested_order(data):
+    agent = InventoryAgent(data)
+    ids = data.get("inventory")["product_id"].tolist()[::-3]
+    assert agent.analyze_many(ids)["product_id"].tolist() == ids
@@ -0,0 +1,129 @@
+import time
+import pytest
+import marketing_agent
+from agents import AuditAgent
+from decision_cache import DecisionCache
+from marketing_agent import MarketingAgent
+from model_backends import LocalBackend
+
+
+def make_agent(data, tmp_path, **backend_kwargs):
+    # Rules and cache off: every product goes to the (local) model
+    return MarketingAgent(data=data, backend=LocalBackend(**backend_kwargs), use_rules=False,
+                          cache=DecisionCache(str(tmp_path / "cache")),
+                          audit=AuditAgent(str(tmp_path / "audit_log.csv")))
+
+
+def product_ids(data, n=8):
+    return data.get("inventory")["product_id"].head(n).tolist()
+
+
+def test_results_come_back_in_input_order(data, tmp_path):
+    agent = make_agent(data, tmp_path)
+    ids = product_ids(data)
+    results = agent.generate_strategies(list(reversed(ids)), concurrency=4)
+    expected = [agent.generate_strategy(pid) for pid in reversed(ids)]  # cached now: same text
+    assert results == expected
+    assert all(r.startswith("**DECISION:**") for r in results)
+
+
+def test_latency_overlaps_across_workers(data, tmp_path):
+    agent = make_agent(data, tmp_path, latency=0.2)
+    ids = product_ids(data)
+    started = time.perf_counter()
+    agent.generate_strategies(ids, concurrency=len(ids))
+    # Serially this is 8 x 0.2s
+    assert time.perf_counter() - started < 0.2 * len(ids) / 2
+    assert agent.backend.calls == len(ids)
+
+
+def test_errors_are_retried_then_reported(data, tmp_path):
+    agent = make_agent(data, tmp_path, error_rate=1.0)
+    ids = product_ids(data, 3)
+    results = agent.generate_strategies(ids, retries=2, backoff=0.001)
+    assert all(r.startswith("Error connecting to AI: Simulated model failure") for r in results)
+    assert agent.backend.calls == len(ids) * 3
+    # Failures are not cached
+    assert agent.cache.stats()["writes"] == 0
+
+
+def test_slow_calls_time_out(data, tmp_path):
+    agent = make_agent(data, tmp_path, latency=1.0)
+    started = time.perf_counter()
+    results = agent.generate_strategies(product_ids(data, 2), timeout=0.05, retries=0)
+    assert all("timed out" in r for r in results)
+    assert time.perf_counter() - started < 0.9
+
+
+def test_rate_limit_paces_calls(data, tmp_path):
+    agent = make_agent(data, tmp_path)
+    rate = 20.0
+    ids = product_ids(data, 12)
+    started = time.perf_counter()
+    agent.generate_strategies(ids, concurrency=4, rate_per_sec=rate)
+    # Burst of 4, then the remaining 8 at `rate` per second
+    assert time.perf_counter() - started >= (len(ids) - 4) / rate * 0.8
+
+
+def test_hung_calls_are_bounded(data, tmp_path, monkeypatch):
+    monkeypatch.setattr(marketing_agent, "MAX_ABANDONED_CALLS", 1)
+    agent = make_agent(data, tmp_path, latency=0.3)
+    with pytest.raises(TimeoutError):
+        agent._ask_model("prompt", timeout=0.01)
+    assert agent.abandoned_calls == 1
+    # The limit is reached: fail fast without another backend call
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError, match="still running"):
+        agent._ask_model("prompt", timeout=0.01)
+    assert time.perf_counter() - started < 0.1
+    assert agent.backend.calls == 1
+    # Once the hung call returns its thread is counted free again
+    time.sleep(0.5)
+    assert agent.abandoned_calls == 0
+    assert agent._ask_model("prompt", timeout=1.0)
+
+
+class BrokenStreamBackend(LocalBackend):
+    # Stream that fails after its first chunk
+    def stream(self, prompt, chunk_words=3):
+        stream = super().stream(prompt, chunk_words)
+        yield next(stream)
+        raise ConnectionError("stream reset")
+
+
+def audit_rows(agent):
+    return len(agent.audit.get_recent_logs(100))
+
+
+def test_stream_yields_the_same_decision_in_chunks(data, tmp_path):
+    pid = product_ids(data, 1)[0]
+    agent = make_agent(data, tmp_path)
+    chunks = list(agent.stream_strategy(pid))
+    assert len(chunks) > 1
+    assert "".join(chunks) == make_agent(data, tmp_path / "other").generate_strategy(pid)
+    assert agent.cache.stats()["writes"] == 1
+    assert audit_rows(agent) == 1
+    # Complete answers are cached: the next stream is one chunk without a model call
+    assert list(agent.stream_strategy(pid)) == ["".join(chunks)]
+    assert agent.backend.calls == 1
+
+
+def test_abandoned_stream_is_not_cached_or_audited(data, tmp_path):
+    pid = product_ids(data, 1)[0]
+    agent = make_agent(data, tmp_path)
+    stream = agent.stream_strategy(pid)
+    next(stream)
+    stream.close()  # e.g. the dashboard rerun before the answer finished
+    assert agent.cache.stats()["writes"] == 0
+    assert audit_rows(agent) == 0
+
+
+def test_stream_error_is_reported_and_not_cached(data, tmp_path):
+    pid = product_ids(data, 1)[0]
+    agent = MarketingAgent(data=data, backend=BrokenStreamBackend(), use_rules=False,
+                           cache=DecisionCache(str(tmp_path / "cache")),
+                           audit=AuditAgent(str(tmp_path / "audit_log.csv")))
+    chunks = list(agent.stream_strategy(pid))
+    assert chunks[-1] == "Error connecting to AI: stream reset"
+    assert agent.cache.stats()["writes"] == 0
+    assert audit_rows(agent) == 0
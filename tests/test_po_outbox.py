@@ -0,0 +1,103 @@
+import sqlite3
+import pytest
+from po_outbox import POOutbox
+
+
+class RecordingMailer:
+    # Collects messages; vendors in `failing` raise like an SMTP outage
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+        self.on_send = None
+
+    def send(self, msg):
+        if self.on_send is not None:
+            self.on_send(msg)
+        if msg["To"] in self.failing:
+            raise OSError("SMTP unavailable")
+        self.sent.append(msg)
+
+    def close(self):
+        pass
+
+
+def line(pid, vendor, qty=10):
+    return {"product_id": pid, "product_name": f"Product {pid}", "vendor_email": vendor, "qty": qty}
+
+
+def rows(outbox):
+    with sqlite3.connect(outbox.path) as db:
+        return db.execute("SELECT product_id, vendor_email, qty, status, attempts FROM po_lines ORDER BY id").fetchall()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return POOutbox(str(tmp_path / "po_outbox.db"), mailer=RecordingMailer(), backoff=0.0)
+
+
+def test_one_po_per_vendor(outbox):
+    outbox.enqueue([line("P1", "a@x"), line("P2", "b@x"), line("P3", "a@x")])
+    assert outbox.process_once() == 2
+    by_vendor = {msg["To"]: msg.get_content() for msg in outbox.mailer.sent}
+    assert "P1" in by_vendor["a@x"] and "P3" in by_vendor["a@x"]
+    assert "P2" in by_vendor["b@x"]
+    assert outbox.stats() == {"pending": 0, "sent": 3, "failed": 0, "pending_vendors": 0}
+
+
+def test_reordering_a_pending_product_updates_its_line(outbox):
+    outbox.enqueue([line("P1", "a@x", 10)])
+    outbox.enqueue([line("P1", "a@x", 25)])
+    assert rows(outbox) == [("P1", "a@x", 25, "pending", 0)]
+
+
+def test_failed_send_is_retried_then_marked_failed(tmp_path):
+    mailer = RecordingMailer(failing={"a@x"})
+    outbox = POOutbox(str(tmp_path / "po_outbox.db"), mailer=mailer, backoff=0.0, max_attempts=3)
+    outbox.enqueue([line("P1", "a@x"), line("P2", "b@x")])
+    assert outbox.process_once() == 1
+    assert rows(outbox) == [("P1", "a@x", 10, "pending", 1), ("P2", "b@x", 10, "sent", 0)]
+
+    outbox.process_once()
+    assert rows(outbox)[0][3:] == ("pending", 2)
+    outbox.process_once()
+    assert rows(outbox)[0][3:] == ("failed", 3)
+    assert outbox.stats()["failed"] == 1
+
+    # Nothing is due any more
+    mailer.failing.clear()
+    assert outbox.process_once() == 0
+
+
+def test_backoff_delays_the_retry(tmp_path):
+    outbox = POOutbox(str(tmp_path / "po_outbox.db"), mailer=RecordingMailer(failing={"a@x"}), backoff=60)
+    outbox.enqueue([line("P1", "a@x")])
+    outbox.process_once()
+    outbox.mailer.failing.clear()
+    assert outbox.process_once() == 0  # not due for another ~30-90s
+    assert outbox.stats()["pending"] == 1
+
+
+def test_reorder_while_sending_then_failure_keeps_the_newer_line(outbox):
+    # The product is reordered while its line is out for sending, and that send fails
+    outbox.mailer.failing = {"a@x"}
+    outbox.mailer.on_send = lambda msg: outbox.enqueue([line("P1", "a@x", 40)])
+    outbox.enqueue([line("P1", "a@x", 10), line("P2", "b@x")])
+    assert outbox.process_once() == 1
+    assert sorted(rows(outbox)) == [("P1", "a@x", 40, "pending", 0), ("P2", "b@x", 10, "sent", 0)]
+
+    outbox.mailer.failing, outbox.mailer.on_send = set(), None
+    assert outbox.process_once() == 1
+    assert "40 units" in outbox.mailer.sent[-1].get_content()
+
+
+def test_start_requeues_lines_stranded_mid_send(tmp_path):
+    mailer = RecordingMailer(failing={"a@x", "b@x"})  # keeps everything queued
+    outbox = POOutbox(str(tmp_path / "po_outbox.db"), mailer=mailer, backoff=60)
+    outbox.enqueue([line("P1", "a@x", 10), line("P2", "b@x")])
+    with sqlite3.connect(outbox.path) as db:
+        db.execute("UPDATE po_lines SET status = 'sending'")
+    # P1 reordered after the crash: its stranded line gives way to the new one
+    outbox.enqueue([line("P1", "a@x", 40)])
+    outbox.start()
+    outbox.stop()
+    assert sorted(r[:4] for r in rows(outbox)) == [("P1", "a@x", 40, "pending"), ("P2", "b@x", 10, "pending")]
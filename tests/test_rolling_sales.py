@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from rolling_sales import RollingSales
+from sales_store import SalesStore, to_days
+
+WINDOWS = (3, 7, 30)
+
+
+def make_store(path, n_products=12, n_days=20, seed=0):
+    rng = np.random.default_rng(seed)
+    products = [f"P{i:03d}" for i in range(n_products)]
+    dates = pd.date_range("2024-01-01", periods=n_days, freq="D")
+    codes = np.tile(np.arange(n_products, dtype=np.int32), n_days)
+    days = np.repeat(to_days(dates), n_products)
+    units = rng.integers(0, 20, n_products * n_days)
+    return SalesStore.create(str(path), products, codes, days, units)
+
+
+def assert_matches_store(rolling, store):
+    for w in WINDOWS:
+        np.testing.assert_array_equal(rolling.window_totals(store.products, w),
+                                      store.window_totals(store.products, w))
+
+
+def test_incremental_days_match_a_full_recompute(tmp_path):
+    store = make_store(tmp_path / "store")
+    rolling = RollingSales(store, WINDOWS)
+    assert_matches_store(rolling, store)
+
+    rng = np.random.default_rng(1)
+    last = pd.Timestamp("2024-01-20")
+    for k in range(1, 16):
+        units = {pid: int(u) for pid, u in zip(store.products, rng.integers(0, 20, len(store.products)))}
+        if k == 5:
+            units["P999"] = 7  # a SKU that starts selling mid-window
+        store.append_day(last + pd.Timedelta(days=k), units)
+        if k == 10:
+            store.compact()
+        rolling.sync(store)
+        assert_matches_store(rolling, store)
+    assert rolling.days == store.days.tolist()
+
+
+def test_several_new_days_in_one_sync(tmp_path):
+    store = make_store(tmp_path / "store")
+    rolling = RollingSales(store, WINDOWS)
+    for k in range(1, 5):
+        store.append_day(pd.Timestamp("2024-01-20") + pd.Timedelta(days=k), {"P001": k})
+    rolling.sync(store)
+    assert_matches_store(rolling, store)
+
+
+def test_velocity_uses_stored_days_while_history_is_short(tmp_path):
+    store = make_store(tmp_path / "store", n_days=5)
+    rolling = RollingSales(store, (1, 30))
+    pace = store.window_totals(["P000"], 30)[0] / 5
+    assert rolling.velocity(["P000"], 30)[0] == pace
+    assert rolling.days_of_cover(["P000"], [50], 30)[0] == 50 / pace
+    store.append_day("2024-01-06", {"P000": 0, "P001": 0})
+    rolling.sync(store)
+    assert rolling.days_of_cover(["P000"], [50], 1)[0] == np.inf
+
+
+def test_rewritten_history_triggers_a_rebuild(tmp_path):
+    # Same dates, different units: e.g. sales_history.csv regenerated by expand_data.py
+    csv = tmp_path / "sales_history.csv"
+    dates = pd.date_range("2024-01-01", periods=10, freq="D").strftime("%Y-%m-%d")
+    pd.DataFrame({"date": dates, "P001_sales": 1}).to_csv(csv, index=False)
+    store = SalesStore.open(str(tmp_path / "store"), str(csv))
+    rolling = RollingSales(store, WINDOWS)
+    assert rolling.window_totals(["P001"], 7)[0] == 7
+
+    pd.DataFrame({"date": dates, "P001_sales": 5}).to_csv(csv, index=False)
+    store = SalesStore.open(str(tmp_path / "store"), str(csv))
+    rolling.sync(store)
+    assert rolling.window_totals(["P001"], 7)[0] == 35
@@ -0,0 +1,65 @@
+from agents import AuditAgent, InventoryAgent
+from decision_cache import DecisionCache
+from marketing_agent import MarketingAgent
+from model_backends import LocalBackend
+from rules import evaluate, pre_decide
+
+FIN_OK = {"status": "HEALTHY", "message": "Cash is fine"}
+FIN_CRISIS = {"status": "CRITICAL", "message": "Cash runway < 2 weeks"}
+COMP = {"position": "Matched"}
+
+
+def inv(status="NORMAL", stock=50, sales=12):
+    return {"product": "Pro Mouse 100", "stock": stock, "7d_sales": sales, "status": status}
+
+
+def test_unforced_outcomes_go_to_the_model():
+    assert evaluate(FIN_OK, inv(), COMP) is None
+    assert evaluate(FIN_OK, inv("LOW STOCK (Scarcity)", stock=3), COMP) is None
+    assert evaluate(FIN_OK, inv("HIGH DEMAND", sales=80), COMP) is None
+
+
+def test_first_matching_rule_wins():
+    assert evaluate(FIN_CRISIS, inv("LOW STOCK (Scarcity)", stock=3), COMP)[0] == "crisis_low_stock"
+    assert evaluate(FIN_CRISIS, inv(stock=0), COMP)[0] == "crisis_low_stock"
+    # Crisis outranks overstock
+    assert evaluate(FIN_CRISIS, inv("OVERSTOCK (Dead Inventory)", stock=200), COMP)[0] == "crisis_liquidate"
+    assert evaluate(FIN_OK, inv("OVERSTOCK (Dead Inventory)", stock=200, sales=2), COMP)[0] == "overstock_clear"
+
+
+def test_decision_text_uses_the_model_format():
+    name, text = pre_decide(FIN_CRISIS, inv("LOW STOCK (Scarcity)", stock=3), COMP)
+    assert name == "crisis_low_stock"
+    assert text.startswith("**DECISION:** Hold\n**REASONING:** Cash is CRITICAL and only 3 units")
+    assert text.endswith("**ACTION:** Pause all spend on Pro Mouse 100; do not reorder until cash recovers.")
+
+
+def make_agent(data, tmp_path, use_rules=True):
+    return MarketingAgent(data=data, backend=LocalBackend(), use_rules=use_rules,
+                          cache=DecisionCache(str(tmp_path / "cache")),
+                          audit=AuditAgent(str(tmp_path / "audit_log.csv")))
+
+
+def test_ruled_products_skip_the_model_and_are_audited(data, tmp_path):
+    health = InventoryAgent(data).analyze_all()
+    overstock = health.loc[health["status"].str.contains("OVERSTOCK"), "product_id"].iloc[0]
+    agent = make_agent(data, tmp_path)
+    text = agent.generate_strategy(overstock)
+    assert text.startswith("**DECISION:** Liquidation")
+    assert agent.backend.calls == 0
+    assert agent.cache.stats()["writes"] == 0
+    logs = agent.audit.get_recent_logs(1)
+    assert logs.loc[0, "action_taken"] == "Strategy Generation (Rule-Based)"
+    assert logs.loc[0, "product_id"] == overstock
+
+
+def test_crisis_mode_decides_everything_by_rule(data, tmp_path):
+    ids = data.get("inventory")["product_id"].head(5).tolist()
+    agent = make_agent(data, tmp_path)
+    results = agent.generate_strategies(ids, crisis_mode=True)
+    assert all(r.split("\n")[0] in ("**DECISION:** Hold", "**DECISION:** Liquidation") for r in results)
+    assert agent.backend.calls == 0
+    # With rules off the same products go to the model
+    agent = make_agent(data, tmp_path, use_rules=False)
+    agent.generate_strategies(ids, crisis_mode=True)
+    assert agent.backend.calls == len(ids)
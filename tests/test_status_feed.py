@@ -0,0 +1,93 @@
+import os
+import pandas as pd
+from data_context import DataContext
+from status_feed import StatusFeed
+
+
+def rewrite(path, edit):
+    df = pd.read_csv(path)
+    edit(df)
+    df.to_csv(path, index=False)
+    # Make sure the signature moves even on coarse mtime clocks
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def set_where(df, column, pid, value, key="product_id"):
+    df[column] = df[column].where(df[key] != pid, value)
+
+
+def assert_matches_full_pass(feed, data_dir):
+    # The incrementally maintained flags equal a fresh baseline over the same files
+    fresh = StatusFeed(DataContext(data_dir)).flags
+    pd.testing.assert_frame_equal(feed.flags.sort_index(), fresh.sort_index())
+
+
+def test_nothing_changed_publishes_nothing(data):
+    feed = StatusFeed(data)
+    seen = []
+    feed.subscribe(seen.append)
+    assert feed.poll() is None
+    assert seen == []
+
+
+def test_stock_change_moves_only_that_sku(data, data_dir):
+    feed = StatusFeed(data)
+    pid = feed.flags.index[~feed.flags["low_stock"] & ~feed.flags["overstock"]][0]
+    seen = []
+    feed.subscribe(seen.append)
+    rewrite(os.path.join(data_dir, "inventory.csv"), lambda df: set_where(df, "current_stock", pid, 0))
+
+    delta = feed.poll()
+    assert delta.changed == {"inventory": [pid]}
+    assert delta.entered["low_stock"] == [pid]
+    assert not any(delta.left.values())
+    assert seen == [delta]
+    assert "1 entered" in delta.summary()
+    assert_matches_full_pass(feed, data_dir)
+
+
+def test_competitor_undercut_enters_losing(data, data_dir):
+    feed = StatusFeed(data)
+    pid = feed.flags.index[~feed.flags["losing"]][0]
+    rewrite(os.path.join(data_dir, "competitors.csv"), lambda df: set_where(df, "competitor_price", pid, 1))
+
+    delta = feed.poll()
+    assert delta.changed == {"competitors": [pid]}
+    assert delta.entered["losing"] == [pid]
+    assert_matches_full_pass(feed, data_dir)
+
+
+def test_sales_spike_leaves_overstock(data, data_dir):
+    feed = StatusFeed(data)
+    pid = feed.flags.index[feed.flags["overstock"]][0]
+    newest = pd.read_csv(os.path.join(data_dir, "sales_history.csv"))["date"].max()
+    rewrite(os.path.join(data_dir, "sales_history.csv"),
+            lambda df: set_where(df, f"{pid}_sales", newest, 500, key="date"))
+
+    delta = feed.poll()
+    assert pid in delta.changed["sales"]
+    assert delta.left["overstock"] == [pid]
+    assert_matches_full_pass(feed, data_dir)
+
+
+def test_removed_sku_leaves_its_buckets(data, data_dir):
+    feed = StatusFeed(data)
+    pid = feed.flags.index[feed.flags.any(axis=1)][0]
+    buckets = [b for b in feed.flags.columns if feed.flags.at[pid, b]]
+    rewrite(os.path.join(data_dir, "inventory.csv"), lambda df: df.drop(df.index[df["product_id"] == pid], inplace=True))
+
+    delta = feed.poll()
+    assert all(delta.left[b] == [pid] for b in buckets)
+    assert pid not in feed.flags.index
+
+
+def test_broken_subscriber_does_not_stop_the_others(data, data_dir):
+    feed = StatusFeed(data)
+    seen = []
+    feed.subscribe(lambda delta: 1 / 0)
+    feed.subscribe(seen.append)
+    pid = feed.flags.index[~feed.flags["low_stock"] & ~feed.flags["overstock"]][0]
+    rewrite(os.path.join(data_dir, "inventory.csv"), lambda df: set_where(df, "current_stock", pid, 0))
+    assert feed.poll()
+    assert len(seen) == 1